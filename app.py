@@ -1,15 +1,25 @@
-from flask import Flask, request, jsonify, send_file, render_template
+from flask import Flask, request, jsonify, render_template, Response
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
 import os
-import hashlib
-from blockchain import Blockchain
+import hmac
+import threading
+import mimetypes
+from audit import run_audit
+from blob_store import BlobStore
+from http_range import (RangeNotSatisfiable, etag_matches, file_reader, offload_response,
+                        range_response, requested_ranges, sendfile_response)
+from upload_sessions import UploadSessions, UploadSessionError
+from chain_service import ChainClient, create_blockchain
+from block_codec import iter_encode_blocks
 from smart_contract import ContractManager
 from peer_verification import PeerVerification
 from encryption import FileEncryption
 from config import get_config
 import json
 import base64
+from urllib.parse import quote
+from datetime import datetime, timedelta
 
 # Initialize Flask app
 app = Flask(__name__)
@@ -25,14 +35,35 @@ CORS(app, origins=config.CORS_ORIGINS)
 UPLOAD_FOLDER = app.config['UPLOAD_FOLDER']
 ALLOWED_EXTENSIONS = app.config['ALLOWED_EXTENSIONS']
 MAX_FILE_SIZE = app.config['MAX_CONTENT_LENGTH']
+MAX_BLOCK_PAGE = 1000
+UPLOAD_CHUNK_SIZE = 1024 * 1024
 
 # Create uploads directory if it doesn't exist
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
+# Uploaded content is stored once per SHA-256, shared by every file record pointing at it
+blob_store = BlobStore(config.BLOB_FOLDER or os.path.join(UPLOAD_FOLDER, 'blobs'),
+                       gc_grace=config.BLOB_GC_GRACE)
+# Resumable chunked uploads; each chunk is its own request, so MAX_CONTENT_LENGTH caps chunks
+upload_sessions = UploadSessions(os.path.join(UPLOAD_FOLDER, 'sessions'),
+                                 max_file_size=config.UPLOAD_SESSION_MAX_BYTES,
+                                 default_chunk_size=config.UPLOAD_SESSION_CHUNK_SIZE,
+                                 max_chunk_size=MAX_FILE_SIZE,
+                                 claim_timeout=config.UPLOAD_SESSION_CLAIM_TIMEOUT)
+
 # Initialize blockchain and advanced features
-blockchain = Blockchain(difficulty=app.config['BLOCKCHAIN_DIFFICULTY'])
-contract_manager = ContractManager()
-peer_verification = PeerVerification()
+# Under gunicorn every worker keeps a read replica; the chain writer process owns appends
+chain_writer = ChainClient(config.CHAIN_SERVICE_SOCKET) if config.CHAIN_SERVICE_SOCKET else None
+blockchain = create_blockchain(config, writer=chain_writer)
+contract_manager = ContractManager(writer=chain_writer)
+peer_verification = PeerVerification(writer=chain_writer)
+audit_lock = threading.Lock()
+
+
+@app.before_request
+def refresh_chain_replica():
+    """Catch up with blocks the chain writer appended (no-op when standalone)"""
+    blockchain.refresh()
 
 
 def allowed_file(filename):
@@ -40,13 +71,36 @@ def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
-def calculate_file_hash(file_path):
-    """Calculate SHA-256 hash of a file"""
-    sha256_hash = hashlib.sha256()
-    with open(file_path, "rb") as f:
-        for byte_block in iter(lambda: f.read(4096), b""):
-            sha256_hash.update(byte_block)
-    return sha256_hash.hexdigest()
+def admin_authorized():
+    """Check the X-Admin-Token header (admin endpoints are disabled while ADMIN_TOKEN is unset)"""
+    return bool(config.ADMIN_TOKEN) and hmac.compare_digest(
+        request.headers.get('X-Admin-Token', ''), config.ADMIN_TOKEN)
+
+
+def client_id():
+    """Keyed digest of the client address; contract access logs never hold the address itself"""
+    return hmac.new(config.SECRET_KEY.encode(), (request.remote_addr or '').encode(),
+                    'sha256').hexdigest()[:16]
+
+
+def offload_download(file_path, size, ranges, content_type, etag, download_name):
+    """
+    Response that leaves the transfer of a plain file to the front server
+    or the kernel (DOWNLOAD_OFFLOAD)
+    Returns: None to stream it from this worker instead
+    """
+    mode = config.DOWNLOAD_OFFLOAD
+    if mode == 'x-accel':
+        relative_path = os.path.relpath(os.path.abspath(file_path), os.path.abspath(UPLOAD_FOLDER))
+        if relative_path.startswith('..'):
+            return None
+        uri = config.DOWNLOAD_ACCEL_PREFIX.rstrip('/') + '/' + quote(relative_path.replace(os.sep, '/'))
+        return offload_response('X-Accel-Redirect', uri, content_type, etag, download_name)
+    if mode == 'x-sendfile':
+        return offload_response('X-Sendfile', os.path.abspath(file_path), content_type, etag, download_name)
+    if mode == 'sendfile':
+        return sendfile_response(request.environ, file_path, size, ranges, content_type, etag, download_name)
+    return None
 
 
 @app.route('/')
@@ -55,6 +109,81 @@ def index():
     return render_template('index.html')
 
 
+def register_upload(chunks, filename, uploader, encrypt, password,
+                    is_public=True, max_downloads=None, expiration_hours=None):
+    """
+    Store uploaded content and record it: version, blockchain transaction, contract
+    Shared by /api/upload and finalized upload sessions.
+    Returns: (JSON response, status code)
+    """
+    # One pass over the upload: encrypt if asked, and hash while writing to a
+    # temp file that is renamed into the store
+    salt = None
+    is_encrypted = False
+    if encrypt and password:
+        chunks, salt_bytes = FileEncryption.encrypt_chunks(chunks, password)
+        salt = base64.b64encode(salt_bytes).decode('utf-8')
+        is_encrypted = True
+    
+    # Store the content once; identical content only gains a reference
+    try:
+        file_hash, file_size, _ = blob_store.put_stream(chunks)
+    except UploadSessionError:
+        raise
+    except Exception as e:
+        if is_encrypted:
+            return jsonify({'error': f'Encryption failed: {str(e)}'}), 500
+        raise
+    file_path = blob_store.path(file_hash)
+    
+    # Add to blockchain; the chain writer assigns the version (and the
+    # name_vN file name for a repeated name)
+    try:
+        block = blockchain.add_file_transaction(
+            file_name=filename,
+            file_hash=file_hash,
+            file_size=file_size,
+            uploader=uploader,
+            file_path=file_path,
+            is_encrypted=is_encrypted,
+            salt=salt
+        )
+    except Exception:
+        blob_store.release(file_hash)
+        raise
+    transaction = block['transaction'] if block.get('pending') else block['data']
+    filename, version = transaction['file_name'], transaction['version']
+    
+    # Create smart contract
+    contract = contract_manager.create_contract(file_hash, uploader, is_public,
+                                                max_downloads, expiration_hours)
+    
+    # Queued uploads (async sealing or batched uploads) are mined with a
+    # later batch; hand back a receipt, already sealed if this upload filled the batch
+    if block.get('pending'):
+        return jsonify({
+            'message': 'File uploaded, block pending',
+            'file_name': filename,
+            'file_hash': file_hash,
+            'file_size': file_size,
+            'is_encrypted': is_encrypted,
+            'version': version,
+            'receipt': blockchain.get_receipt(block['receipt_id']),
+            'contract_id': contract.contract_id
+        }), 202
+    
+    return jsonify({
+        'message': 'File uploaded successfully',
+        'file_name': filename,
+        'file_hash': file_hash,
+        'file_size': file_size,
+        'is_encrypted': is_encrypted,
+        'version': version,
+        'block': block,
+        'contract_id': contract.contract_id
+    }), 201
+
+
 @app.route('/api/upload', methods=['POST'])
 def upload_file():
     """Upload a file and add to blockchain"""
@@ -76,80 +205,124 @@ def upload_file():
         if not allowed_file(file.filename):
             return jsonify({'error': 'File type not allowed'}), 400
         
-        # Save file
-        filename = secure_filename(file.filename)
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        
-        # Handle duplicate filenames and versions
-        base_name, extension = os.path.splitext(filename)
-        version = 1
-        previous_version_hash = None
-        
-        # Check for existing versions
-        existing_files = blockchain.get_all_files()
-        for existing in existing_files:
-            if existing['file_name'].startswith(base_name):
-                version = existing.get('version', 1) + 1
-                previous_version_hash = existing['file_hash']
-        
-        if version > 1:
-            filename = f"{base_name}_v{version}{extension}"
-            file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        
-        file.save(file_path)
+        chunks = iter(lambda: file.stream.read(UPLOAD_CHUNK_SIZE), b'')
+        return register_upload(chunks, secure_filename(file.filename), uploader, encrypt, password,
+                               is_public, max_downloads, expiration_hours)
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/uploads', methods=['POST'])
+def create_upload_session():
+    """
+    Start a resumable upload
+    JSON body: file_name, file_size, and optionally chunk_size, file_sha256,
+    uploader, is_public, max_downloads, expiration_hours
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        file_name = secure_filename(data.get('file_name', ''))
+        if not file_name:
+            return jsonify({'error': 'No file name provided'}), 400
+        if not allowed_file(file_name):
+            return jsonify({'error': 'File type not allowed'}), 400
         
-        # Encryption handling
-        salt = None
-        is_encrypted = False
-        if encrypt and password:
-            try:
-                encrypted_path, salt_bytes = FileEncryption.encrypt_file(file_path, password)
-                # Remove original file and use encrypted one
-                os.remove(file_path)
-                os.rename(encrypted_path, file_path)
-                salt = base64.b64encode(salt_bytes).decode('utf-8')
-                is_encrypted = True
-            except Exception as e:
-                return jsonify({'error': f'Encryption failed: {str(e)}'}), 500
-        
-        # Calculate file hash and size
-        file_hash = calculate_file_hash(file_path)
-        file_size = os.path.getsize(file_path)
-        
-        # Add to blockchain
-        block = blockchain.add_file_transaction(
-            file_name=filename,
-            file_hash=file_hash,
-            file_size=file_size,
-            uploader=uploader,
-            file_path=file_path,
-            is_encrypted=is_encrypted,
-            salt=salt,
-            version=version,
-            previous_version_hash=previous_version_hash
+        session = upload_sessions.create(
+            file_name=file_name,
+            file_size=int(data.get('file_size', -1)),
+            chunk_size=int(data['chunk_size']) if data.get('chunk_size') else None,
+            file_sha256=data.get('file_sha256'),
+            metadata={
+                'uploader': data.get('uploader', 'Anonymous'),
+                'is_public': bool(data.get('is_public', True)),
+                'max_downloads': data.get('max_downloads'),
+                'expiration_hours': data.get('expiration_hours')
+            }
         )
-        
-        # Create smart contract
-        contract = contract_manager.create_contract(file_hash, uploader)
-        contract.set_public_access(is_public)
-        
-        if max_downloads:
-            contract.set_max_downloads(int(max_downloads))
-        
-        if expiration_hours:
-            contract.set_expiration(int(expiration_hours))
-        
-        return jsonify({
-            'message': 'File uploaded successfully',
-            'file_name': filename,
-            'file_hash': file_hash,
-            'file_size': file_size,
-            'is_encrypted': is_encrypted,
-            'version': version,
-            'block': block,
-            'contract_id': contract.contract_id
-        }), 201
-    
+        return jsonify(session), 201
+    except UploadSessionError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/uploads/<session_id>', methods=['GET'])
+def get_upload_session(session_id):
+    """Which chunks and byte ranges of a resumable upload have arrived"""
+    try:
+        return jsonify(upload_sessions.status(session_id)), 200
+    except KeyError:
+        return jsonify({'error': 'Upload session not found'}), 404
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/uploads/<session_id>/chunks/<int:index>', methods=['PUT'])
+def put_upload_chunk(session_id, index):
+    """Store one chunk (raw request body); X-Chunk-SHA256 is checked when sent"""
+    try:
+        chunk = upload_sessions.put_chunk(session_id, index, request.stream,
+                                          request.headers.get('X-Chunk-SHA256'))
+        return jsonify(chunk), 200
+    except KeyError:
+        return jsonify({'error': 'Upload session not found'}), 404
+    except UploadSessionError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/uploads/<session_id>/complete', methods=['POST'])
+def complete_upload_session(session_id):
+    """
+    Assemble a resumable upload and register it like /api/upload
+    JSON body (optional): encrypt, password
+    """
+    try:
+        session = upload_sessions.get(session_id)
+        if not upload_sessions.claim(session_id):
+            return jsonify({'error': 'Upload session is already being finalized'}), 409
+        
+        data = request.get_json(silent=True) or {}
+        metadata = session['metadata']
+        try:
+            response = register_upload(
+                upload_sessions.iter_content(session_id),
+                session['file_name'],
+                metadata.get('uploader', 'Anonymous'),
+                bool(data.get('encrypt', False)),
+                data.get('password', ''),
+                metadata.get('is_public', True),
+                metadata.get('max_downloads'),
+                metadata.get('expiration_hours')
+            )
+        except BaseException:
+            upload_sessions.unclaim(session_id)
+            raise
+        
+        if response[1] < 300:
+            upload_sessions.delete(session_id)
+        else:
+            upload_sessions.unclaim(session_id)
+        return response
+    except KeyError:
+        return jsonify({'error': 'Upload session not found'}), 404
+    except UploadSessionError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/uploads/<session_id>', methods=['DELETE'])
+def abort_upload_session(session_id):
+    """Abandon a resumable upload and delete its chunks"""
+    try:
+        upload_sessions.get(session_id)
+        upload_sessions.delete(session_id)
+        return jsonify({'message': 'Upload session deleted'}), 200
+    except KeyError:
+        return jsonify({'error': 'Upload session not found'}), 404
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -164,13 +337,23 @@ def get_files():
         return jsonify({'error': str(e)}), 500
 
 
-@app.route('/api/download/<file_hash>', methods=['POST'])
+@app.route('/api/download/<file_hash>', methods=['GET', 'POST'])
 def download_file(file_hash):
-    """Download a file by its hash"""
+    """
+    Download a file by its hash
+    POST takes a JSON body (downloader, password); GET takes ?downloader=
+    and the password in an X-File-Password header, so players can stream it.
+    Supports Range (including multi-range), If-Range and If-None-Match with
+    the file hash as a strong ETag. Every request is checked against the
+    contract; a download is recorded once per downloader and client address
+    within DOWNLOAD_RESUME_WINDOW, so resumed and seeking requests that
+    follow it aren't counted again.
+    Unencrypted files can be sent by the proxy or the kernel (DOWNLOAD_OFFLOAD).
+    """
     try:
-        data = request.get_json()
-        downloader = data.get('downloader', 'Anonymous')
-        password = data.get('password', '')
+        data = (request.get_json(silent=True) or {}) if request.method == 'POST' else {}
+        downloader = data.get('downloader') or request.args.get('downloader', 'Anonymous')
+        password = data.get('password') or request.headers.get('X-File-Password', '')
         
         # Get file info from blockchain
         file_info = blockchain.get_file_by_hash(file_hash)
@@ -178,97 +361,226 @@ def download_file(file_hash):
         if not file_info:
             return jsonify({'error': 'File not found'}), 404
         
-        # Check smart contract access
+        # Check smart contract access; a transfer continuing this client's
+        # counted download isn't held to the download limits again
+        client = client_id()
         contract = contract_manager.get_contract(file_hash)
+        resumed = False
         if contract:
-            has_access, reason = contract.check_access(downloader)
+            resumed = contract.recent_download(downloader, client, config.DOWNLOAD_RESUME_WINDOW)
+            has_access, reason = contract.check_access(downloader, count_download=not resumed)
             if not has_access:
-                contract.log_access(downloader, "download", False, reason)
-                contract_manager.save_to_disk()  # Persist access log
+                contract_manager.log_access(file_hash, downloader, "download", False, reason)
                 return jsonify({'error': f'Access denied: {reason}'}), 403
-            contract.log_access(downloader, "download", True, reason)
-            contract_manager.save_to_disk()  # Persist access log
         
         file_path = file_info['file_path']
         
         if not os.path.exists(file_path):
             return jsonify({'error': 'File not found on server'}), 404
         
-        # Handle encrypted files
+        # The content behind a file hash never changes
+        etag = f'"{file_hash}"'
+        download_name = file_info['file_name']
         if file_info.get('is_encrypted'):
             if not password:
                 return jsonify({'error': 'Password required for encrypted file'}), 400
             
+            # Get salt from file info
+            salt_b64 = file_info.get('salt')
+            if not salt_b64:
+                return jsonify({'error': 'Encryption data missing'}), 500
+            
             try:
-                # Get salt from file info
-                salt_b64 = file_info.get('salt')
-                if not salt_b64:
-                    return jsonify({'error': 'Encryption data missing'}), 500
-                
-                salt = base64.b64decode(salt_b64)
-                
-                # Decrypt file temporarily
-                decrypted_path = FileEncryption.decrypt_file(
-                    file_path, password, salt
+                size, read = FileEncryption.decrypted_reader(
+                    file_path, password, base64.b64decode(salt_b64)
                 )
-                
-                # Record download in blockchain
+            except ValueError:
+                return jsonify({'error': 'Invalid password'}), 401
+            download_name = download_name.replace('.encrypted', '')
+        else:
+            size, read = os.path.getsize(file_path), file_reader(file_path)
+        
+        # Only after the password check, so it can't be used to probe for files
+        if etag_matches(request.headers.get('If-None-Match'), etag):
+            return Response(status=304, headers={'ETag': etag, 'Accept-Ranges': 'bytes'})
+        
+        try:
+            ranges = requested_ranges(request.headers, etag, size)
+        except RangeNotSatisfiable:
+            return Response(status=416, headers={'Content-Range': f'bytes */{size}', 'ETag': etag})
+        
+        # Count the download (access log and blockchain) once per client; without
+        # a contract there is no record of earlier fetches, so count those from byte 0
+        if request.method != 'HEAD' and not resumed and (contract or ranges is None or ranges[0][0] == 0):
+            counted = True
+            if contract:
+                # Checked again and counted in one step on the shared contract
+                has_access, reason, counted = contract_manager.record_download(
+                    file_hash, downloader, client, config.DOWNLOAD_RESUME_WINDOW
+                )
+                if not has_access:
+                    return jsonify({'error': f'Access denied: {reason}'}), 403
+            
+            # Record download in blockchain
+            if counted:
                 blockchain.add_download_transaction(
                     file_name=file_info['file_name'],
                     file_hash=file_hash,
                     downloader=downloader
                 )
-                
-                # Send decrypted file
-                response = send_file(
-                    decrypted_path, 
-                    as_attachment=True,
-                    download_name=file_info['file_name'].replace('.encrypted', '')
-                )
-                
-                # Clean up decrypted file after sending
-                try:
-                    os.remove(decrypted_path)
-                except:
-                    pass
-                
-                return response
-                
-            except ValueError as e:
-                return jsonify({'error': 'Invalid password'}), 401
-            except Exception as e:
-                return jsonify({'error': f'Decryption failed: {str(e)}'}), 500
-        
-        # Record download in blockchain
-        blockchain.add_download_transaction(
-            file_name=file_info['file_name'],
-            file_hash=file_hash,
-            downloader=downloader
-        )
         
-        return send_file(file_path, as_attachment=True, 
-                        download_name=file_info['file_name'])
+        content_type = mimetypes.guess_type(download_name)[0] or 'application/octet-stream'
+        if not file_info.get('is_encrypted'):
+            # Encrypted files have to be decrypted here; plain ones can be offloaded
+            response = offload_download(file_path, size, ranges, content_type, etag, download_name)
+            if response is not None:
+                return response
+        return range_response(read, size, ranges, content_type, etag, download_name)
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+def stream_chain_document(blocks):
+    """Stream blocks as the {"chain": [...]} document one block at a time"""
+    yield '{"chain": ['
+    for position, block in enumerate(blocks):
+        yield (', ' if position else '') + json.dumps(block)
+    yield ']}'
+
+
 @app.route('/api/blockchain', methods=['GET'])
 def get_blockchain():
-    """Get the entire blockchain"""
+    """
+    Get blocks from the blockchain
+    Query parameters (all optional):
+      from, to  - height range [from, to)
+      limit     - page size (max 1000), enables cursor pagination
+      cursor    - next_cursor returned with the previous page
+      order     - 'asc' (default) or 'desc'
+      fields    - 'headers' to leave out transaction payloads
+      format    - 'ndjson' to stream one block per line, 'binary' to stream
+                  full blocks in the compact block codec (block_codec.py)
+    Without limit the whole range is streamed as {"chain": [...]}.
+    """
+    try:
+        height = len(blockchain.chain)
+        start = max(0, request.args.get('from', 0, type=int))
+        end = min(height, request.args.get('to', height, type=int))
+        limit = request.args.get('limit', type=int)
+        cursor = request.args.get('cursor', type=int)
+        descending = request.args.get('order', 'asc').lower() == 'desc'
+        headers_only = request.args.get('fields', '').lower() == 'headers'
+        output_format = request.args.get('format', 'json').lower()
+        
+        next_cursor = None
+        if limit is not None:
+            limit = max(1, min(limit, MAX_BLOCK_PAGE))
+            if descending:
+                # The cursor is the next (lower) height to return
+                page_end = min(end, cursor + 1) if cursor is not None else end
+                page_start = max(start, page_end - limit)
+                if page_start > start:
+                    next_cursor = page_start - 1
+            else:
+                page_start = max(start, cursor) if cursor is not None else start
+                page_end = min(end, page_start + limit)
+                if page_end < end:
+                    next_cursor = page_end
+            start, end = page_start, page_end
+        
+        if output_format == 'binary':
+            blocks = blockchain.iter_blocks(start, end, descending, headers_only=False)
+            response = Response(iter_encode_blocks(blocks), mimetype='application/octet-stream')
+            if next_cursor is not None:
+                response.headers['X-Next-Cursor'] = str(next_cursor)
+            return response
+        
+        blocks = blockchain.iter_blocks(start, end, descending, headers_only)
+        
+        if output_format == 'ndjson':
+            response = Response((json.dumps(block) + '\n' for block in blocks),
+                                mimetype='application/x-ndjson')
+            if next_cursor is not None:
+                response.headers['X-Next-Cursor'] = str(next_cursor)
+            return response
+        
+        if limit is not None:
+            return jsonify({
+                'blocks': list(blocks),
+                'next_cursor': next_cursor,
+                'height': height
+            }), 200
+        
+        return Response(stream_chain_document(blocks), mimetype='application/json')
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/receipts/<receipt_id>', methods=['GET'])
+def get_receipt(receipt_id):
+    """Get the sealing status of a queued transaction"""
     try:
-        chain = blockchain.get_chain()
-        return jsonify({'chain': chain}), 200
+        receipt = blockchain.get_receipt(receipt_id)
+        if not receipt:
+            return jsonify({'error': 'Receipt not found'}), 404
+        return jsonify(receipt), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
 @app.route('/api/blockchain/validate', methods=['GET'])
 def validate_blockchain():
-    """Validate the blockchain"""
+    """Validate the blockchain (?full=true re-hashes every block)"""
     try:
-        is_valid = blockchain.is_chain_valid()
-        return jsonify({'is_valid': is_valid}), 200
+        full_audit = request.args.get('full', 'false').lower() == 'true'
+        is_valid = blockchain.is_chain_valid(full_audit=full_audit)
+        return jsonify({
+            'is_valid': is_valid,
+            'full_audit': full_audit,
+            'validated_height': blockchain.validated_height
+        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/admin/audit', methods=['POST'])
+def audit_blockchain():
+    """Run a parallel full-chain audit (X-Admin-Token required)"""
+    try:
+        if not admin_authorized():
+            return jsonify({'error': 'Invalid or unconfigured admin token'}), 403
+        
+        # One audit at a time, with at most one process per CPU (0 = one per CPU)
+        data = request.get_json(silent=True) or {}
+        workers = min(max(0, int(data.get('workers', config.AUDIT_WORKERS))), os.cpu_count() or 1)
+        if not audit_lock.acquire(blocking=False):
+            return jsonify({'error': 'An audit is already running'}), 409
+        try:
+            result = run_audit(blockchain, workers)
+        finally:
+            audit_lock.release()
+        result['validated_height'] = blockchain.validated_height
+        return jsonify(result), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/admin/blobs/gc', methods=['POST'])
+def collect_blobs():
+    """
+    Delete stored content no file record has referenced for BLOB_GC_GRACE
+    seconds, and upload sessions idle for UPLOAD_SESSION_TTL seconds
+    (X-Admin-Token required). Recorded files, superseded versions included,
+    stay referenced, so only content of failed uploads is collected.
+    """
+    try:
+        if not admin_authorized():
+            return jsonify({'error': 'Invalid or unconfigured admin token'}), 403
+        
+        result = blob_store.gc()
+        result['upload_sessions_removed'] = upload_sessions.expire(config.UPLOAD_SESSION_TTL)
+        return jsonify(result), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -306,6 +618,49 @@ def get_file_info(file_hash):
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/api/proof/<file_hash>', methods=['GET'])
+def get_file_proof(file_hash):
+    """
+    Get a Merkle inclusion proof for a file upload
+    Query parameters (optional):
+      through - also return the headers after the upload block up to this height
+    """
+    try:
+        through = request.args.get('through', type=int)
+        if through is not None:
+            through = min(through, len(blockchain.chain) - 1)
+        proof = blockchain.get_file_proof(file_hash, through)
+        
+        if not proof:
+            return jsonify({'error': 'File not found or not sealed yet'}), 404
+        
+        return jsonify(proof), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/headers', methods=['GET'])
+def get_headers():
+    """
+    Get block headers for light clients
+    Query parameters (optional):
+      from  - first height (default 0)
+      limit - number of headers (max 1000)
+    """
+    try:
+        start = max(0, request.args.get('from', 0, type=int))
+        limit = max(1, min(request.args.get('limit', MAX_BLOCK_PAGE, type=int), MAX_BLOCK_PAGE))
+        height = len(blockchain.chain)
+        headers = list(blockchain.iter_proof_headers(start, start + limit))
+        return jsonify({
+            'headers': headers,
+            'next_from': start + len(headers) if start + len(headers) < height else None,
+            'height': height
+        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
 # Smart Contract Endpoints
 @app.route('/api/contract/<file_hash>', methods=['GET'])
 def get_contract(file_hash):
@@ -329,13 +684,10 @@ def grant_permission(file_hash):
         duration_hours = data.get('duration_hours')
         max_downloads = data.get('max_downloads')
         
-        contract = contract_manager.get_contract(file_hash)
+        contract = contract_manager.grant_permission(file_hash, user, duration_hours, max_downloads)
         if not contract:
             return jsonify({'error': 'Contract not found'}), 404
         
-        contract.grant_permission(user, duration_hours, max_downloads)
-        contract_manager.save_to_disk()  # Persist changes
-        
         return jsonify({
             'message': f'Permission granted to {user}',
             'contract': contract.to_dict()
@@ -351,12 +703,10 @@ def revoke_permission(file_hash):
         data = request.get_json()
         user = data.get('user')
         
-        contract = contract_manager.get_contract(file_hash)
-        if not contract:
+        if not contract_manager.get_contract(file_hash):
             return jsonify({'error': 'Contract not found'}), 404
         
-        success = contract.revoke_permission(user)
-        contract_manager.save_to_disk()  # Persist changes
+        success = contract_manager.revoke_permission(file_hash, user)
         
         if success:
             return jsonify({'message': f'Permission revoked from {user}'}), 200
@@ -420,16 +770,79 @@ def get_top_verifiers():
 
 
 # Analytics Endpoints
+def parse_local_time(value):
+    """Parse an ISO 8601 time as naive local time, how transaction timestamps are stored"""
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is not None:
+        moment = moment.astimezone().replace(tzinfo=None)
+    return moment
+
+
 @app.route('/api/analytics', methods=['GET'])
 def get_analytics():
-    """Get detailed analytics data"""
+    """
+    Get detailed analytics data
+    With any of these query parameters, answers a time-range query instead:
+      from        - ISO start time (default: 24 hours before 'to')
+      to          - ISO end time, exclusive (default: now)
+      granularity - timeline buckets: 'minute', 'hour' (default) or 'day'
+    """
     try:
-        analytics = blockchain.get_analytics_data()
+        if not any(name in request.args for name in ('from', 'to', 'granularity')):
+            analytics = blockchain.get_analytics_data()
+            return jsonify(analytics), 200
+        
+        try:
+            end = parse_local_time(request.args['to']) if 'to' in request.args else datetime.now()
+            start = (parse_local_time(request.args['from']) if 'from' in request.args
+                     else end - timedelta(days=1))
+        except ValueError:
+            return jsonify({'error': 'from and to must be ISO 8601 times'}), 400
+        if start >= end:
+            return jsonify({'error': 'from must be before to'}), 400
+        
+        granularity = request.args.get('granularity', 'hour').lower()
+        if granularity not in ('minute', 'hour', 'day'):
+            return jsonify({'error': 'granularity must be minute, hour or day'}), 400
+        
+        analytics = blockchain.get_analytics_range(start, end, granularity)
         return jsonify(analytics), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/api/users/<user>/activity', methods=['GET'])
+def get_user_activity(user):
+    """
+    Get a user's uploads and downloads, newest first
+    Query parameters (all optional):
+      kind   - 'all' (default), 'uploads' or 'downloads'
+      limit  - page size (default 50, max 1000)
+      cursor - next_cursor returned with the previous page
+    """
+    try:
+        kind = request.args.get('kind', 'all').lower()
+        if kind not in ('all', 'uploads', 'downloads'):
+            return jsonify({'error': 'kind must be all, uploads or downloads'}), 400
+        limit = max(1, min(request.args.get('limit', 50, type=int), MAX_BLOCK_PAGE))
+        
+        before = None
+        cursor = request.args.get('cursor')
+        if cursor:
+            try:
+                block_index, tx_index = (int(part) for part in cursor.split(':'))
+            except ValueError:
+                return jsonify({'error': 'Invalid cursor'}), 400
+            before = (block_index, tx_index)
+        
+        page = blockchain.get_user_activity(user, kind, before, limit)
+        if page['next_cursor'] is not None:
+            page['next_cursor'] = '%d:%d' % page['next_cursor']
+        return jsonify(page), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
 @app.route('/api/files/versions/<base_name>', methods=['GET'])
 def get_file_versions(base_name):
     """Get all versions of a file"""
@@ -449,7 +862,9 @@ def search_files():
         file_type = request.args.get('type', '').lower()
         encrypted_only = request.args.get('encrypted', 'false').lower() == 'true'
         
-        files = blockchain.get_all_files()
+        # The uploader filter matches part of the name, case-insensitively,
+        # among the uploaders in the user index
+        files = blockchain.search_files_by_uploader(uploader) if uploader else blockchain.get_all_files()
         
         # Apply filters
         filtered_files = []
@@ -458,10 +873,6 @@ def search_files():
             if query and query not in file['file_name'].lower():
                 continue
             
-            # Uploader filter
-            if uploader and uploader not in file.get('uploader', '').lower():
-                continue
-            
             # File type filter
             if file_type:
                 ext = file['file_name'].split('.')[-1].lower()
@@ -472,12 +883,14 @@ def search_files():
             if encrypted_only and not file.get('is_encrypted', False):
                 continue
             
-            # Add verification status
-            verification = peer_verification.get_file_verification(file['file_hash'])
+            filtered_files.append(file)
+        
+        # Add verification status (one call for the whole result)
+        verifications = peer_verification.get_file_verifications([file['file_hash'] for file in filtered_files])
+        for file in filtered_files:
+            verification = verifications[file['file_hash']]
             file['verification_status'] = verification['status']
             file['authenticity_score'] = verification['authenticity_score']
-            
-            filtered_files.append(file)
         
         return jsonify({
             'files': filtered_files,
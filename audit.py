@@ -0,0 +1,234 @@
+"""
+Parallel full-chain audit
+
+Re-hashes every block and checks its link to the block before it, like
+Blockchain.is_chain_valid(full_audit=True), but splits the chain into
+contiguous ranges checked by a process pool. With log storage each worker
+reads its range straight from the segment files; archived blocks are checked
+against their stubs one compacted segment per task.
+
+Usage:
+    python audit.py                              # one process per CPU
+    python audit.py --workers 4 --chunk-size 50000
+    python audit.py --storage-path data/blockchain.json --difficulty 2
+
+Run it against a stopped app, or with CHAIN_SERVICE_SOCKET set so the chain
+is opened as a read replica of the running writer.
+"""
+import argparse
+import copy
+import json
+import multiprocessing
+import os
+import sys
+import time
+from typing import List, Dict, Any, Optional, Tuple
+
+from block_store import BlockLog
+from blockchain import Block, Blockchain, is_block_valid
+from merkle import merkle_root
+
+
+# Per-process audit state, set up by _init_worker
+_block_log: Optional[BlockLog] = None
+_difficulty = 0
+_min_difficulty: Optional[int] = None
+
+
+def _init_worker(directory: Optional[str], manifest: Optional[Dict[str, Any]],
+                 difficulty: int, min_difficulty: Optional[int]):
+    """Give each pool process a read-only view of the log as it was when the audit started"""
+    global _block_log, _difficulty, _min_difficulty
+    _block_log = None
+    if directory is not None:
+        _block_log = BlockLog(directory, read_only=True)
+        _block_log.manifest = manifest
+    _difficulty = difficulty
+    _min_difficulty = min_difficulty
+
+
+def _first_invalid(block_dicts: List[Dict[str, Any]], start: int, end: int,
+                   previous_hash: str, last_hash: str) -> Optional[int]:
+    """Return the first invalid index of blocks [start, end), given the hashes around them"""
+    for index, block_dict in zip(range(start, end), block_dicts):
+        block = Block.from_dict(block_dict)
+        if block.index != index or not is_block_valid(block, previous_hash, _difficulty, _min_difficulty):
+            return index
+        previous_hash = block.hash
+
+    # A damaged record cuts the range short
+    if len(block_dicts) < end - start:
+        return start + len(block_dicts)
+    # The next range starts from the hash the chain has in memory for this block
+    if previous_hash != last_hash:
+        return end - 1
+    return None
+
+
+def _first_invalid_archive(position: int, previous_hash: Optional[str]) -> Optional[int]:
+    """Return the first archived block of a compacted segment that doesn't match its stub"""
+    segment = _block_log.manifest["segments"][position]
+    try:
+        archived = [Block.from_dict(block_dict) for block_dict in _block_log.read_archive(position)]
+    except OSError:
+        return segment["first_index"]
+
+    hashes = {entry["index"]: entry["hash"] for entry in _block_log.segment_headers(position)}
+    if segment["first_index"] > 0:
+        hashes[segment["first_index"] - 1] = previous_hash
+    for block in archived:
+        if (block.hash != hashes.get(block.index) or
+                not is_block_valid(block, hashes.get(block.index - 1), _difficulty, _min_difficulty)):
+            return block.index
+
+    # The archive must hold exactly the blocks committed to at compaction
+    if (len(archived) != segment["archived_count"] or
+            merkle_root([block.hash for block in archived]) != segment["archive_root"]):
+        return segment["first_index"]
+    return None
+
+
+def _audit_task(task: Tuple) -> Tuple[Tuple, int, Optional[int]]:
+    """
+    Check one range or archive
+    Returns: (task, blocks checked, first invalid index or None); blocks
+    checked is -1 if the files were replaced (compacted) under the audit
+    """
+    kind = task[0]
+    try:
+        if kind == "archive":
+            _, position, previous_hash = task
+            segment = _block_log.manifest["segments"][position]
+            return task, segment["archived_count"], _first_invalid_archive(position, previous_hash)
+
+        _, source, start, end, previous_hash, last_hash = task
+        if kind == "segment":
+            block_dicts = _block_log.read_range(source, start, end)
+        else:
+            block_dicts = source
+        return task, end - start, _first_invalid(block_dicts, start, end, previous_hash, last_hash)
+    except OSError:
+        return task, -1, None
+
+
+def _ranges(start: int, end: int, chunk_size: int):
+    for chunk_start in range(start, end, chunk_size):
+        yield chunk_start, min(chunk_start + chunk_size, end)
+
+
+def run_audit(blockchain: Blockchain, workers: int = 0, chunk_size: int = 20000) -> Dict[str, Any]:
+    """
+    Audit the whole chain in parallel and record the result on the blockchain
+    Returns: dict with valid, first_invalid_index, blocks_checked (chain
+    blocks after genesis), archived_blocks_checked (archived copies of
+    compacted blocks), seconds and blocks_per_second
+    """
+    started = time.perf_counter()
+    workers = workers or os.cpu_count() or 1
+    block_log = blockchain.block_log
+    chain = blockchain.chain
+
+    # Audit the chain as it is now; blocks appended meanwhile are left to
+    # the next incremental check
+    with blockchain._chain_lock:
+        end = len(chain)
+        manifest = copy.deepcopy(block_log.manifest) if block_log is not None else None
+
+    tasks = []
+    if block_log is not None:
+        segments = manifest["segments"]
+        for position, segment in enumerate(segments):
+            segment_end = segments[position + 1]["first_index"] if position + 1 < len(segments) else end
+            for start, stop in _ranges(max(segment["first_index"], 1), min(segment_end, end), chunk_size):
+                tasks.append(("segment", position, start, stop, chain[start - 1].hash, chain[stop - 1].hash))
+            if "archive" in segment:
+                first = segment["first_index"]
+                tasks.append(("archive", position, chain[first - 1].hash if first > 0 else None))
+    else:
+        for start, stop in _ranges(1, end, chunk_size):
+            tasks.append(("blocks", [block.to_dict() for block in chain[start:stop]],
+                          start, stop, chain[start - 1].hash, chain[stop - 1].hash))
+
+    initargs = (block_log.directory if block_log is not None else None, manifest,
+                blockchain.difficulty, blockchain.difficulty_floor)
+    if workers > 1 and len(tasks) > 1:
+        with multiprocessing.Pool(min(workers, len(tasks)), initializer=_init_worker,
+                                  initargs=initargs) as pool:
+            results = list(pool.imap_unordered(_audit_task, tasks))
+    else:
+        _init_worker(*initargs)
+        results = [_audit_task(task) for task in tasks]
+
+    checked = 0
+    archived_checked = 0
+    bad_indexes = []
+    for task, count, bad_index in results:
+        if count < 0:
+            # Compaction replaced these files after the audit started; check
+            # the blocks in memory instead
+            if task[0] == "archive":
+                bad_index = blockchain._first_invalid_archive()
+                count = manifest["segments"][task[1]]["archived_count"]
+            else:
+                bad_index = blockchain._first_invalid_block(task[2], task[3])
+                count = task[3] - task[2]
+        # Archived blocks are copies of stubs already counted in their segment
+        if task[0] == "archive":
+            archived_checked += count
+        else:
+            checked += count
+        if bad_index is not None:
+            bad_indexes.append(bad_index)
+
+    first_invalid = min(bad_indexes) if bad_indexes else None
+    valid = blockchain.record_validation(first_invalid, end, full_audit=True)
+    seconds = time.perf_counter() - started
+    return {
+        "valid": valid,
+        "first_invalid_index": first_invalid,
+        "height": end,
+        "blocks_checked": checked,
+        "archived_blocks_checked": archived_checked,
+        "workers": min(workers, len(tasks)) if workers > 1 and len(tasks) > 1 else 1,
+        "seconds": round(seconds, 3),
+        "blocks_per_second": round(checked / seconds, 1) if seconds else None
+    }
+
+
+def main():
+    from config import get_config
+    from chain_service import ChainClient, create_blockchain
+
+    config = get_config()
+    parser = argparse.ArgumentParser(description="Audit the whole blockchain in parallel")
+    parser.add_argument("--workers", type=int, default=config.AUDIT_WORKERS,
+                        help="audit processes (0 = one per CPU)")
+    parser.add_argument("--chunk-size", type=int, default=20000, help="blocks per task")
+    parser.add_argument("--storage-path", help="chain to audit (default: the configured chain)")
+    parser.add_argument("--difficulty", type=int, help="difficulty of blocks that don't record one")
+    args = parser.parse_args()
+
+    # Audit output must stay machine-readable; progress messages go to stderr
+    stdout = sys.stdout
+    sys.stdout = sys.stderr
+
+    if args.storage_path:
+        blockchain = Blockchain(
+            difficulty=args.difficulty or config.BLOCKCHAIN_DIFFICULTY,
+            storage_path=args.storage_path,
+            storage_format=config.BLOCKCHAIN_STORAGE,
+            mining_workers=1,
+            lazy_load=True
+        )
+    else:
+        writer = ChainClient(config.CHAIN_SERVICE_SOCKET) if config.CHAIN_SERVICE_SOCKET else None
+        blockchain = create_blockchain(config, writer=writer)
+
+    result = run_audit(blockchain, args.workers, args.chunk_size)
+    stdout.write(json.dumps(result, indent=2) + "\n")
+    blockchain.close()
+    sys.exit(0 if result["valid"] else 1)
+
+
+if __name__ == '__main__':
+    main()
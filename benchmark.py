@@ -0,0 +1,264 @@
+"""
+Blockchain benchmark suite
+
+Builds synthetic chains with a realistic upload/download mix and times the
+main Blockchain operations at each size and difficulty. Every configuration
+runs in its own process so memory figures are not shared between runs.
+
+Usage:
+    python benchmark.py                                   # 10k and 100k blocks, difficulty 1 and 2
+    python benchmark.py --sizes 10000,100000,1000000 --difficulties 2,3 --output results.json
+    python benchmark.py --storage log,json --download-ratio 0.9
+"""
+import argparse
+import hashlib
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import List, Dict, Any, Callable
+
+from blockchain import Block, Blockchain
+from merkle import transactions_root
+
+
+FILE_TYPES = ["pdf", "txt", "png", "jpg", "docx", "zip", "mp4", "mp3"]
+
+
+def synthetic_transactions(count: int, download_ratio: float, users: int, seed: int):
+    """Yield a reproducible stream of upload and download transactions"""
+    rng = random.Random(seed)
+    uploaded: List[Dict[str, Any]] = []
+    clock = datetime(2024, 1, 1)
+    for i in range(count):
+        clock += timedelta(seconds=rng.randint(1, 120))
+        timestamp = clock.isoformat()
+        if uploaded and rng.random() < download_ratio:
+            upload = uploaded[rng.randrange(len(uploaded))]
+            yield {
+                "type": "file_download",
+                "file_name": upload["file_name"],
+                "file_hash": upload["file_hash"],
+                "downloader": f"user{rng.randrange(users)}",
+                "timestamp": timestamp
+            }
+            continue
+
+        file_name = f"file{i}.{rng.choice(FILE_TYPES)}"
+        is_encrypted = rng.random() < 0.2
+        upload = {
+            "type": "file_upload",
+            "file_name": file_name,
+            "file_hash": hashlib.sha256(f"{seed}:{i}".encode()).hexdigest(),
+            "file_size": int(rng.lognormvariate(11, 2)),
+            "uploader": f"user{rng.randrange(users)}",
+            "file_path": f"uploads/{file_name}",
+            "is_encrypted": is_encrypted,
+            "salt": "c2FsdHNhbHRzYWx0c2FsdA==" if is_encrypted else None,
+            "version": 1,
+            "previous_version_hash": None,
+            "timestamp": timestamp
+        }
+        uploaded.append(upload)
+        yield upload
+
+
+def build_chain(blockchain: Blockchain, size: int, download_ratio: float, users: int, seed: int):
+    """Mine size - 1 synthetic blocks onto the genesis block, in memory only"""
+    for transaction in synthetic_transactions(size - 1, download_ratio, users, seed):
+        block = Block(
+            index=len(blockchain.chain),
+            timestamp=time.time(),
+            data=transaction,
+            previous_hash=blockchain.get_latest_block().hash,
+            merkle_root=transactions_root([transaction])
+        )
+        blockchain._mine(block)
+        blockchain.chain.append(block)
+        blockchain._index_block(block)
+
+
+def timed(operation: Callable[[], Any], iterations: int = 1) -> Dict[str, Any]:
+    """Run an operation and summarize its timings in milliseconds"""
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        operation()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    total = sum(samples) / 1000
+    return {
+        "iterations": iterations,
+        "total_s": round(total, 6),
+        "mean_ms": round(statistics.mean(samples), 6),
+        "p50_ms": round(samples[len(samples) // 2], 6),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 6),
+        "max_ms": round(samples[-1], 6),
+        "ops_per_sec": round(iterations / total, 2) if total else None
+    }
+
+
+def max_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def run_one(size: int, difficulty: int, storage: str, download_ratio: float,
+            users: int, appends: int, lookups: int, seed: int) -> Dict[str, Any]:
+    """Benchmark one (size, difficulty, storage) configuration"""
+    workdir = tempfile.mkdtemp(prefix="chain-bench-")
+    storage_path = os.path.join(workdir, "blockchain.json")
+    options = dict(difficulty=difficulty, storage_path=storage_path,
+                   storage_format=storage, mining_workers=1)
+    results: Dict[str, Any] = {}
+    try:
+        # Genesis is written on construction; the synthetic blocks stay in
+        # memory until the timed save_to_disk
+        blockchain = Blockchain(**options)
+        start = time.perf_counter()
+        build_chain(blockchain, size, download_ratio, users, seed)
+        build_s = time.perf_counter() - start
+
+        results["save_to_disk"] = timed(blockchain.save_to_disk)
+
+        rng = random.Random(seed)
+        file_hashes = list(blockchain.file_index.latest_by_hash)
+        results["get_file_by_hash"] = timed(
+            lambda: blockchain.get_file_by_hash(file_hashes[rng.randrange(len(file_hashes))]),
+            lookups
+        )
+        results["get_all_files"] = timed(blockchain.get_all_files, 5)
+        results["get_analytics_data"] = timed(blockchain.get_analytics_data, 5)
+        results["is_chain_valid_full"] = timed(lambda: blockchain.is_chain_valid(full_audit=True))
+        results["is_chain_valid"] = timed(blockchain.is_chain_valid, 100)
+
+        transactions = synthetic_transactions(appends, 0.0, users, seed + 1)
+        results["add_file_transaction"] = timed(
+            lambda: blockchain.add_file_transaction(**{
+                key: value for key, value in next(transactions).items()
+                if key not in ("type", "timestamp")
+            }),
+            appends
+        )
+        blockchain.close()
+        build_rss = max_rss_mb()
+
+        # Loading happens in a fresh process so its memory is measured on its own
+        results["load_from_disk"] = json.loads(subprocess.check_output(
+            [sys.executable, __file__, "--load", storage_path, "--difficulties", str(difficulty),
+             "--storage", storage],
+        ))
+        if storage == "log":
+            results["load_from_disk_lazy"] = json.loads(subprocess.check_output(
+                [sys.executable, __file__, "--load", storage_path, "--difficulties", str(difficulty),
+                 "--storage", storage, "--lazy"],
+            ))
+
+        return {
+            "size": size,
+            "difficulty": difficulty,
+            "storage": storage,
+            "download_ratio": download_ratio,
+            "build_s": round(build_s, 3),
+            "disk_bytes": sum(
+                os.path.getsize(os.path.join(root, name))
+                for root, _, names in os.walk(workdir) for name in names
+            ),
+            "max_rss_mb": build_rss,
+            "operations": results
+        }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def run_load(storage_path: str, difficulty: int, storage: str, lazy: bool) -> Dict[str, Any]:
+    """Time opening an existing chain"""
+    options = dict(difficulty=difficulty, storage_path=storage_path, storage_format=storage,
+                   mining_workers=1, lazy_load=lazy)
+    if lazy:
+        # The first lazy open writes the index snapshot later opens start from
+        Blockchain(**options).close()
+    holder = []
+    result = timed(lambda: holder.append(Blockchain(**options)))
+    result["blocks"] = len(holder[0].chain)
+    result["max_rss_mb"] = max_rss_mb()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the blockchain on synthetic chains")
+    parser.add_argument("--sizes", default="10000,100000", help="comma-separated chain lengths")
+    parser.add_argument("--difficulties", default="1,2", help="comma-separated difficulties")
+    parser.add_argument("--storage", default="log", help="comma-separated storage formats (log, json)")
+    parser.add_argument("--download-ratio", type=float, default=0.8,
+                        help="share of transactions that are downloads")
+    parser.add_argument("--users", type=int, default=500, help="number of distinct users")
+    parser.add_argument("--appends", type=int, default=50, help="timed add_file_transaction calls")
+    parser.add_argument("--lookups", type=int, default=10000, help="timed get_file_by_hash calls")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write results to this JSON file instead of stdout")
+    # Internal: run a single configuration / a single load in this process
+    parser.add_argument("--one", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--load", help=argparse.SUPPRESS)
+    parser.add_argument("--lazy", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    # Benchmark output must stay machine-readable; progress messages go to stderr
+    stdout = sys.stdout
+    sys.stdout = sys.stderr
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    difficulties = [int(difficulty) for difficulty in args.difficulties.split(",")]
+    storages = args.storage.split(",")
+
+    if args.load:
+        result = run_load(args.load, difficulties[0], storages[0], args.lazy)
+        stdout.write(json.dumps(result))
+        return
+
+    if args.one:
+        result = run_one(sizes[0], difficulties[0], storages[0], args.download_ratio,
+                         args.users, args.appends, args.lookups, args.seed)
+        stdout.write(json.dumps(result))
+        return
+
+    runs = []
+    for storage in storages:
+        for difficulty in difficulties:
+            for size in sizes:
+                print(f"Benchmarking {size} blocks at difficulty {difficulty} ({storage})...")
+                output = subprocess.check_output([
+                    sys.executable, __file__, "--one",
+                    "--sizes", str(size), "--difficulties", str(difficulty), "--storage", storage,
+                    "--download-ratio", str(args.download_ratio), "--users", str(args.users),
+                    "--appends", str(args.appends), "--lookups", str(args.lookups),
+                    "--seed", str(args.seed)
+                ])
+                runs.append(json.loads(output))
+
+    report = {
+        "generated_at": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "runs": runs
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"✓ Wrote {len(runs)} benchmark runs to {args.output}")
+    else:
+        stdout.write(json.dumps(report, indent=2) + "\n")
+
+
+if __name__ == '__main__':
+    main()
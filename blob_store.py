@@ -0,0 +1,175 @@
+import fcntl
+import hashlib
+import os
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, Tuple, Iterable
+
+
+class BlobStore:
+    """Content-addressed file store with reference counts.
+
+    Each distinct content is stored once, at ``<root>/<aa>/<sha256>``, next
+    to a ``.refs`` file holding the number of file records that point at it.
+    Storing content that is already present only bumps its count, so
+    duplicate uploads cost no disk and no second write.
+
+    A blob whose count drops to zero is not deleted straight away: gc()
+    removes it once it has stayed unreferenced for ``gc_grace`` seconds, so
+    an upload of the same content racing with the release can still claim
+    it. Count updates and gc() hold an exclusive lock on ``<root>/.lock``, so
+    several worker processes can share one store.
+
+    The app takes one reference per upload and never releases it for a
+    recorded file: chain records are permanent and every version stays
+    downloadable by its hash. gc() therefore only reclaims content whose
+    upload failed before its transaction was recorded.
+    """
+
+    TMP_DIR = "tmp"
+
+    def __init__(self, root: str, gc_grace: float = 3600.0):
+        self.root = root
+        self.gc_grace = gc_grace
+        os.makedirs(os.path.join(root, self.TMP_DIR), exist_ok=True)
+
+    def path(self, digest: str) -> str:
+        """Path of the blob with this SHA-256 digest"""
+        return os.path.join(self.root, digest[:2], digest)
+
+    def refs_path(self, digest: str) -> str:
+        return self.path(digest) + ".refs"
+
+    def temp_path(self) -> str:
+        """A fresh temporary path on the same filesystem as the blobs (for atomic renames)"""
+        return os.path.join(self.root, self.TMP_DIR, uuid.uuid4().hex)
+
+    @contextmanager
+    def _locked(self):
+        with open(os.path.join(self.root, ".lock"), 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read_refs(self, digest: str) -> int:
+        try:
+            with open(self.refs_path(digest), 'r') as f:
+                return int(f.read() or 0)
+        except FileNotFoundError:
+            return 0
+
+    def _write_refs(self, digest: str, count: int):
+        tmp_path = self.refs_path(digest) + ".tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(str(count))
+        os.replace(tmp_path, self.refs_path(digest))
+
+    @staticmethod
+    def hash_file(file_path: str) -> str:
+        """Calculate the SHA-256 hex digest of a file"""
+        sha256_hash = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for byte_block in iter(lambda: f.read(1024 * 1024), b""):
+                sha256_hash.update(byte_block)
+        return sha256_hash.hexdigest()
+
+    def put_file(self, file_path: str, digest: Optional[str] = None) -> Tuple[str, int, bool]:
+        """
+        Move a finished file into the store and take one reference to it
+        The file is consumed: renamed into place, or deleted if the content
+        is already stored. Pass digest if the file's SHA-256 is already known.
+        Returns: (digest, size, whether a new blob was written)
+        """
+        digest = digest or self.hash_file(file_path)
+        size = os.path.getsize(file_path)
+        blob_path = self.path(digest)
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+
+        with self._locked():
+            created = not os.path.exists(blob_path)
+            if created:
+                os.replace(file_path, blob_path)
+            else:
+                os.remove(file_path)
+            self._write_refs(digest, self._read_refs(digest) + 1)
+        return digest, size, created
+
+    def put_stream(self, chunks: Iterable[bytes]) -> Tuple[str, int, bool]:
+        """
+        Write chunks to a temporary file, hashing them on the way, then store it
+        Single pass: the content is never read back to hash it.
+        Returns: (digest, size, whether a new blob was written)
+        """
+        temp_path = self.temp_path()
+        sha256_hash = hashlib.sha256()
+        try:
+            with open(temp_path, 'wb') as f:
+                for chunk in chunks:
+                    sha256_hash.update(chunk)
+                    f.write(chunk)
+                f.flush()
+                os.fsync(f.fileno())
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return self.put_file(temp_path, sha256_hash.hexdigest())
+
+    def add_ref(self, digest: str) -> int:
+        """Take another reference to a stored blob; returns the new count"""
+        with self._locked():
+            if not os.path.exists(self.path(digest)):
+                raise FileNotFoundError(f"No blob {digest}")
+            count = self._read_refs(digest) + 1
+            self._write_refs(digest, count)
+        return count
+
+    def release(self, digest: str) -> int:
+        """Drop one reference; an unreferenced blob is left for gc(). Returns the new count"""
+        with self._locked():
+            count = max(0, self._read_refs(digest) - 1)
+            # The refs file's mtime marks when the blob became unreferenced
+            self._write_refs(digest, count)
+        return count
+
+    def refs(self, digest: str) -> int:
+        """Current reference count of a blob"""
+        return self._read_refs(digest)
+
+    def gc(self, now: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Delete blobs that have been unreferenced for longer than gc_grace,
+        and temporary files left by interrupted uploads
+        Returns: dict with blobs_removed and bytes_freed
+        """
+        now = time.time() if now is None else now
+        removed = 0
+        freed = 0
+        with self._locked():
+            for shard in os.listdir(self.root):
+                shard_path = os.path.join(self.root, shard)
+                if len(shard) != 2 or not os.path.isdir(shard_path):
+                    continue
+                for name in os.listdir(shard_path):
+                    if not name.endswith(".refs"):
+                        continue
+                    digest = name[:-len(".refs")]
+                    refs_path = self.refs_path(digest)
+                    if self._read_refs(digest) or now - os.path.getmtime(refs_path) < self.gc_grace:
+                        continue
+                    if os.path.exists(self.path(digest)):
+                        freed += os.path.getsize(self.path(digest))
+                        os.remove(self.path(digest))
+                    os.remove(refs_path)
+                    removed += 1
+
+            tmp_dir = os.path.join(self.root, self.TMP_DIR)
+            for name in os.listdir(tmp_dir):
+                tmp_path = os.path.join(tmp_dir, name)
+                if now - os.path.getmtime(tmp_path) >= self.gc_grace:
+                    os.remove(tmp_path)
+
+        return {"blobs_removed": removed, "bytes_freed": freed}
@@ -0,0 +1,302 @@
+import re
+import struct
+import sys
+from typing import List, Dict, Any, Optional, Tuple, Iterable, Iterator
+
+
+# Marks an optional field that is absent (as opposed to present with None)
+_ABSENT = object()
+
+
+class TransactionRecord:
+    """Slotted transaction record with a fixed field layout.
+
+    to_dict() reproduces the original transaction dictionary exactly
+    (same keys, same order, same values), so blocks built from records hash
+    the same as blocks built from plain dictionaries.
+    """
+
+    __slots__ = ()
+    TYPE: str = None
+    FIELDS: Tuple[str, ...] = ()
+    OPTIONAL: Tuple[str, ...] = ("receipt_id",)
+    # Repeated user-facing strings share one object in memory
+    INTERNED: Tuple[str, ...] = ()
+
+    def __init__(self, values: Iterable[Any]):
+        for name, value in zip(self.FIELDS + self.OPTIONAL, values):
+            setattr(self, name, value)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> Optional['TransactionRecord']:
+        """Build a record, or return None if the dict doesn't match this layout exactly"""
+        keys = list(data)
+        fixed = 1 + len(cls.FIELDS)
+        if keys[:fixed] != ["type", *cls.FIELDS] or keys[fixed:] != [
+                name for name in cls.OPTIONAL if name in data]:
+            return None
+
+        values = []
+        for name in cls.FIELDS + cls.OPTIONAL:
+            value = data.get(name, _ABSENT)
+            if name in cls.INTERNED and isinstance(value, str):
+                value = sys.intern(value)
+            values.append(value)
+        return cls(values)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert record back to its transaction dictionary"""
+        data = {"type": self.TYPE}
+        for name in self.FIELDS:
+            data[name] = getattr(self, name)
+        for name in self.OPTIONAL:
+            value = getattr(self, name)
+            if value is not _ABSENT:
+                data[name] = value
+        return data
+
+
+class FileUploadRecord(TransactionRecord):
+    TYPE = "file_upload"
+    FIELDS = ("file_name", "file_hash", "file_size", "uploader", "file_path",
+              "is_encrypted", "salt", "version", "previous_version_hash", "timestamp")
+    INTERNED = ("uploader",)
+    __slots__ = FIELDS + TransactionRecord.OPTIONAL
+
+
+class FileDownloadRecord(TransactionRecord):
+    TYPE = "file_download"
+    FIELDS = ("file_name", "file_hash", "downloader", "timestamp")
+    INTERNED = ("file_name", "downloader")
+    __slots__ = FIELDS + TransactionRecord.OPTIONAL
+
+
+class GenesisRecord(TransactionRecord):
+    TYPE = "genesis"
+    FIELDS = ("message",)
+    __slots__ = FIELDS + TransactionRecord.OPTIONAL
+
+
+RECORD_TYPES = [FileUploadRecord, FileDownloadRecord, GenesisRecord]
+RECORDS_BY_TYPE = {record_type.TYPE: record_type for record_type in RECORD_TYPES}
+
+
+def make_record(data: Dict[str, Any]) -> Any:
+    """Convert a transaction dict to a typed record when it has a known layout"""
+    record_type = RECORDS_BY_TYPE.get(data.get("type")) if isinstance(data, dict) else None
+    if record_type is not None:
+        record = record_type.from_dict(data)
+        if record is not None:
+            return record
+    return data
+
+
+# Binary encoding
+#
+# Values are tagged. Integers are zigzag varints, floats are IEEE doubles
+# (so timestamps round-trip exactly), 64-character lowercase hex strings
+# are stored as 32 raw bytes, and other strings go through a string table:
+# the first occurrence is written inline and later ones as a table reference.
+# Typed transactions are written as their field values in layout order.
+
+BINARY_VERSION = 1
+STREAM_MAGIC = b"FSBC"
+
+TAG_NONE, TAG_FALSE, TAG_TRUE, TAG_INT, TAG_FLOAT = 0, 1, 2, 3, 4
+TAG_STR, TAG_STR_REF, TAG_HEX32, TAG_LIST, TAG_DICT, TAG_RECORD = 5, 6, 7, 8, 9, 10
+
+_DOUBLE = struct.Struct(">d")
+_HEX32 = re.compile(r"[0-9a-f]{64}")
+_BLOCK_FIELDS = ("index", "timestamp", "previous_hash", "nonce", "hash", "data")
+
+
+class StringTable:
+    """Strings seen so far in an encoded stream"""
+
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self.strings: List[str] = []
+
+
+def _write_varint(out: bytearray, value: int):
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return
+
+
+def _read_varint(buf: bytes, pos: int) -> Tuple[int, int]:
+    result = 0
+    shift = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+
+
+def _write_value(out: bytearray, value: Any, table: StringTable):
+    if value is None or value is _ABSENT:
+        out.append(TAG_NONE)
+    elif value is True:
+        out.append(TAG_TRUE)
+    elif value is False:
+        out.append(TAG_FALSE)
+    elif isinstance(value, int):
+        out.append(TAG_INT)
+        _write_varint(out, (value << 1) if value >= 0 else ((-value << 1) - 1))
+    elif isinstance(value, float):
+        out.append(TAG_FLOAT)
+        out += _DOUBLE.pack(value)
+    elif isinstance(value, str):
+        if len(value) == 64 and _HEX32.fullmatch(value):
+            out.append(TAG_HEX32)
+            out += bytes.fromhex(value)
+        elif value in table.ids:
+            out.append(TAG_STR_REF)
+            _write_varint(out, table.ids[value])
+        else:
+            encoded = value.encode()
+            out.append(TAG_STR)
+            _write_varint(out, len(encoded))
+            out += encoded
+            table.ids[value] = len(table.ids)
+    elif isinstance(value, (list, tuple)):
+        out.append(TAG_LIST)
+        _write_varint(out, len(value))
+        for item in value:
+            _write_value(out, item, table)
+    elif isinstance(value, dict):
+        record = make_record(value)
+        if isinstance(record, TransactionRecord):
+            out.append(TAG_RECORD)
+            out.append(RECORD_TYPES.index(type(record)))
+            for name in record.FIELDS:
+                _write_value(out, getattr(record, name), table)
+            present = [i for i, name in enumerate(record.OPTIONAL)
+                       if getattr(record, name) is not _ABSENT]
+            _write_varint(out, len(present))
+            for i in present:
+                _write_varint(out, i)
+                _write_value(out, getattr(record, record.OPTIONAL[i]), table)
+        else:
+            out.append(TAG_DICT)
+            _write_varint(out, len(value))
+            for key, item in value.items():
+                _write_value(out, key, table)
+                _write_value(out, item, table)
+    else:
+        raise TypeError(f"Cannot encode value of type {type(value).__name__}")
+
+
+def _read_value(buf: bytes, pos: int, table: StringTable) -> Tuple[Any, int]:
+    tag = buf[pos]
+    pos += 1
+    if tag == TAG_NONE:
+        return None, pos
+    if tag == TAG_TRUE:
+        return True, pos
+    if tag == TAG_FALSE:
+        return False, pos
+    if tag == TAG_INT:
+        raw, pos = _read_varint(buf, pos)
+        return (raw >> 1) if not raw & 1 else -((raw + 1) >> 1), pos
+    if tag == TAG_FLOAT:
+        return _DOUBLE.unpack_from(buf, pos)[0], pos + _DOUBLE.size
+    if tag == TAG_STR:
+        length, pos = _read_varint(buf, pos)
+        value = bytes(buf[pos:pos + length]).decode()
+        table.strings.append(value)
+        return value, pos + length
+    if tag == TAG_STR_REF:
+        ref, pos = _read_varint(buf, pos)
+        return table.strings[ref], pos
+    if tag == TAG_HEX32:
+        return bytes(buf[pos:pos + 32]).hex(), pos + 32
+    if tag == TAG_LIST:
+        count, pos = _read_varint(buf, pos)
+        items = []
+        for _ in range(count):
+            item, pos = _read_value(buf, pos, table)
+            items.append(item)
+        return items, pos
+    if tag == TAG_DICT:
+        count, pos = _read_varint(buf, pos)
+        value = {}
+        for _ in range(count):
+            key, pos = _read_value(buf, pos, table)
+            value[key], pos = _read_value(buf, pos, table)
+        return value, pos
+    if tag == TAG_RECORD:
+        record_type = RECORD_TYPES[buf[pos]]
+        pos += 1
+        value = {"type": record_type.TYPE}
+        for name in record_type.FIELDS:
+            value[name], pos = _read_value(buf, pos, table)
+        count, pos = _read_varint(buf, pos)
+        for _ in range(count):
+            i, pos = _read_varint(buf, pos)
+            value[record_type.OPTIONAL[i]], pos = _read_value(buf, pos, table)
+        return value, pos
+    raise ValueError(f"Unknown value tag {tag} at offset {pos - 1}")
+
+
+def encode_block_dict(block_dict: Dict[str, Any], table: Optional[StringTable] = None) -> bytes:
+    """Encode a block dictionary in the compact binary format"""
+    table = table or StringTable()
+    out = bytearray([BINARY_VERSION])
+    for name in _BLOCK_FIELDS:
+        _write_value(out, block_dict[name], table)
+    # Optional header fields (merkle_root, mining_time, ...) travel as a dict
+    _write_value(out, {key: value for key, value in block_dict.items()
+                       if key not in _BLOCK_FIELDS}, table)
+    return bytes(out)
+
+
+def decode_block_dict(buf: bytes, pos: int = 0,
+                      table: Optional[StringTable] = None) -> Tuple[Dict[str, Any], int]:
+    """
+    Decode one binary block
+    Returns: (block_dict, position after the block)
+    """
+    table = table or StringTable()
+    if buf[pos] != BINARY_VERSION:
+        raise ValueError(f"Unsupported block encoding version {buf[pos]}")
+    pos += 1
+    block_dict = {}
+    for name in _BLOCK_FIELDS:
+        block_dict[name], pos = _read_value(buf, pos, table)
+    extras, pos = _read_value(buf, pos, table)
+    block_dict.update(extras)
+    return block_dict, pos
+
+
+def iter_encode_blocks(block_dicts: Iterable[Dict[str, Any]]) -> Iterator[bytes]:
+    """Encode a stream of blocks sharing one string table (for transfer)"""
+    table = StringTable()
+    yield STREAM_MAGIC
+    for block_dict in block_dicts:
+        encoded = encode_block_dict(block_dict, table)
+        prefix = bytearray()
+        _write_varint(prefix, len(encoded))
+        yield bytes(prefix) + encoded
+
+
+def decode_blocks(buf: bytes) -> List[Dict[str, Any]]:
+    """Decode a stream produced by iter_encode_blocks"""
+    if buf[:len(STREAM_MAGIC)] != STREAM_MAGIC:
+        raise ValueError("Not a binary block stream")
+    table = StringTable()
+    pos = len(STREAM_MAGIC)
+    blocks = []
+    while pos < len(buf):
+        _, pos = _read_varint(buf, pos)
+        block_dict, pos = decode_block_dict(buf, pos, table)
+        blocks.append(block_dict)
+    return blocks
@@ -0,0 +1,667 @@
+import atexit
+import functools
+import itertools
+import json
+import mmap
+import os
+import shutil
+import struct
+import sys
+import time
+import zlib
+from typing import List, Dict, Any, Optional, Tuple, Callable
+from block_codec import encode_block_dict, decode_block_dict
+from merkle import merkle_root
+
+
+# Every record is a fixed header (payload length, CRC32 of payload) followed
+# by the encoding of one block (compact JSON or the binary block codec).
+RECORD_HEADER = struct.Struct(">II")
+
+# Payload type of a block whose full record was moved to an archive segment
+ARCHIVED_TYPE = "archived"
+
+
+def header_entry(block_dict: Dict[str, Any], segment: int, offset: int,
+                 length: int) -> Dict[str, Any]:
+    """Build the header index entry for a block record"""
+    data = block_dict.get("data", {})
+    entry = {
+        "index": block_dict["index"],
+        "hash": block_dict["hash"],
+        "type": data.get("type"),
+        "file_hash": data.get("file_hash"),
+        "timestamp": block_dict["timestamp"],
+        "previous_hash": block_dict["previous_hash"],
+        "nonce": block_dict["nonce"],
+        "segment": segment,
+        "offset": offset,
+        "length": length
+    }
+    for optional in ("merkle_root", "difficulty", "mining_time"):
+        if block_dict.get(optional) is not None:
+            entry[optional] = block_dict[optional]
+    return entry
+
+
+class BlockLog:
+    """Append-only, segmented block log with a small JSON manifest.
+
+    Blocks are written as length-prefixed, checksummed records to the active
+    segment. Sealed segments are listed in ``manifest.json``; the active
+    (last) segment is the only file that is ever appended to. Writes are
+    flushed to the OS on every append and fsynced in batches.
+
+    Each segment has a ``.idx`` sidecar with one JSON header entry per block
+    (hash, type, file_hash, byte offset, ...), so a chain can be opened from
+    headers alone and payloads read on demand from memory-mapped segments.
+
+    Sealed segments can be compacted: selected blocks are moved, unchanged,
+    to ``archive/`` and replaced in the hot segment by header-only stubs,
+    with a Merkle root over the archived block hashes kept in the manifest.
+
+    Record payloads are either compact JSON or the binary block encoding
+    from ``block_codec``; every record says which it is, so a log can switch
+    format without being rewritten.
+    """
+
+    MANIFEST_NAME = "manifest.json"
+    ARCHIVE_DIR = "archive"
+    FORMAT_VERSION = 1
+
+    def __init__(self, directory: str, segment_max_bytes: int = 64 * 1024 * 1024,
+                 fsync_every: int = 32, fsync_interval: float = 1.0,
+                 cache_size: int = 1024, record_format: str = "json",
+                 read_only: bool = False):
+        self.directory = directory
+        self.record_format = record_format
+        # Read-only logs never write; they follow another process's appends with tail()
+        self.read_only = read_only
+        self.segment_max_bytes = segment_max_bytes
+        self.fsync_every = max(1, fsync_every)
+        self.fsync_interval = fsync_interval
+        self.manifest: Dict[str, Any] = {
+            "format": self.FORMAT_VERSION,
+            "difficulty": None,
+            "min_difficulty": None,
+            "segments": []
+        }
+        self.height = 0
+        self._active = None
+        self._active_idx = None
+        self._active_count = 0
+        self._maps: Dict[int, mmap.mmap] = {}
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._atexit_registered = False
+        self._tail = (None, 0)
+        self._manifest_stamp = None
+
+        # Recently read payloads; keeps lazy reads cheap without growing memory
+        self.read_block = functools.lru_cache(maxsize=cache_size)(self._read_block)
+
+        os.makedirs(directory, exist_ok=True)
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.directory, self.MANIFEST_NAME)
+
+    def exists(self) -> bool:
+        """Check whether a log has already been created in this directory"""
+        return os.path.exists(self.manifest_path)
+
+    def segment_path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def index_path(self, name: str) -> str:
+        return os.path.join(self.directory, os.path.splitext(name)[0] + ".idx")
+
+    def rollup_path(self, name: str) -> str:
+        return os.path.join(self.directory, os.path.splitext(name)[0] + ".rollup.json")
+
+    @staticmethod
+    def _stamp(path: str) -> Tuple[int, int]:
+        # The manifest is replaced, not rewritten, so a new inode means a new manifest
+        stat = os.stat(path)
+        return stat.st_ino, stat.st_mtime_ns
+
+    def _write_manifest(self):
+        """Atomically replace the manifest file"""
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.manifest, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.manifest_path)
+
+    @staticmethod
+    def encode_record(block_dict: Dict[str, Any], record_format: str = "json") -> bytes:
+        """Encode one block as a length-prefixed, checksummed record"""
+        if record_format == "binary":
+            payload = encode_block_dict(block_dict)
+        else:
+            payload = json.dumps(block_dict, separators=(",", ":")).encode()
+        return RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+    @staticmethod
+    def decode_payload(payload: bytes) -> Dict[str, Any]:
+        """Decode a record payload in either format"""
+        # JSON records always start with '{'; binary ones with a version byte
+        if payload[:1] == b"{":
+            return json.loads(payload)
+        return decode_block_dict(payload)[0]
+
+    @staticmethod
+    def scan_segment(path: str, start: int = 0) -> Tuple[List[Tuple[int, int, Dict[str, Any]]], int, int]:
+        """
+        Read every intact record of a segment file from byte offset start
+        Returns: (list of (offset, payload length, block_dict),
+                  end of last good record, file size)
+        """
+        records = []
+        with open(path, 'rb') as f:
+            f.seek(start)
+            buf = f.read()
+
+        offset = 0
+        size = len(buf)
+        while offset + RECORD_HEADER.size <= size:
+            length, crc = RECORD_HEADER.unpack_from(buf, offset)
+            payload_start = offset + RECORD_HEADER.size
+            end = payload_start + length
+            if end > size:
+                break
+            payload = buf[payload_start:end]
+            if zlib.crc32(payload) != crc:
+                break
+            try:
+                block_dict = BlockLog.decode_payload(payload)
+            except (ValueError, IndexError):
+                break
+            records.append((start + offset, length, block_dict))
+            offset = end
+
+        return records, start + offset, start + size
+
+    def create(self, difficulty: Optional[int] = None, min_difficulty: Optional[int] = None):
+        """Start a new, empty log"""
+        self.manifest = {
+            "format": self.FORMAT_VERSION,
+            "difficulty": difficulty,
+            "min_difficulty": min_difficulty,
+            "segments": [{"name": self._segment_name(0), "first_index": 0}]
+        }
+        name = self.manifest["segments"][0]["name"]
+        open(self.segment_path(name), 'wb').close()
+        open(self.index_path(name), 'wb').close()
+        self._write_manifest()
+        self.height = 0
+        self._open_active(0)
+
+    def _load_manifest(self) -> List[Dict[str, Any]]:
+        self._manifest_stamp = self._stamp(self.manifest_path)
+        with open(self.manifest_path, 'r') as f:
+            self.manifest = json.load(f)
+        self._close_maps()
+        self.read_block.cache_clear()
+        return self.manifest.get("segments", [])
+
+    def _recover_segment(self, position: int, path: str, good_end: int, size: int):
+        """Truncate a torn tail record; only the active segment may have one"""
+        name = self.manifest["segments"][position]["name"]
+        if position != len(self.manifest["segments"]) - 1:
+            raise ValueError(f"Corrupted sealed segment {name} at offset {good_end}")
+        # Crash recovery: drop the partially written tail record
+        with open(path, 'r+b') as f:
+            f.truncate(good_end)
+            f.flush()
+            os.fsync(f.fileno())
+        print(f"⚠ Truncated torn record in {name} ({size - good_end} bytes)")
+
+    def _write_index(self, name: str, entries: List[Dict[str, Any]]):
+        """Rewrite a segment's header index"""
+        tmp_path = self.index_path(name) + ".tmp"
+        with open(tmp_path, 'w') as f:
+            for entry in entries:
+                f.write(json.dumps(entry, separators=(",", ":")) + "\n")
+        os.replace(tmp_path, self.index_path(name))
+
+    def _read_index(self, name: str) -> List[Dict[str, Any]]:
+        """Read a segment's header index, stopping at the first torn line"""
+        entries = []
+        if not os.path.exists(self.index_path(name)):
+            return entries
+        with open(self.index_path(name), 'r') as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    break
+        return entries
+
+    def open(self) -> List[Dict[str, Any]]:
+        """
+        Load all blocks from the log, truncating a torn last record
+        Returns: list of block dictionaries in chain order
+        """
+        blocks = []
+        segments = self._load_manifest()
+        for position, segment in enumerate(segments):
+            path = self.segment_path(segment["name"])
+            if not os.path.exists(path):
+                if self.read_only:
+                    continue
+                open(path, 'ab').close()
+            records, good_end, size = self.scan_segment(path)
+            # A read-only log leaves a torn tail to the writer that owns it
+            if good_end < size and not self.read_only:
+                self._recover_segment(position, path, good_end, size)
+
+            for _, _, block_dict in records:
+                if block_dict.get("index") != len(blocks):
+                    raise ValueError(f"Out-of-order block {block_dict.get('index')} in {segment['name']}")
+                blocks.append(block_dict)
+
+            # Keep the header index in step with the records we just read
+            if not self.read_only and len(self._read_index(segment["name"])) != len(records):
+                self._write_index(segment["name"], [
+                    header_entry(block_dict, position, offset, length)
+                    for offset, length, block_dict in records
+                ])
+
+            self._active_count = len(records)
+            self._tail = (segment["name"], good_end)
+
+        self.height = len(blocks)
+        if not self.read_only:
+            self._open_active(self._active_count)
+        return blocks
+
+    def tail(self) -> List[Dict[str, Any]]:
+        """
+        Read blocks another process appended since open() or the last tail()
+        Returns: list of new block dictionaries in chain order
+        """
+        name, offset = self._tail
+        if self._stamp(self.manifest_path) != self._manifest_stamp:
+            self._load_manifest()
+        elif name and os.path.getsize(self.segment_path(name)) == offset:
+            return []
+
+        segments = self.manifest["segments"]
+        position = max(p for p, segment in enumerate(segments) if segment["first_index"] <= self.height)
+        blocks = []
+        while True:
+            segment = segments[position]
+            if segment["name"] != name:
+                # Moved on to the next segment, or this one was compacted
+                name, offset = segment["name"], 0
+            records, offset, _ = self.scan_segment(self.segment_path(name), offset)
+            for _, _, block_dict in records:
+                if block_dict["index"] < self.height:
+                    continue
+                if block_dict["index"] != self.height:
+                    raise ValueError(f"Out-of-order block {block_dict['index']} in {name}")
+                blocks.append(block_dict)
+                self.height += 1
+
+            if position + 1 < len(segments) and self.height >= segments[position + 1]["first_index"]:
+                position += 1
+                continue
+            break
+
+        self._tail = (name, offset)
+        return blocks
+
+    def open_headers(self) -> List[Dict[str, Any]]:
+        """
+        Load only the header index entries of every block
+        Segments are scanned only where their index is missing or behind.
+        Returns: list of header entries in chain order
+        """
+        headers = []
+        segments = self._load_manifest()
+        for position, segment in enumerate(segments):
+            path = self.segment_path(segment["name"])
+            if not os.path.exists(path):
+                open(path, 'ab').close()
+            size = os.path.getsize(path)
+
+            # Trust index entries that are contiguous and fully inside the segment
+            entries = []
+            for entry in self._read_index(segment["name"]):
+                expected = segment["first_index"] + len(entries)
+                end = entry.get("offset", 0) + RECORD_HEADER.size + entry.get("length", 0)
+                if entry.get("index") != expected or end > size:
+                    break
+                entries.append(entry)
+
+            scan_from = 0
+            if entries:
+                scan_from = entries[-1]["offset"] + RECORD_HEADER.size + entries[-1]["length"]
+
+            if scan_from < size:
+                records, good_end, size = self.scan_segment(path, scan_from)
+                if good_end < size:
+                    self._recover_segment(position, path, good_end, size)
+                for offset, length, block_dict in records:
+                    entries.append(header_entry(block_dict, position, offset, length))
+
+            if len(entries) != len(self._read_index(segment["name"])):
+                self._write_index(segment["name"], entries)
+
+            for entry in entries:
+                if entry["index"] != len(headers):
+                    raise ValueError(f"Out-of-order block {entry['index']} in {segment['name']}")
+                headers.append(entry)
+
+            self._active_count = len(entries)
+
+        self.height = len(headers)
+        self._open_active(self._active_count)
+        return headers
+
+    def _read_block(self, segment: int, offset: int, length: int) -> Dict[str, Any]:
+        """Read one block record from a memory-mapped segment"""
+        start = offset + RECORD_HEADER.size
+        segment_map = self._maps.get(segment)
+        if segment_map is None or len(segment_map) < start + length:
+            # The active segment grows, so its map is refreshed on demand
+            if segment_map is not None:
+                segment_map.close()
+            if self._active and segment == len(self.manifest["segments"]) - 1:
+                self._active.flush()
+            with open(self.segment_path(self.manifest["segments"][segment]["name"]), 'rb') as f:
+                segment_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._maps[segment] = segment_map
+        return self.decode_payload(segment_map[start:start + length])
+
+    def _close_maps(self):
+        for segment_map in self._maps.values():
+            segment_map.close()
+        self._maps = {}
+
+    def _segment_name(self, number: int) -> str:
+        return f"segment-{number:06d}.log"
+
+    def _open_active(self, count: int):
+        if self._active:
+            self._active.close()
+            self._active_idx.close()
+        name = self.manifest["segments"][-1]["name"]
+        self._active = open(self.segment_path(name), 'ab')
+        self._active_idx = open(self.index_path(name), 'a')
+        self._active_count = count
+        if not self._atexit_registered:
+            atexit.register(self.close)
+            self._atexit_registered = True
+
+    def _roll_segment(self):
+        """Seal the active segment and start a new one"""
+        self.sync()
+        sealed = self.manifest["segments"][-1]
+        sealed["count"] = self._active_count
+        sealed["bytes"] = self._active.tell()
+        self.manifest["segments"].append({
+            "name": self._segment_name(len(self.manifest["segments"])),
+            "first_index": self.height
+        })
+        name = self.manifest["segments"][-1]["name"]
+        open(self.segment_path(name), 'ab').close()
+        open(self.index_path(name), 'ab').close()
+        self._write_manifest()
+        self._open_active(0)
+
+    def append(self, block_dict: Dict[str, Any]):
+        """Append one block record to the active segment"""
+        if block_dict.get("index") != self.height:
+            raise ValueError(f"Expected block {self.height}, got {block_dict.get('index')}")
+
+        if self._active_count and self._active.tell() >= self.segment_max_bytes:
+            self._roll_segment()
+
+        offset = self._active.tell()
+        record = self.encode_record(block_dict, self.record_format)
+        self._active.write(record)
+        self._active.flush()
+        entry = header_entry(block_dict, len(self.manifest["segments"]) - 1,
+                             offset, len(record) - RECORD_HEADER.size)
+        self._active_idx.write(json.dumps(entry, separators=(",", ":")) + "\n")
+        self._active_idx.flush()
+        self._active_count += 1
+        self.height += 1
+        self._unsynced += 1
+
+        if (self._unsynced >= self.fsync_every or
+                time.monotonic() - self._last_sync >= self.fsync_interval):
+            self.sync()
+
+    def sync(self):
+        """Force buffered records to stable storage"""
+        if self._active and self._unsynced:
+            self._active.flush()
+            os.fsync(self._active.fileno())
+            os.fsync(self._active_idx.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def set_difficulty(self, difficulty: int):
+        """Record the chain difficulty in the manifest"""
+        if self.manifest.get("difficulty") != difficulty:
+            self.manifest["difficulty"] = difficulty
+            self._write_manifest()
+
+    def set_min_difficulty(self, min_difficulty: int):
+        """Record the lowest difficulty the chain's blocks may record"""
+        if self.manifest.get("min_difficulty") != min_difficulty:
+            self.manifest["min_difficulty"] = min_difficulty
+            self._write_manifest()
+
+    def close(self):
+        """Sync and close the active segment"""
+        if self._active:
+            self.sync()
+            self._active.close()
+            self._active_idx.close()
+            self._active = None
+        self._close_maps()
+
+    def segment_end(self, position: int) -> int:
+        """Height just past the last block of a segment"""
+        segments = self.manifest["segments"]
+        if position + 1 < len(segments):
+            return segments[position + 1]["first_index"]
+        return self.height
+
+    def read_range(self, position: int, start: int, end: int) -> List[Dict[str, Any]]:
+        """
+        Read blocks [start, end) of one segment straight from its file
+        The segment's header index locates the byte range; records are read
+        in one pass and stop at the first one that fails its checksum.
+        Returns: block dicts in index order (short if a record is damaged)
+        """
+        segment = self.manifest["segments"][position]
+        first = segment["first_index"]
+        with open(self.index_path(segment["name"]), 'r') as f:
+            # Index lines are in block order, so only the wanted ones are parsed
+            entries = [json.loads(line) for line in itertools.islice(f, start - first, end - first)]
+        if not entries:
+            return []
+
+        begin = entries[0]["offset"]
+        with open(self.segment_path(segment["name"]), 'rb') as f:
+            f.seek(begin)
+            buf = f.read(entries[-1]["offset"] + RECORD_HEADER.size + entries[-1]["length"] - begin)
+
+        blocks = []
+        offset = 0
+        while offset + RECORD_HEADER.size <= len(buf):
+            length, crc = RECORD_HEADER.unpack_from(buf, offset)
+            payload = buf[offset + RECORD_HEADER.size:offset + RECORD_HEADER.size + length]
+            if len(payload) != length or zlib.crc32(payload) != crc:
+                break
+            try:
+                blocks.append(self.decode_payload(payload))
+            except (ValueError, IndexError):
+                break
+            offset += RECORD_HEADER.size + length
+        return blocks
+
+    def segment_headers(self, position: int) -> List[Dict[str, Any]]:
+        """Read the header index entries of one segment"""
+        return self._read_index(self.manifest["segments"][position]["name"])
+
+    def compact_segment(self, position: int, archivable: Callable[[Dict[str, Any]], bool],
+                        summarize: Callable[[List[Dict[str, Any]]], Dict[str, Any]]
+                        ) -> Optional[List[Dict[str, Any]]]:
+        """
+        Move the archivable blocks of a sealed segment to an archive segment
+        The original segment file is kept byte-for-byte under ``archive/``;
+        the hot copy keeps every block's header (hashes, nonce, linkage) with a
+        stub payload, and summarize(archived blocks) is saved next to it as
+        the segment's rollup. The manifest update is the commit point.
+        Returns: the new header entries of the segment, or None if nothing
+        was compacted
+        """
+        segments = self.manifest["segments"]
+        segment = segments[position]
+        if position >= len(segments) - 1 or "archive" in segment:
+            return None
+
+        path = self.segment_path(segment["name"])
+        records, good_end, size = self.scan_segment(path)
+        if good_end < size:
+            raise ValueError(f"Corrupted sealed segment {segment['name']} at offset {good_end}")
+
+        archived = [block_dict for _, _, block_dict in records if archivable(block_dict)]
+        if not archived:
+            return None
+
+        # Keep the full records: hard link the sealed segment into the archive
+        os.makedirs(os.path.join(self.directory, self.ARCHIVE_DIR), exist_ok=True)
+        archive_name = os.path.join(self.ARCHIVE_DIR, segment["name"])
+        archive_path = self.segment_path(archive_name)
+        if os.path.exists(archive_path):
+            os.remove(archive_path)
+        try:
+            os.link(path, archive_path)
+        except OSError:
+            shutil.copyfile(path, archive_path)
+
+        # Write the compacted segment, its index and rollup under a new name
+        archived_indexes = {block_dict["index"] for block_dict in archived}
+        name = os.path.splitext(segment["name"])[0] + ".compacted.log"
+        entries = []
+        with open(self.segment_path(name), 'wb') as f:
+            for _, _, block_dict in records:
+                if block_dict["index"] in archived_indexes:
+                    stub = {
+                        "index": block_dict["index"],
+                        "timestamp": block_dict["timestamp"],
+                        "data": {"type": ARCHIVED_TYPE},
+                        "previous_hash": block_dict["previous_hash"],
+                        "nonce": block_dict["nonce"],
+                        "hash": block_dict["hash"]
+                    }
+                    # The recorded difficulty is still needed to check the stub's proof of work
+                    if block_dict.get("difficulty") is not None:
+                        stub["difficulty"] = block_dict["difficulty"]
+                    block_dict = stub
+                record = self.encode_record(block_dict, self.record_format)
+                entries.append(header_entry(block_dict, position, f.tell(),
+                                            len(record) - RECORD_HEADER.size))
+                f.write(record)
+            f.flush()
+            os.fsync(f.fileno())
+        self._write_index(name, entries)
+
+        tmp_path = self.rollup_path(name) + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(summarize(archived), f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.rollup_path(name))
+
+        segments[position] = {
+            **segment,
+            "name": name,
+            "bytes": sum(RECORD_HEADER.size + entry["length"] for entry in entries),
+            "archive": archive_name,
+            "archive_root": merkle_root([block_dict["hash"] for block_dict in archived]),
+            "archived_count": len(archived)
+        }
+        self._write_manifest()
+
+        # The old hot files are now only reachable through the archive link
+        os.remove(path)
+        if os.path.exists(self.index_path(segment["name"])):
+            os.remove(self.index_path(segment["name"]))
+        segment_map = self._maps.pop(position, None)
+        if segment_map is not None:
+            segment_map.close()
+        self.read_block.cache_clear()
+        return entries
+
+    def compacted_segments(self) -> List[Tuple[int, Dict[str, Any]]]:
+        """
+        List compacted segments
+        Returns: list of (position, manifest entry)
+        """
+        return [(position, segment) for position, segment in enumerate(self.manifest["segments"])
+                if "archive" in segment]
+
+    def segment_entries(self, position: int) -> List[Dict[str, Any]]:
+        """Read the header index entries of the segment at position"""
+        return self._read_index(self.manifest["segments"][position]["name"])
+
+    def load_rollup(self, position: int) -> Dict[str, Any]:
+        """Read the rollup saved when a segment was compacted"""
+        with open(self.rollup_path(self.manifest["segments"][position]["name"]), 'r') as f:
+            return json.load(f)
+
+    def read_archive(self, position: int) -> List[Dict[str, Any]]:
+        """Read the full records of a compacted segment's archived blocks"""
+        segment = self.manifest["segments"][position]
+        records, _, _ = self.scan_segment(self.segment_path(segment["archive"]))
+        stubs = {entry["index"] for entry in self._read_index(segment["name"])
+                 if entry["type"] == ARCHIVED_TYPE}
+        return [block_dict for _, _, block_dict in records if block_dict["index"] in stubs]
+
+    def import_json(self, json_path: str) -> int:
+        """Convert a legacy ``blockchain.json`` file into a fresh log"""
+        with open(json_path, 'r') as f:
+            blockchain_data = json.load(f)
+
+        self.create(blockchain_data.get("difficulty"), blockchain_data.get("min_difficulty"))
+        for block_dict in blockchain_data.get("chain", []):
+            self.append(block_dict)
+        self.sync()
+        return self.height
+
+    def export_json(self, json_path: str) -> int:
+        """Write the log out in the legacy ``blockchain.json`` format"""
+        blocks = self.open()
+        with open(json_path, 'w') as f:
+            json.dump({
+                "difficulty": self.manifest.get("difficulty"),
+                "min_difficulty": self.manifest.get("min_difficulty"),
+                "chain": blocks
+            }, f, indent=2)
+        return len(blocks)
+
+
+if __name__ == '__main__':
+    # Usage: python block_store.py import|export <blockchain.json> <log directory>
+    if len(sys.argv) != 4 or sys.argv[1] not in ("import", "export"):
+        print("Usage: python block_store.py import|export <blockchain.json> <log directory>")
+        sys.exit(1)
+
+    command, json_file, log_dir = sys.argv[1:]
+    log = BlockLog(log_dir)
+    if command == "import":
+        count = log.import_json(json_file)
+        print(f"✓ Imported {count} blocks into {log_dir}")
+    else:
+        count = log.export_json(json_file)
+        print(f"✓ Exported {count} blocks to {json_file}")
+    log.close()
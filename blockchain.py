@@ -1,45 +1,143 @@
 import hashlib
+import heapq
 import json
 import time
 import os
+import atexit
+import threading
+import uuid
+from collections import deque
 from datetime import datetime
-from typing import List, Dict, Any, Optional
-from collections import defaultdict
+from typing import List, Dict, Any, Optional, Tuple
+from block_codec import TransactionRecord, make_record
+from block_store import BlockLog, ARCHIVED_TYPE
+from chain_index import FileIndex, UserIndex, ChainAggregates
+from checkpoints import CheckpointStore
+from merkle import merkle_root, merkle_proof, transaction_hash, transactions_root
+from mining import ParallelMiner, search_nonce
 
 
 class Block:
     """Represents a single block in the blockchain"""
     
+    # Known transaction types are kept as slotted records rather than dicts;
+    # the data property turns them back into the exact original dictionary,
+    # so hashes are unchanged
+    __slots__ = ("index", "timestamp", "_data", "previous_hash", "nonce",
+                 "merkle_root", "difficulty", "mining_time", "hash")
+    
     def __init__(self, index: int, timestamp: float, data: Dict[str, Any], 
-                 previous_hash: str, nonce: int = 0):
+                 previous_hash: str, nonce: int = 0, block_hash: str = None,
+                 merkle_root: str = None, difficulty: Optional[int] = None):
         self.index = index
         self.timestamp = timestamp
         self.data = data
         self.previous_hash = previous_hash
         self.nonce = nonce
-        self.hash = self.calculate_hash()
+        self.merkle_root = merkle_root
+        # Proof-of-work difficulty the block was mined at; blocks from before
+        # it was recorded use the chain's configured difficulty
+        self.difficulty = difficulty
+        self.mining_time: Optional[float] = None
+        self.hash = block_hash or self.calculate_hash()
     
-    def calculate_hash(self) -> str:
-        """Calculate SHA-256 hash of the block"""
-        block_string = json.dumps({
+    @property
+    def data(self) -> Dict[str, Any]:
+        data = self._data
+        if isinstance(data, TransactionRecord):
+            return data.to_dict()
+        return data
+    
+    @data.setter
+    def data(self, data: Dict[str, Any]):
+        self._data = make_record(data)
+    
+    @property
+    def tx_type(self) -> Optional[str]:
+        """Transaction type of the block payload"""
+        if isinstance(self._data, TransactionRecord):
+            return self._data.TYPE
+        return self._data.get("type")
+    
+    @property
+    def transactions(self) -> List[Dict[str, Any]]:
+        """Transactions carried by this block (batch blocks carry several)"""
+        data = self.data
+        if data.get("type") == "batch":
+            return data.get("transactions", [])
+        return [data]
+    
+    def header(self) -> Dict[str, Any]:
+        """Fields covered by the block hash"""
+        if self.merkle_root is None:
+            # Blocks mined before Merkle commitments hash their full data
+            return {
+                "index": self.index,
+                "timestamp": self.timestamp,
+                "data": self.data,
+                "previous_hash": self.previous_hash,
+                "nonce": self.nonce
+            }
+        # Other blocks commit to their transactions through the Merkle root,
+        # so the header alone is enough to recompute the block hash
+        header = {
             "index": self.index,
             "timestamp": self.timestamp,
-            "data": self.data,
+            "merkle_root": self.merkle_root,
+            "tx_count": len(self.transactions),
             "previous_hash": self.previous_hash,
             "nonce": self.nonce
-        }, sort_keys=True)
+        }
+        if self.difficulty is not None:
+            header["difficulty"] = self.difficulty
+        return header
+    
+    def proof_header(self) -> Dict[str, Any]:
+        """Header fields plus hash, enough for a light client to re-hash the block"""
+        if self.tx_type == ARCHIVED_TYPE:
+            # The hashed fields of an archived block are only in its archive segment
+            header = {"index": self.index, "previous_hash": self.previous_hash,
+                      "hash": self.hash, "archived": True}
+            if self.difficulty is not None:
+                header["difficulty"] = self.difficulty
+            return header
+        return {**self.header(), "hash": self.hash}
+    
+    def calculate_hash(self) -> str:
+        """Calculate SHA-256 hash of the block"""
+        block_string = json.dumps(self.header(), sort_keys=True)
         return hashlib.sha256(block_string.encode()).hexdigest()
     
-    def mine_block(self, difficulty: int):
+    def hash_parts(self) -> Tuple[bytes, bytes]:
+        """
+        Split the canonical header encoding around the nonce
+        Returns: (prefix, suffix) such that prefix + str(nonce) + suffix is
+        exactly what calculate_hash serializes
+        """
+        header = self.header()
+        before = {key: value for key, value in header.items() if key < "nonce"}
+        after = {key: value for key, value in header.items() if key > "nonce"}
+        
+        prefix = json.dumps(before, sort_keys=True)[:-1] + ', "nonce": ' if before else '{"nonce": '
+        suffix = ", " + json.dumps(after, sort_keys=True)[1:] if after else "}"
+        return prefix.encode(), suffix.encode()
+    
+    def mine_block(self, difficulty: int, miner: Optional[ParallelMiner] = None):
         """Mine the block using Proof of Work"""
+        start = time.perf_counter()
         target = "0" * difficulty
-        while self.hash[:difficulty] != target:
-            self.nonce += 1
-            self.hash = self.calculate_hash()
+        if self.hash[:difficulty] != target:
+            prefix, suffix = self.hash_parts()
+            if miner is not None:
+                self.nonce, self.hash = miner.mine(prefix, suffix, difficulty, self.nonce + 1)
+            else:
+                self.nonce, self.hash = search_nonce(prefix, suffix, difficulty,
+                                                     self.nonce + 1, None)
+        self.mining_time = time.perf_counter() - start
     
     def to_dict(self) -> Dict[str, Any]:
         """Convert block to dictionary"""
-        return {
+        block_dict = {
             "index": self.index,
             "timestamp": self.timestamp,
             "data": self.data,
@@ -47,39 +145,308 @@ class Block:
             "nonce": self.nonce,
             "hash": self.hash
         }
+        if self.merkle_root is not None:
+            block_dict["merkle_root"] = self.merkle_root
+        if self.difficulty is not None:
+            block_dict["difficulty"] = self.difficulty
+        if self.mining_time is not None:
+            block_dict["mining_time"] = self.mining_time
+        return block_dict
+    
+    def to_header_dict(self) -> Dict[str, Any]:
+        """Convert block to a dictionary without its transaction payload"""
+        header_dict = {
+            "index": self.index,
+            "timestamp": self.timestamp,
+            "type": self.tx_type,
+            "tx_count": len(self.transactions) if self.tx_type == "batch" else 1,
+            "previous_hash": self.previous_hash,
+            "nonce": self.nonce,
+            "hash": self.hash
+        }
+        if self.merkle_root is not None:
+            header_dict["merkle_root"] = self.merkle_root
+        if self.difficulty is not None:
+            header_dict["difficulty"] = self.difficulty
+        return header_dict
+    
+    @classmethod
+    def from_dict(cls, block_dict: Dict[str, Any]) -> 'Block':
+        """Rebuild a block from its stored dictionary without re-hashing"""
+        block = cls(
+            index=block_dict["index"],
+            timestamp=block_dict["timestamp"],
+            data=block_dict["data"],
+            previous_hash=block_dict["previous_hash"],
+            nonce=block_dict["nonce"],
+            block_hash=block_dict["hash"],
+            merkle_root=block_dict.get("merkle_root"),
+            difficulty=block_dict.get("difficulty")
+        )
+        block.mining_time = block_dict.get("mining_time")
+        return block
+
+
+class LazyBlock(Block):
+    """Block opened from the header index; its data is read from the block log on demand"""
+    
+    __slots__ = ("block_type", "location", "block_log")
+    
+    def __init__(self, entry: Dict[str, Any], block_log: BlockLog):
+        self.index = entry["index"]
+        self.timestamp = entry["timestamp"]
+        self.previous_hash = entry["previous_hash"]
+        self.nonce = entry["nonce"]
+        self.merkle_root = entry.get("merkle_root")
+        self.difficulty = entry.get("difficulty")
+        self.mining_time = entry.get("mining_time")
+        self.hash = entry["hash"]
+        self.block_type = entry.get("type")
+        self.location = (entry["segment"], entry["offset"], entry["length"])
+        self.block_log = block_log
+    
+    @property
+    def data(self) -> Dict[str, Any]:
+        return self.block_log.read_block(*self.location)["data"]
+    
+    @property
+    def tx_type(self) -> Optional[str]:
+        return self.block_type
+
+
+def is_block_valid(block: Block, previous_hash: str, difficulty: int,
+                   min_difficulty: Optional[int] = None) -> bool:
+    """
+    Check one block's hash, linkage, proof of work and Merkle root
+    A block that records its difficulty is checked at that difficulty, which
+    must not be below min_difficulty (default: difficulty); blocks from
+    before difficulties were recorded are checked at difficulty.
+    """
+    # Archived stubs can't be re-hashed; a full audit checks their archive
+    archived = block.tx_type == ARCHIVED_TYPE
+    
+    # Check if hash is correct
+    if not archived and block.hash != block.calculate_hash():
+        return False
+    
+    # Check if previous hash matches
+    if block.previous_hash != previous_hash:
+        return False
+    
+    # Check proof of work at the difficulty the block was mined at
+    if block.difficulty is not None:
+        if block.difficulty < (difficulty if min_difficulty is None else min_difficulty):
+            return False
+        difficulty = block.difficulty
+    if not block.hash.startswith("0" * difficulty):
+        return False
+    
+    # Check that batch transactions match the committed Merkle root
+    if (not archived and block.merkle_root is not None and
+            block.merkle_root != transactions_root(block.transactions)):
+        return False
+    
+    return True
 
 
 class Blockchain:
     """Blockchain for file sharing system with persistent storage"""
     
-    def __init__(self, difficulty: int = 2, storage_path: str = "data/blockchain.json"):
+    def __init__(self, difficulty: int = 2, storage_path: str = "data/blockchain.json",
+                 storage_format: str = "log", record_format: str = "json",
+                 fsync_every: int = 32,
+                 segment_max_bytes: int = 64 * 1024 * 1024,
+                 checkpoint_interval: int = 1000,
+                 checkpoint_key: str = "dev-secret-key-change-in-production",
+                 batch_size: int = 0, batch_interval: float = 5.0,
+                 batch_uploads: bool = False, mining_workers: int = 1,
+                 parallel_min_difficulty: int = 4, async_sealing: bool = False,
+                 lazy_load: bool = False, snapshot_interval: int = 1000,
+                 auto_compact: bool = False, adaptive_difficulty: bool = False,
+                 target_mining_time: float = 1.0, min_difficulty: int = 1,
+                 max_difficulty: int = 6, retarget_window: int = 16,
+                 analytics_minute_retention: float = 2 * 24 * 3600,
+                 receipt_ttl: float = 24 * 3600, writer=None):
         self.chain: List[Block] = []
+        # Configured difficulty; also what blocks without a recorded difficulty were mined at
         self.difficulty = difficulty
         self.pending_transactions: List[Dict[str, Any]] = []
         self.storage_path = storage_path
+        self.storage_format = storage_format
+        
+        # With a writer (a chain_service.ChainClient) this instance is a read
+        # replica: it never writes the block log, follows it with refresh()
+        # and hands new transactions to the single chain writer process
+        self.writer = writer
+        
+        # Lazy loading opens the chain from the block log's header index and
+        # restores the in-memory indexes from a snapshot instead of replaying
+        # every block payload
+        self.lazy_load = lazy_load and storage_format == "log" and writer is None
+        self.snapshot_interval = snapshot_interval
+        self._snapshot_height = 0
+        
+        self.auto_compact = False
+        
+        # _lock guards the mempool, _chain_lock serializes mining and appends,
+        # _index_lock owns the in-memory indexes (file_index, user_index,
+        # aggregates, receipts). Locks are taken in that order and nothing
+        # else is acquired while _index_lock is held; readers copy under it.
+        self._lock = threading.RLock()
+        self._chain_lock = threading.RLock()
+        self._index_lock = threading.RLock()
+        
+        # Mempool mode: with batch_size > 0, downloads (and optionally uploads)
+        # are queued and sealed into one batch block by size or age
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.batch_uploads = batch_uploads
+        self._pending_since: Optional[float] = None
+        
+        # Async sealing: every transaction is queued, answered with a receipt
+        # and mined by a background worker
+        self.async_sealing = async_sealing
+        self.receipts: Dict[str, Dict[str, Any]] = {}
+        # Sealed receipts are dropped receipt_ttl seconds after their block;
+        # (sealed_at, receipt_id) in sealing order
+        self.receipt_ttl = receipt_ttl
+        self._sealed_receipts: deque = deque()
+        self._seal_event = threading.Event()
+        
+        # Adaptive difficulty: every retarget_window blocks, step the mining
+        # difficulty toward the mining time budget. Each block records the
+        # difficulty it was mined at and is validated against it.
+        self.adaptive_difficulty = adaptive_difficulty
+        self.target_mining_time = target_mining_time
+        # Lowest difficulty a block may record: min_difficulty in adaptive mode
+        # (never above the configured one), else the difficulty itself. It is
+        # kept with the chain and settled once the stored chain is loaded.
+        self.min_difficulty = min(min_difficulty, difficulty) if adaptive_difficulty else difficulty
+        self._recorded_min_difficulty: Optional[int] = None
+        self.max_difficulty = max_difficulty
+        self.retarget_window = retarget_window
+        self.mining_difficulty = difficulty
+        self._mining_times: List[float] = []
+        
+        # Proof-of-work is spread over a process pool once it is hard enough
+        # for the pool overhead to pay off
+        self.parallel_min_difficulty = parallel_min_difficulty
+        self.miner: Optional[ParallelMiner] = None
+        workers = mining_workers or os.cpu_count() or 1
+        if workers > 1:
+            self.miner = ParallelMiner(workers)
+        
+        # In-memory indexes maintained as blocks are appended
+        self.file_index = FileIndex()
+        self.user_index = UserIndex()
+        # Minute-level analytics are kept for analytics_minute_retention seconds
+        self.aggregates = ChainAggregates(analytics_minute_retention)
         
         # Ensure data directory exists
         os.makedirs(os.path.dirname(storage_path), exist_ok=True)
         
+        # Append-only block log lives next to the legacy JSON file
+        self.block_log: Optional[BlockLog] = None
+        if storage_format == "log":
+            self.block_log = BlockLog(
+                os.path.splitext(storage_path)[0],
+                segment_max_bytes=segment_max_bytes,
+                fsync_every=fsync_every,
+                record_format=record_format,
+                read_only=writer is not None
+            )
+        
         # Load existing blockchain or create new one
-        if not self.load_from_disk():
+        if self.load_from_disk():
+            self._settle_min_difficulty(min_difficulty)
+        else:
+            if writer is not None:
+                raise RuntimeError("The chain writer has not created the block log yet")
             self.create_genesis_block()
+        
+        # Blocks below validated_height have already been verified; signed
+        # checkpoints let a restart resume from the last trusted height
+        self.checkpoint_interval = checkpoint_interval
+        self.checkpoints = CheckpointStore(
+            os.path.splitext(storage_path)[0] + "_checkpoints.json",
+            checkpoint_key
+        )
+        self.validated_height = 1
+        trusted = self.checkpoints.latest_trusted(self.chain)
+        
+        # Resume retargeting from the difficulty of the last block
+        self.mining_difficulty = self.difficulty
+        latest_difficulty = self.get_latest_block().difficulty
+        if self.adaptive_difficulty and latest_difficulty is not None:
+            self.mining_difficulty = max(self.min_difficulty, min(latest_difficulty, self.max_difficulty))
+        if trusted:
+            self.validated_height = max(1, trusted["height"])
+        
+        # Compaction archives download blocks of sealed log segments and keeps
+        # per-file/per-user rollups in their place; it runs as segments are sealed
+        self.auto_compact = auto_compact and storage_format == "log" and writer is None
+        self._segment_count = 0
+        # Compacted segments already reflected in the chain and user index;
+        # replicas apply the writer's later compactions on refresh()
+        self._compacted_positions = set()
+        if self.block_log is not None:
+            self._compacted_positions = {position for position, _ in self.block_log.compacted_segments()}
+        
+        if writer is None and (self.batch_size > 0 or self.async_sealing or self.lazy_load):
+            atexit.register(self.close)
+            threading.Thread(target=self._seal_loop, daemon=True).start()
+    
+    def _settle_min_difficulty(self, min_difficulty: int):
+        """
+        Fix the difficulty floor of a loaded chain against its stored difficulty
+        A chain keeps the lowest floor it was ever mined under, so blocks
+        retargeted in adaptive mode stay valid when it is reopened without it.
+        """
+        if self.adaptive_difficulty:
+            floor = min(min_difficulty, self.difficulty)
+        else:
+            floor = self.difficulty
+        recorded = self._recorded_min_difficulty
+        if recorded is not None:
+            floor = min(floor, recorded)
+        else:
+            # Chains from before the floor was recorded may have been mined
+            # adaptively: keep the lowest difficulty their blocks record
+            floor = min([floor] + [block.difficulty for block in self.chain
+                                   if block.difficulty is not None])
+        self.min_difficulty = floor
+        
+        if self.writer is None and recorded != floor:
+            if self.block_log is not None:
+                self.block_log.set_min_difficulty(floor)
+            else:
+                self.save_to_disk()
     
     def create_genesis_block(self):
         """Create the first block in the chain"""
-        genesis_block = Block(0, time.time(), {
+        genesis_data = {
             "type": "genesis",
             "message": "Genesis Block - File Sharing System"
-        }, "0")
-        genesis_block.mine_block(self.difficulty)
-        self.chain.append(genesis_block)
-        self.save_to_disk()
+        }
+        genesis_block = Block(0, time.time(), genesis_data, "0",
+                              merkle_root=transactions_root([genesis_data]))
+        self._mine(genesis_block)
+        self._append_block(genesis_block)
     
     def save_to_disk(self):
         """Save blockchain to disk for persistence"""
         try:
+            if self.block_log is not None:
+                # Only blocks the log has not seen yet are written
+                if not self.block_log.exists():
+                    self.block_log.create(self.difficulty, self.min_difficulty)
+                for block in self.chain[self.block_log.height:]:
+                    self.block_log.append(block.to_dict())
+                return
+            
             blockchain_data = {
                 "difficulty": self.difficulty,
+                "min_difficulty": self.min_difficulty,
                 "chain": [block.to_dict() for block in self.chain]
             }
             with open(self.storage_path, 'w') as f:
@@ -90,25 +457,34 @@ class Blockchain:
     def load_from_disk(self) -> bool:
         """Load blockchain from disk"""
         try:
-            if not os.path.exists(self.storage_path):
-                return False
+            if self.lazy_load and self.block_log.exists():
+                return self._load_headers()
             
-            with open(self.storage_path, 'r') as f:
-                blockchain_data = json.load(f)
-            
-            self.difficulty = blockchain_data.get("difficulty", self.difficulty)
+            if self.block_log is not None and self.block_log.exists():
+                block_dicts = self.block_log.open()
+                self.difficulty = self.block_log.manifest.get("difficulty") or self.difficulty
+                self._recorded_min_difficulty = self.block_log.manifest.get("min_difficulty")
+            elif os.path.exists(self.storage_path):
+                with open(self.storage_path, 'r') as f:
+                    blockchain_data = json.load(f)
+                
+                self.difficulty = blockchain_data.get("difficulty", self.difficulty)
+                self._recorded_min_difficulty = blockchain_data.get("min_difficulty")
+                block_dicts = blockchain_data.get("chain", [])
+                
+                # Convert the legacy JSON file into the block log once
+                if self.block_log is not None:
+                    self.block_log.import_json(self.storage_path)
+                    print(f"✓ Converted {self.storage_path} to block log at {self.block_log.directory}")
+            else:
+                return False
             
             # Reconstruct blocks
-            for block_dict in blockchain_data.get("chain", []):
-                block = Block(
-                    index=block_dict["index"],
-                    timestamp=block_dict["timestamp"],
-                    data=block_dict["data"],
-                    previous_hash=block_dict["previous_hash"],
-                    nonce=block_dict["nonce"]
-                )
-                block.hash = block_dict["hash"]
+            for block_dict in block_dicts:
+                block = Block.from_dict(block_dict)
                 self.chain.append(block)
+                self._index_block(block)
+            self._merge_rollups(0)
             
             print(f"✓ Loaded blockchain with {len(self.chain)} blocks from disk")
             return len(self.chain) > 0
@@ -117,6 +493,342 @@ class Blockchain:
             print(f"Error loading blockchain: {e}")
             return False
     
+    def _load_headers(self) -> bool:
+        """Open the chain from the header index, replaying only blocks after the index snapshot"""
+        for entry in self.block_log.open_headers():
+            self.chain.append(LazyBlock(entry, self.block_log))
+        self.difficulty = self.block_log.manifest.get("difficulty") or self.difficulty
+        self._recorded_min_difficulty = self.block_log.manifest.get("min_difficulty")
+        
+        restored_height = self._restore_index_snapshot()
+        for block in self.chain[restored_height:]:
+            self._index_block(block)
+        self._merge_rollups(restored_height)
+        
+        print(f"✓ Opened blockchain with {len(self.chain)} blocks from header index "
+              f"({len(self.chain) - restored_height} replayed)")
+        return len(self.chain) > 0
+    
+    @property
+    def snapshot_path(self) -> str:
+        return os.path.join(self.block_log.directory, "index_snapshot.json")
+    
+    def _write_index_snapshot(self):
+        """Save the in-memory indexes so a lazy start can skip replaying blocks"""
+        try:
+            with self._chain_lock:
+                height = len(self.chain)
+                with self._index_lock:
+                    # Serialized under the lock: to_dict hands out the live structures
+                    payload = json.dumps({
+                        "height": height,
+                        "block_hash": self.get_latest_block().hash,
+                        "file_index": self.file_index.to_dict(),
+                        "user_index": self.user_index.to_dict(),
+                        "aggregates": self.aggregates.to_dict(),
+                        "receipts": {
+                            receipt_id: receipt for receipt_id, receipt in self.receipts.items()
+                            if receipt["status"] == "sealed"
+                        }
+                    })
+                tmp_path = self.snapshot_path + ".tmp"
+                with open(tmp_path, 'w') as f:
+                    f.write(payload)
+                os.replace(tmp_path, self.snapshot_path)
+                self._snapshot_height = height
+        except Exception as e:
+            print(f"Error saving index snapshot: {e}")
+    
+    def _restore_index_snapshot(self) -> int:
+        """
+        Restore indexes from the snapshot if it matches the loaded chain
+        Returns: the height the indexes were restored to (0 if not restored)
+        """
+        try:
+            if not os.path.exists(self.snapshot_path):
+                return 0
+            
+            with open(self.snapshot_path, 'r') as f:
+                snapshot = json.load(f)
+            
+            height = snapshot.get("height", 0)
+            if not 0 < height <= len(self.chain) or self.chain[height - 1].hash != snapshot.get("block_hash"):
+                return 0
+            
+            # Snapshots from before the user index and time buckets existed are
+            # replayed instead
+            if "user_index" not in snapshot or "time_buckets" not in snapshot.get("aggregates", {}):
+                return 0
+            
+            # A segment compacted after the snapshot was taken must be counted
+            # from its rollup as a whole
+            for position, segment in self.block_log.compacted_segments():
+                if segment["first_index"] < height < self.block_log.segment_end(position):
+                    return 0
+            
+            with self._index_lock:
+                self.file_index.load_dict(snapshot.get("file_index", {}))
+                self.user_index.load_dict(snapshot["user_index"])
+                self.aggregates.load_dict(snapshot.get("aggregates", {}))
+                for receipt_id, receipt in sorted(snapshot.get("receipts", {}).items(),
+                                                  key=lambda item: item[1].get("sealed_at", 0)):
+                    self._add_sealed_receipt(receipt)
+                self._expire_receipts()
+            self._snapshot_height = height
+            return height
+        
+        except Exception as e:
+            print(f"Error loading index snapshot: {e}")
+            return 0
+    
+    def close(self):
+        """Seal queued transactions, then flush and close persistent storage"""
+        if self.writer is None:
+            self.seal_pending()
+        if self.lazy_load and self._snapshot_height != len(self.chain):
+            self._write_index_snapshot()
+        if self.block_log is not None:
+            self.block_log.close()
+    
+    def _merge_rollups(self, start: int):
+        """Count the archived blocks of compacted segments at or above height start"""
+        if self.block_log is None:
+            return
+        for position, segment in self.block_log.compacted_segments():
+            if segment["first_index"] >= start:
+                rollup = self.block_log.load_rollup(position)
+                with self._index_lock:
+                    self.aggregates.merge_dict(rollup)
+                    self.user_index.merge_archived(rollup.get("downloader_counts", {}))
+    
+    def _index_block(self, block: Block):
+        """Update in-memory indexes with a newly appended block"""
+        transactions = block.transactions
+        with self._index_lock:
+            for position, transaction in enumerate(transactions):
+                self.file_index.add_transaction(transaction, block.index)
+                self.user_index.add_transaction(transaction, block.index, position)
+                self.aggregates.add_transaction(transaction)
+                if "receipt_id" in transaction:
+                    self._add_sealed_receipt({
+                        "receipt_id": transaction["receipt_id"],
+                        "status": "sealed",
+                        "block_index": block.index,
+                        "block_hash": block.hash,
+                        "sealed_at": block.timestamp
+                    })
+            self._expire_receipts()
+    
+    def _add_sealed_receipt(self, receipt: Dict[str, Any]):
+        """Record a sealed receipt and queue it for expiry"""
+        self.receipts[receipt["receipt_id"]] = receipt
+        self._sealed_receipts.append((receipt.get("sealed_at", 0), receipt["receipt_id"]))
+    
+    def _expire_receipts(self):
+        """Drop sealed receipts older than receipt_ttl"""
+        cutoff = time.time() - self.receipt_ttl
+        while self._sealed_receipts and self._sealed_receipts[0][0] < cutoff:
+            _, receipt_id = self._sealed_receipts.popleft()
+            receipt = self.receipts.get(receipt_id)
+            if receipt and receipt["status"] == "sealed":
+                del self.receipts[receipt_id]
+    
+    def _append_block(self, block: Block):
+        """Append a mined block, update indexes and persist it"""
+        self.chain.append(block)
+        self._index_block(block)
+        self.save_to_disk()  # Persist to disk
+        
+        if self.lazy_load and len(self.chain) - self._snapshot_height >= self.snapshot_interval:
+            self._write_index_snapshot()
+        
+        # A segment was just sealed
+        if self.auto_compact and len(self.block_log.manifest["segments"]) != self._segment_count:
+            self._segment_count = len(self.block_log.manifest["segments"])
+            self.compact()
+    
+    def _mine(self, block: Block):
+        """Run proof-of-work on a block, in parallel when it is worth it"""
+        difficulty = self.mining_difficulty
+        block.difficulty = difficulty
+        block.hash = block.calculate_hash()
+        miner = self.miner if difficulty >= self.parallel_min_difficulty else None
+        block.mine_block(difficulty, miner)
+        if self.adaptive_difficulty:
+            self._retarget(block.mining_time)
+    
+    def _retarget(self, mining_time: float):
+        """Step the mining difficulty toward target_mining_time once a window of blocks is mined"""
+        self._mining_times.append(mining_time)
+        if len(self._mining_times) < self.retarget_window:
+            return
+        
+        # Judge the window by its slow tail (p90), which is what callers wait on
+        times = sorted(self._mining_times)
+        self._mining_times = []
+        slow = times[int(len(times) * 0.9)]
+        
+        # One more leading zero makes a block about 16 times more expensive
+        if slow > self.target_mining_time and self.mining_difficulty > self.min_difficulty:
+            self.mining_difficulty -= 1
+        elif slow * 16 < self.target_mining_time and self.mining_difficulty < self.max_difficulty:
+            self.mining_difficulty += 1
+        else:
+            return
+        print(f"✓ Mining difficulty retargeted to {self.mining_difficulty} (p90 mining time {slow:.3f}s)")
+    
+    def _assign_version(self, transaction: Dict[str, Any]):
+        """Give an upload without a version the next version of its file name's lineage"""
+        if transaction.get("type") != "file_upload" or transaction.get("version") is not None:
+            return
+        with self._index_lock:
+            lineage_name, version, previous_version_hash = self.file_index.next_version(transaction["file_name"])
+        if version > 1:
+            base_name, extension = os.path.splitext(lineage_name)
+            transaction["file_name"] = f"{base_name}_v{version}{extension}"
+        transaction["version"] = version
+        transaction["previous_version_hash"] = previous_version_hash
+    
+    def _mine_transaction(self, transaction: Dict[str, Any]) -> Dict[str, Any]:
+        """Mine a single-transaction block and append it"""
+        with self._chain_lock:
+            # Versioned under the chain lock, so the index already holds the
+            # previous upload of the same name
+            self._assign_version(transaction)
+            new_block = Block(
+                index=len(self.chain),
+                timestamp=time.time(),
+                data=transaction,
+                previous_hash=self.get_latest_block().hash,
+                merkle_root=transactions_root([transaction])
+            )
+            
+            self._mine(new_block)
+            self._append_block(new_block)
+            
+            return new_block.to_dict()
+    
+    def _queue_transaction(self, transaction: Dict[str, Any]) -> Dict[str, Any]:
+        """Add a transaction to the mempool, sealing a batch once it is full"""
+        with self._lock:
+            with self._index_lock:
+                self._assign_version(transaction)
+                # Queued uploads get a receipt to follow their sealing; downloads
+                # only when every transaction is answered with one (async sealing)
+                if self.async_sealing or transaction["type"] == "file_upload":
+                    transaction["receipt_id"] = uuid.uuid4().hex
+                    self.receipts[transaction["receipt_id"]] = {
+                        "receipt_id": transaction["receipt_id"],
+                        "status": "pending",
+                        "block_index": None,
+                        "block_hash": None
+                    }
+                # Visible (and counted for versioning) before its block is mined
+                self.file_index.add_pending(transaction)
+            
+            if not self.pending_transactions:
+                self._pending_since = time.time()
+            self.pending_transactions.append(transaction)
+            batch_full = len(self.pending_transactions) >= max(self.batch_size, 1)
+        
+        if batch_full:
+            if self.async_sealing:
+                self._seal_event.set()
+            else:
+                self.seal_pending()
+        
+        return {
+            "pending": True,
+            "receipt_id": transaction.get("receipt_id"),
+            "transaction": transaction
+        }
+    
+    def refresh(self) -> int:
+        """
+        Index the blocks the chain writer appended since the last refresh
+        Returns: number of new blocks (always 0 outside replicas)
+        """
+        if self.writer is None:
+            return 0
+        with self._chain_lock:
+            block_dicts = self.block_log.tail()
+            for block_dict in block_dicts:
+                block = Block.from_dict(block_dict)
+                self.chain.append(block)
+                self._index_block(block)
+            # tail() reloads a changed manifest; catch up on segments the
+            # writer compacted since
+            for position, _ in self.block_log.compacted_segments():
+                if position not in self._compacted_positions:
+                    self._apply_compaction(position, self.block_log.segment_entries(position))
+        return len(block_dicts)
+    
+    def seal_pending(self) -> Optional[Dict[str, Any]]:
+        """Mine all queued transactions into one block"""
+        if self.writer is not None:
+            result = self.writer.call("seal_pending")
+            self.refresh()
+            return result
+        with self._chain_lock:
+            with self._lock:
+                if not self.pending_transactions:
+                    return None
+                
+                transactions = self.pending_transactions
+                self.pending_transactions = []
+                self._pending_since = None
+            
+            # New transactions can be queued while this block is mined
+            if len(transactions) == 1:
+                new_block = Block(
+                    index=len(self.chain),
+                    timestamp=time.time(),
+                    data=transactions[0],
+                    previous_hash=self.get_latest_block().hash,
+                    merkle_root=transactions_root(transactions)
+                )
+            else:
+                new_block = Block(
+                    index=len(self.chain),
+                    timestamp=time.time(),
+                    data={"type": "batch", "transactions": transactions},
+                    previous_hash=self.get_latest_block().hash,
+                    merkle_root=transactions_root(transactions)
+                )
+            
+            self._mine(new_block)
+            self._append_block(new_block)
+            
+            return new_block.to_dict()
+    
+    def _seal_loop(self):
+        """Background worker that seals the mempool when signalled or once it is batch_interval old"""
+        while True:
+            timeout = min(self.batch_interval, 1.0) if self.batch_interval > 0 else None
+            self._seal_event.wait(timeout)
+            self._seal_event.clear()
+            
+            pending_since = self._pending_since
+            if not pending_since:
+                continue
+            batch_full = len(self.pending_transactions) >= max(self.batch_size, 1)
+            expired = self.batch_interval > 0 and time.time() - pending_since >= self.batch_interval
+            if (self.async_sealing and batch_full) or expired:
+                try:
+                    self.seal_pending()
+                except Exception as e:
+                    print(f"Error sealing pending transactions: {e}")
+    
+    def get_receipt(self, receipt_id: str) -> Optional[Dict[str, Any]]:
+        """Get the sealing status of a queued transaction"""
+        with self._index_lock:
+            receipt = self.receipts.get(receipt_id)
+            receipt = dict(receipt) if receipt else None
+        if not receipt and self.writer is not None:
+            # Only the writer knows about transactions still in its mempool
+            return self.writer.call("get_receipt", receipt_id=receipt_id)
+        return receipt
+    
     def get_latest_block(self) -> Block:
         """Get the most recent block in the chain"""
         return self.chain[-1]
@@ -124,9 +836,13 @@ class Blockchain:
     def add_file_transaction(self, file_name: str, file_hash: str, 
                             file_size: int, uploader: str, 
                             file_path: str, is_encrypted: bool = False,
-                            salt: str = None, version: int = 1,
+                            salt: str = None, version: Optional[int] = None,
                             previous_version_hash: str = None) -> Dict[str, Any]:
-        """Add a file sharing transaction to the blockchain"""
+        """
+        Add a file sharing transaction to the blockchain
+        Without a version the upload becomes the next version of its file
+        name's lineage (renamed name_vN.ext), assigned by the chain writer.
+        """
         transaction = {
             "type": "file_upload",
             "file_name": file_name,
@@ -140,19 +856,7 @@ class Blockchain:
             "previous_version_hash": previous_version_hash,
             "timestamp": datetime.now().isoformat()
         }
-        
-        new_block = Block(
-            index=len(self.chain),
-            timestamp=time.time(),
-            data=transaction,
-            previous_hash=self.get_latest_block().hash
-        )
-        
-        new_block.mine_block(self.difficulty)
-        self.chain.append(new_block)
-        self.save_to_disk()  # Persist to disk
-        
-        return new_block.to_dict()
+        return self.submit_transaction(transaction)
     
     def add_download_transaction(self, file_name: str, file_hash: str, 
                                  downloader: str) -> Dict[str, Any]:
@@ -164,207 +868,440 @@ class Blockchain:
             "downloader": downloader,
             "timestamp": datetime.now().isoformat()
         }
+        return self.submit_transaction(transaction)
+    
+    def submit_transaction(self, transaction: Dict[str, Any]) -> Dict[str, Any]:
+        """Mine a transaction or queue it for sealing; replicas pass it to the chain writer"""
+        if self.writer is not None:
+            result = self.writer.call("submit_transaction", transaction=transaction)
+            # The writer returns a queued upload as versioned there, so this
+            # worker sees it before its block is sealed
+            if result.get("pending"):
+                with self._index_lock:
+                    self.file_index.add_pending(result["transaction"])
+            self.refresh()
+            return result
         
-        new_block = Block(
-            index=len(self.chain),
-            timestamp=time.time(),
-            data=transaction,
-            previous_hash=self.get_latest_block().hash
-        )
-        
-        new_block.mine_block(self.difficulty)
-        self.chain.append(new_block)
-        self.save_to_disk()  # Persist to disk
+        # Downloads are queued whenever batching is on, uploads only if batch_uploads is set
+        queued = self.batch_size > 0 and (transaction["type"] != "file_upload" or self.batch_uploads)
+        if self.async_sealing or queued:
+            return self._queue_transaction(transaction)
+        return self._mine_transaction(transaction)
+    
+    @property
+    def difficulty_floor(self) -> int:
+        """Lowest difficulty a block may record"""
+        return self.min_difficulty
+    
+    def _is_block_valid(self, block: Block, previous_hash: str) -> bool:
+        """Check one block's hash, linkage, proof of work and Merkle root"""
+        return is_block_valid(block, previous_hash, self.difficulty, self.difficulty_floor)
+    
+    def _first_invalid_block(self, start: int, end: int) -> Optional[int]:
+        """Return the index of the first invalid block in [start, end), if any"""
+        for i in range(max(start, 1), end):
+            if not self._is_block_valid(self.chain[i], self.chain[i - 1].hash):
+                return i
         
-        return new_block.to_dict()
+        return None
     
-    def is_chain_valid(self) -> bool:
-        """Validate the entire blockchain"""
-        for i in range(1, len(self.chain)):
-            current_block = self.chain[i]
-            previous_block = self.chain[i - 1]
+    def _first_invalid_archive(self) -> Optional[int]:
+        """Return the index of the first archived block that doesn't match its stub, if any"""
+        for position, segment in self.block_log.compacted_segments():
+            try:
+                archived = [Block.from_dict(block_dict) for block_dict in self.block_log.read_archive(position)]
+            except OSError as e:
+                print(f"Error reading archive {segment['archive']}: {e}")
+                return segment["first_index"]
+            for block in archived:
+                if (block.index >= len(self.chain) or block.hash != self.chain[block.index].hash or
+                        not self._is_block_valid(block, self.chain[block.index - 1].hash)):
+                    return block.index
             
-            # Check if hash is correct
-            if current_block.hash != current_block.calculate_hash():
-                return False
-            
-            # Check if previous hash matches
-            if current_block.previous_hash != previous_block.hash:
-                return False
-            
-            # Check proof of work
-            if not current_block.hash.startswith("0" * self.difficulty):
-                return False
+            # The archive must hold exactly the blocks committed to at compaction
+            if (len(archived) != segment["archived_count"] or
+                    merkle_root([block.hash for block in archived]) != segment["archive_root"]):
+                return segment["first_index"]
+        
+        return None
+    
+    def is_chain_valid(self, full_audit: bool = False) -> bool:
+        """
+        Validate the blockchain
+        Only blocks appended since the last successful check are verified,
+        unless full_audit is set, which re-hashes the entire chain.
+        """
+        end = len(self.chain)
+        start = 1 if full_audit else self.validated_height
+        
+        bad_index = self._first_invalid_block(start, end)
+        if bad_index is None and full_audit and self.block_log is not None:
+            bad_index = self._first_invalid_archive()
+        return self.record_validation(bad_index, end, full_audit)
+    
+    def record_validation(self, bad_index: Optional[int], end: int, full_audit: bool = False) -> bool:
+        """
+        Record the outcome of checking blocks up to end (is_chain_valid or audit.py)
+        Returns: whether the chain was valid
+        """
+        if bad_index is not None:
+            self.validated_height = min(self.validated_height, bad_index)
+            return False
+        
+        self.validated_height = max(self.validated_height, end)
+        
+        # Sign a checkpoint every checkpoint_interval blocks (and after a full audit);
+        # replicas leave the checkpoint file to the chain writer
+        last = self.checkpoints.checkpoints[-1]["height"] if self.checkpoints.checkpoints else 0
+        if self.writer is None and end > last and (full_audit or end - last >= self.checkpoint_interval):
+            self.checkpoints.add(end, self.chain[end - 1].hash)
         
         return True
     
+    @staticmethod
+    def _is_archivable(block_dict: Dict[str, Any]) -> bool:
+        """Only blocks made up entirely of downloads are archived"""
+        data = block_dict["data"]
+        transactions = data.get("transactions", []) if data.get("type") == "batch" else [data]
+        return bool(transactions) and all(tx.get("type") == "file_download" for tx in transactions)
+    
+    @staticmethod
+    def _summarize_downloads(block_dicts: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Roll archived download blocks up into per-file, per-user and per-period counts"""
+        rollup = ChainAggregates()
+        for block_dict in block_dicts:
+            for transaction in Block.from_dict(block_dict).transactions:
+                rollup.add_transaction(transaction)
+        return rollup.to_dict()
+    
+    def compact(self) -> int:
+        """
+        Archive the download blocks of sealed, already validated log segments
+        Returns: number of blocks archived
+        """
+        if self.block_log is None:
+            return 0
+        
+        if self.writer is not None:
+            return self.writer.call("compact")
+        
+        archived = 0
+        with self._chain_lock:
+            # Never archive blocks that haven't been verified
+            self.is_chain_valid()
+            segments = self.block_log.manifest["segments"]
+            for position in range(len(segments) - 1):
+                if self.block_log.segment_end(position) > self.validated_height:
+                    break
+                entries = self.block_log.compact_segment(
+                    position, self._is_archivable, self._summarize_downloads
+                )
+                if not entries:
+                    continue
+                
+                self._apply_compaction(position, entries)
+                archived += segments[position]["archived_count"]
+            
+            if archived and self.lazy_load:
+                self._write_index_snapshot()
+        
+        if archived:
+            print(f"✓ Archived {archived} download blocks")
+        return archived
+    
+    def _apply_compaction(self, position: int, entries: List[Dict[str, Any]]):
+        """Swap the stubs of a compacted segment into the chain and user index"""
+        # Lazy blocks all moved within the segment; aggregates already count
+        # the archived blocks, the user index keeps only per-user counts for them
+        downloader_counts = self.block_log.load_rollup(position).get("downloader_counts", {})
+        with self._index_lock:
+            self.user_index.archive_downloads(
+                downloader_counts,
+                {entry["index"] for entry in entries if entry["type"] == ARCHIVED_TYPE}
+            )
+        for entry in entries:
+            if entry["index"] >= len(self.chain):
+                break
+            if self.lazy_load:
+                self.chain[entry["index"]] = LazyBlock(entry, self.block_log)
+            elif entry["type"] == ARCHIVED_TYPE:
+                self.chain[entry["index"]] = Block.from_dict(
+                    self.block_log.read_block(entry["segment"], entry["offset"], entry["length"])
+                )
+        self._compacted_positions.add(position)
+    
+    @property
+    def _uploads_queued(self) -> bool:
+        """Whether uploads wait in the mempool before they are sealed"""
+        return self.async_sealing or (self.batch_size > 0 and self.batch_uploads)
+    
     def get_all_files(self) -> List[Dict[str, Any]]:
         """Get all uploaded files from the blockchain"""
-        files = []
-        file_dict = {}
-        
-        for block in self.chain:
-            if block.data.get("type") == "file_upload":
-                file_hash = block.data.get("file_hash")
-                file_dict[file_hash] = {
-                    "file_name": block.data.get("file_name"),
-                    "file_hash": file_hash,
-                    "file_size": block.data.get("file_size"),
-                    "uploader": block.data.get("uploader"),
-                    "file_path": block.data.get("file_path"),
-                    "timestamp": block.data.get("timestamp"),
-                    "block_index": block.index,
-                    "is_encrypted": block.data.get("is_encrypted", False),
-                    "salt": block.data.get("salt"),
-                    "version": block.data.get("version", 1),
-                    "previous_version_hash": block.data.get("previous_version_hash")
-                }
-        
-        return list(file_dict.values())
+        with self._index_lock:
+            files = self.file_index.all()
+        if self.writer is not None and self._uploads_queued:
+            # Uploads other workers queued are only known to the chain writer
+            known = {record["file_hash"] for record in files}
+            files.extend(record for record in self.writer.call("get_pending_files")
+                         if record["file_hash"] not in known)
+        return files
     
     def get_file_by_hash(self, file_hash: str) -> Optional[Dict[str, Any]]:
         """Get file information by its hash"""
-        for block in self.chain:
-            if (block.data.get("type") == "file_upload" and 
-                block.data.get("file_hash") == file_hash):
-                return {
-                    "file_name": block.data.get("file_name"),
-                    "file_hash": file_hash,
-                    "file_size": block.data.get("file_size"),
-                    "uploader": block.data.get("uploader"),
-                    "file_path": block.data.get("file_path"),
-                    "timestamp": block.data.get("timestamp"),
-                    "block_index": block.index,
-                    "is_encrypted": block.data.get("is_encrypted", False),
-                    "salt": block.data.get("salt"),
-                    "version": block.data.get("version", 1),
-                    "previous_version_hash": block.data.get("previous_version_hash")
-                }
-        return None
+        with self._index_lock:
+            record = self.file_index.get(file_hash)
+        if record is None and self.writer is not None and self._uploads_queued:
+            return self.writer.call("get_file_by_hash", file_hash=file_hash)
+        return record
+    
+    def get_pending_files(self) -> List[Dict[str, Any]]:
+        """Get uploads queued for sealing but not yet in a block"""
+        with self._index_lock:
+            return [dict(record) for record in self.file_index.pending_by_hash.values()]
+    
+    def get_file_proof(self, file_hash: str, through: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """
+        Build an inclusion proof for the upload of a file
+        The Merkle path links the upload transaction to the block's Merkle
+        root, and the block header lets the client recompute the block hash.
+        Blocks mined before Merkle commitments hash their full data, so their
+        header carries the transaction itself and the path is empty. With
+        through, the headers of the following blocks up to that height are
+        included so the proof can be linked to a header the client trusts.
+        Returns: proof dictionary, or None if the upload is not sealed
+        """
+        with self._index_lock:
+            record = self.file_index.get(file_hash)
+        if not record or record.get("block_index") is None:
+            return None
+        
+        block = self.chain[record["block_index"]]
+        transactions = block.transactions
+        position = next(i for i, tx in enumerate(transactions)
+                        if tx.get("type") == "file_upload" and tx.get("file_hash") == file_hash)
+        
+        proof = {
+            "file_hash": file_hash,
+            "block_index": block.index,
+            "transaction": transactions[position],
+            "tx_index": position,
+            "leaf": None,
+            "proof": [],
+            "merkle_root": block.merkle_root,
+            "header": block.proof_header(),
+            "headers": [],
+            "height": len(self.chain)
+        }
+        if block.merkle_root is not None:
+            leaves = [transaction_hash(tx) for tx in transactions]
+            proof["leaf"] = leaves[position]
+            proof["proof"] = merkle_proof(leaves, position)
+        if through is not None:
+            proof["headers"] = list(self.iter_proof_headers(block.index + 1, through + 1))
+        return proof
+    
+    def iter_proof_headers(self, start: int = 0, end: Optional[int] = None):
+        """Yield the proof headers of blocks [start, end)"""
+        end = len(self.chain) if end is None else max(0, min(end, len(self.chain)))
+        for i in range(max(0, start), end):
+            yield self.chain[i].proof_header()
     
     def get_chain(self) -> List[Dict[str, Any]]:
         """Get the entire blockchain as a list of dictionaries"""
         return [block.to_dict() for block in self.chain]
     
+    def iter_blocks(self, start: int = 0, end: Optional[int] = None,
+                    descending: bool = False, headers_only: bool = False):
+        """
+        Yield block dictionaries for heights [start, end) one at a time
+        Blocks appended while iterating are not included.
+        """
+        height = len(self.chain)
+        end = height if end is None else max(0, min(end, height))
+        start = max(0, start)
+        indices = range(end - 1, start - 1, -1) if descending else range(start, end)
+        for i in indices:
+            block = self.chain[i]
+            yield block.to_header_dict() if headers_only else block.to_dict()
+    
     def get_chain_stats(self) -> Dict[str, Any]:
         """Get blockchain statistics"""
-        total_uploads = sum(1 for block in self.chain 
-                          if block.data.get("type") == "file_upload")
-        total_downloads = sum(1 for block in self.chain 
-                            if block.data.get("type") == "file_download")
-        
-        # Advanced statistics
-        uploaders = set()
-        downloaders = set()
-        total_size = 0
-        encrypted_files = 0
-        
-        for block in self.chain:
-            if block.data.get("type") == "file_upload":
-                uploaders.add(block.data.get("uploader"))
-                total_size += block.data.get("file_size", 0)
-                if block.data.get("is_encrypted"):
-                    encrypted_files += 1
-            elif block.data.get("type") == "file_download":
-                downloaders.add(block.data.get("downloader"))
-        
+        is_valid = self.is_chain_valid()
+        aggregates = self.aggregates
+        latest = self.get_latest_block()
+        with self._index_lock:
+            totals = {
+                "total_uploads": aggregates.total_uploads,
+                "total_downloads": aggregates.total_downloads,
+                "unique_uploaders": len(aggregates.uploader_counts),
+                "unique_downloaders": len(aggregates.downloader_counts),
+                "total_storage_bytes": aggregates.total_size,
+                "encrypted_files": aggregates.encrypted_files
+            }
         return {
             "total_blocks": len(self.chain),
-            "total_uploads": total_uploads,
-            "total_downloads": total_downloads,
-            "unique_uploaders": len(uploaders),
-            "unique_downloaders": len(downloaders),
-            "total_storage_bytes": total_size,
-            "encrypted_files": encrypted_files,
-            "is_valid": self.is_chain_valid(),
-            "difficulty": self.difficulty
+            **totals,
+            "is_valid": is_valid,
+            "difficulty": self.difficulty if latest.difficulty is None else latest.difficulty,
+            "adaptive_difficulty": self.adaptive_difficulty,
+            "pending_transactions": len(self.pending_transactions),
+            "last_mining_time": latest.mining_time
         }
     
-    def get_file_versions(self, base_file_name: str) -> List[Dict[str, Any]]:
-        """Get all versions of a file"""
-        versions = []
-        for block in self.chain:
-            if (block.data.get("type") == "file_upload" and 
-                block.data.get("file_name", "").startswith(base_file_name.split("_v")[0])):
-                versions.append({
-                    "file_name": block.data.get("file_name"),
-                    "file_hash": block.data.get("file_hash"),
-                    "version": block.data.get("version", 1),
-                    "uploader": block.data.get("uploader"),
-                    "timestamp": block.data.get("timestamp"),
-                    "block_index": block.index
-                })
+    def next_file_version(self, file_name: str) -> Tuple[str, int, Optional[str]]:
+        """
+        Get the version a new upload of file_name would get (uploads are
+        versioned when submitted; this is only a preview)
+        Returns: (lineage name, version, previous_version_hash)
+        """
+        with self._index_lock:
+            return self.file_index.next_version(file_name)
+    
+    def get_user_activity(self, user: str, kind: str = "all",
+                          before: Optional[Tuple[int, int]] = None,
+                          limit: int = 50) -> Dict[str, Any]:
+        """
+        Get a page of a user's uploads and/or downloads, newest first
+        kind is 'uploads', 'downloads' or 'all'; before is the
+        (block_index, tx_index) next_cursor of the previous page.
+        Returns: dictionary with the activity page, next_cursor and totals
+        """
+        kinds = ["uploads", "downloads"] if kind == "all" else [kind]
+        with self._index_lock:
+            entries, next_cursor = self.user_index.page(user, kinds, before, limit)
+            totals = self.user_index.counts(user)
         
-        return sorted(versions, key=lambda x: x["version"], reverse=True)
+        activity = []
+        for block_index, tx_index, entry_kind in entries:
+            transaction = self.chain[block_index].transactions[tx_index]
+            activity.append({
+                "kind": entry_kind[:-1],
+                "block_index": block_index,
+                "tx_index": tx_index,
+                **transaction
+            })
+        
+        return {
+            "user": user,
+            "totals": totals,
+            "activity": activity,
+            "next_cursor": next_cursor
+        }
     
-    def get_analytics_data(self) -> Dict[str, Any]:
-        """Get detailed analytics data for visualization"""
-        # Activity by date
-        activity_by_date = defaultdict(lambda: {"uploads": 0, "downloads": 0})
-        activity_by_hour = defaultdict(lambda: {"uploads": 0, "downloads": 0})
-        
-        # Top uploaders and downloaders
-        uploader_counts = defaultdict(int)
-        downloader_counts = defaultdict(int)
-        
-        # File types
-        file_types = defaultdict(int)
-        
-        for block in self.chain:
-            if block.data.get("type") == "file_upload":
-                timestamp = block.data.get("timestamp")
-                if timestamp:
-                    date = timestamp.split("T")[0]
-                    hour = datetime.fromisoformat(timestamp).hour
-                    activity_by_date[date]["uploads"] += 1
-                    activity_by_hour[hour]["uploads"] += 1
-                
-                uploader = block.data.get("uploader")
-                uploader_counts[uploader] += 1
-                
-                file_name = block.data.get("file_name", "")
-                ext = file_name.split(".")[-1] if "." in file_name else "unknown"
-                file_types[ext] += 1
-                
-            elif block.data.get("type") == "file_download":
-                timestamp = block.data.get("timestamp")
-                if timestamp:
-                    date = timestamp.split("T")[0]
-                    hour = datetime.fromisoformat(timestamp).hour
-                    activity_by_date[date]["downloads"] += 1
-                    activity_by_hour[hour]["downloads"] += 1
-                
-                downloader = block.data.get("downloader")
-                downloader_counts[downloader] += 1
+    def get_files_by_uploader(self, uploader: str) -> List[Dict[str, Any]]:
+        """Get the files a user uploaded, in upload order"""
+        with self._index_lock:
+            entries = list(self.user_index.uploads.get(uploader, []))
+        file_hashes = dict.fromkeys(self.chain[block_index].transactions[tx_index]["file_hash"]
+                                    for block_index, tx_index in entries)
+        with self._index_lock:
+            files = [self.file_index.get(file_hash) for file_hash in file_hashes]
+        return [record for record in files if record]
+    
+    def search_files_by_uploader(self, text: str) -> List[Dict[str, Any]]:
+        """
+        Get the files of every uploader whose name contains text (case-insensitive)
+        Sealed files come in upload order, queued uploads last.
+        """
+        text = text.lower()
+        with self._index_lock:
+            uploaders = [user for user in self.user_index.uploads if text in (user or "").lower()]
+        files = {}
+        for uploader in uploaders:
+            for record in self.get_files_by_uploader(uploader):
+                files[record["file_hash"]] = record
         
-        # Convert to sorted lists
-        activity_timeline = [
-            {"date": date, **counts} 
-            for date, counts in sorted(activity_by_date.items())
-        ]
+        if self.writer is None:
+            pending = self.get_pending_files()
+        elif self._uploads_queued:
+            pending = self.writer.call("get_pending_files")
+        else:
+            pending = []
         
-        hourly_activity = [
-            {"hour": hour, **counts}
-            for hour, counts in sorted(activity_by_hour.items())
+        matched = sorted(files.values(), key=lambda record: record["block_index"])
+        matched.extend(record for record in pending
+                       if record["file_hash"] not in files and text in (record.get("uploader") or "").lower())
+        return matched
+    
+    def get_file_versions(self, base_file_name: str) -> List[Dict[str, Any]]:
+        """Get all sealed versions of a file (by its first name or any version's name)"""
+        with self._index_lock:
+            records = self.file_index.versions(base_file_name)
+        versions = [
+            {
+                "file_name": record["file_name"],
+                "file_hash": record["file_hash"],
+                "version": record["version"],
+                "uploader": record["uploader"],
+                "timestamp": record["timestamp"],
+                "block_index": record["block_index"]
+            }
+            for record in records
+            if not record.get("pending")
         ]
+        return sorted(versions, key=lambda x: x["version"], reverse=True)
+    
+    def get_analytics_range(self, start: datetime, end: datetime,
+                            granularity: str = "hour", top: int = 10) -> Dict[str, Any]:
+        """
+        Get activity between start and end from the time buckets
+        Returns: dict with the bucket timeline at the given granularity, totals
+        for the window and the most downloaded files in it
+        """
+        time_buckets = self.aggregates.time_buckets
+        if granularity not in time_buckets.GRANULARITIES:
+            raise ValueError(f"granularity must be one of {', '.join(time_buckets.GRANULARITIES)}")
         
-        top_uploaders = [
-            {"user": user, "count": count}
-            for user, count in sorted(uploader_counts.items(), 
-                                    key=lambda x: x[1], reverse=True)[:10]
-        ]
+        with self._index_lock:
+            totals = time_buckets.totals(start, end)
+            timeline = time_buckets.series(granularity, start, end)
+            top_files = []
+            for file_hash, count in heapq.nlargest(top, totals["file_downloads"].items(),
+                                                   key=lambda x: x[1]):
+                record = self.file_index.get(file_hash)
+                top_files.append({
+                    "file_hash": file_hash,
+                    "file_name": record.get("file_name") if record else None,
+                    "downloads": count
+                })
         
-        top_downloaders = [
-            {"user": user, "count": count}
-            for user, count in sorted(downloader_counts.items(), 
-                                    key=lambda x: x[1], reverse=True)[:10]
-        ]
+        return {
+            "from": start.isoformat(),
+            "to": end.isoformat(),
+            "granularity": granularity,
+            "timeline": timeline,
+            "totals": {
+                "uploads": totals["uploads"],
+                "downloads": totals["downloads"],
+                "upload_bytes": totals["upload_bytes"],
+                "unique_files_downloaded": len(totals["file_downloads"])
+            },
+            "top_files": top_files
+        }
+    
+    def get_analytics_data(self) -> Dict[str, Any]:
+        """Get detailed analytics data for visualization"""
+        aggregates = self.aggregates
         
-        file_type_dist = [
-            {"type": ftype, "count": count}
-            for ftype, count in sorted(file_types.items(), 
-                                      key=lambda x: x[1], reverse=True)
-        ]
+        with self._index_lock:
+            activity_timeline = [
+                {"date": date, **counts} 
+                for date, counts in sorted(aggregates.activity_by_date.items())
+            ]
+            
+            hourly_activity = [
+                {"hour": hour, **counts}
+                for hour, counts in sorted(aggregates.activity_by_hour.items())
+            ]
+            
+            file_type_dist = [
+                {"type": ftype, "count": count}
+                for ftype, count in sorted(aggregates.file_types.items(), 
+                                          key=lambda x: x[1], reverse=True)
+            ]
+            
+            top_uploaders = aggregates.top(aggregates.uploader_counts)
+            top_downloaders = aggregates.top(aggregates.downloader_counts)
         
         return {
             "activity_timeline": activity_timeline,
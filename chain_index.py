@@ -0,0 +1,486 @@
+import bisect
+import heapq
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import List, Dict, Any, Optional, Tuple
+
+
+def file_record(data: Dict[str, Any], block_index: Optional[int]) -> Dict[str, Any]:
+    """Build the public file record for a file_upload transaction"""
+    return {
+        "file_name": data.get("file_name"),
+        "file_hash": data.get("file_hash"),
+        "file_size": data.get("file_size"),
+        "uploader": data.get("uploader"),
+        "file_path": data.get("file_path"),
+        "timestamp": data.get("timestamp"),
+        "block_index": block_index,
+        "is_encrypted": data.get("is_encrypted", False),
+        "salt": data.get("salt"),
+        "version": data.get("version", 1),
+        "previous_version_hash": data.get("previous_version_hash")
+    }
+
+
+class FileIndex:
+    """In-memory index of uploaded files keyed by file hash"""
+
+    def __init__(self):
+        # First upload of each hash (what get_file_by_hash has always returned)
+        self.first_by_hash: Dict[str, Dict[str, Any]] = {}
+        # Latest upload of each hash, kept in first-upload order
+        self.latest_by_hash: Dict[str, Dict[str, Any]] = {}
+        # Uploads queued for sealing but not yet in a block
+        self.pending_by_hash: Dict[str, Dict[str, Any]] = {}
+        # Version lineages: first file name -> uploads in version order, each
+        # later version linked to the one before by previous_version_hash
+        self.lineages: Dict[str, List[Dict[str, Any]]] = {}
+        self.lineage_by_hash: Dict[str, str] = {}
+        self.lineage_by_name: Dict[str, str] = {}
+
+    def _add_version(self, record: Dict[str, Any]):
+        previous = record.get("previous_version_hash")
+        key = self.lineage_by_hash.get(previous) if previous else None
+        if key is None:
+            key = self.lineage_by_name.get(record["file_name"], record["file_name"])
+
+        lineage = self.lineages.setdefault(key, [])
+        # A sealed upload takes the place of its pending record
+        for position, existing in enumerate(lineage):
+            if existing.get("pending") and existing["file_hash"] == record["file_hash"]:
+                lineage[position] = record
+                break
+        else:
+            lineage.append(record)
+        self.lineage_by_hash[record["file_hash"]] = key
+        self.lineage_by_name[record["file_name"]] = key
+
+    def add_transaction(self, data: Dict[str, Any], block_index: int):
+        """Index a transaction if it is a file upload"""
+        if data.get("type") != "file_upload":
+            return
+
+        record = file_record(data, block_index)
+        file_hash = record["file_hash"]
+        self.pending_by_hash.pop(file_hash, None)
+        self.first_by_hash.setdefault(file_hash, record)
+        self.latest_by_hash[file_hash] = record
+        self._add_version(record)
+
+    def add_pending(self, data: Dict[str, Any]):
+        """Make a queued upload visible before its block is mined"""
+        if data.get("type") != "file_upload":
+            return
+
+        record = file_record(data, None)
+        record["pending"] = True
+        record["receipt_id"] = data.get("receipt_id")
+        # A replica may index the sealed block before it learns of the queued upload
+        sealed = self.latest_by_hash.get(record["file_hash"])
+        if sealed and sealed["file_name"] == record["file_name"]:
+            return
+        if record["file_hash"] not in self.pending_by_hash:
+            self.pending_by_hash[record["file_hash"]] = record
+            self._add_version(record)
+
+    def get(self, file_hash: str) -> Optional[Dict[str, Any]]:
+        """Get a copy of the file record for a hash"""
+        record = self.first_by_hash.get(file_hash) or self.pending_by_hash.get(file_hash)
+        return dict(record) if record else None
+
+    def all(self) -> List[Dict[str, Any]]:
+        """Get copies of all file records in upload order, pending uploads last"""
+        records = [dict(record) for record in self.latest_by_hash.values()]
+        records.extend(dict(record) for file_hash, record in list(self.pending_by_hash.items())
+                       if file_hash not in self.latest_by_hash)
+        return records
+
+    def next_version(self, file_name: str) -> Tuple[str, int, Optional[str]]:
+        """
+        Work out the version a new upload of file_name gets
+        Returns: (lineage name, version, previous_version_hash)
+        """
+        key = self.lineage_by_name.get(file_name, file_name)
+        lineage = self.lineages.get(key)
+        if not lineage:
+            return key, 1, None
+        latest = lineage[-1]
+        return key, latest.get("version", 1) + 1, latest["file_hash"]
+
+    def versions(self, file_name: str) -> List[Dict[str, Any]]:
+        """Get copies of every upload in the lineage of file_name, oldest first"""
+        key = self.lineage_by_name.get(file_name, file_name)
+        return [dict(record) for record in self.lineages.get(key, [])]
+
+    def __len__(self) -> int:
+        return len(self.latest_by_hash)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert sealed index state to a dictionary (pending uploads are not saved)"""
+        return {
+            "first_by_hash": self.first_by_hash,
+            "latest_by_hash": self.latest_by_hash,
+            "lineages": {
+                key: [record for record in lineage if not record.get("pending")]
+                for key, lineage in self.lineages.items()
+            }
+        }
+
+    def load_dict(self, state: Dict[str, Any]):
+        """Restore index state saved by to_dict"""
+        self.first_by_hash = state.get("first_by_hash", {})
+        self.latest_by_hash = state.get("latest_by_hash", {})
+        if "lineages" in state:
+            self.lineages = state["lineages"]
+            for key, lineage in self.lineages.items():
+                for record in lineage:
+                    self.lineage_by_hash[record["file_hash"]] = key
+                    self.lineage_by_name[record["file_name"]] = key
+        else:
+            # Snapshots from before lineages were tracked
+            for record in sorted(self.first_by_hash.values(), key=lambda r: r.get("block_index") or 0):
+                self._add_version(record)
+
+
+class UserIndex:
+    """Secondary index from user name to the transactions they made.
+
+    Each entry is a (block_index, tx_index) pair, kept in chain order, so a
+    user's activity can be paged without scanning the chain. Downloads whose
+    blocks were archived by compaction only remain as a per-user count.
+    """
+
+    KINDS = {"file_upload": ("uploads", "uploader"), "file_download": ("downloads", "downloader")}
+
+    def __init__(self):
+        self.uploads: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        self.downloads: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        self.archived_downloads: Dict[str, int] = defaultdict(int)
+
+    def add_transaction(self, data: Dict[str, Any], block_index: int, tx_index: int):
+        """Index an upload or download transaction"""
+        kind = self.KINDS.get(data.get("type"))
+        if kind:
+            attribute, user_field = kind
+            getattr(self, attribute)[data.get(user_field)].append((block_index, tx_index))
+
+    def archive_downloads(self, downloader_counts: Dict[str, int], block_indexes: set):
+        """Replace the entries of archived download blocks with per-user counts"""
+        for user, count in downloader_counts.items():
+            self.downloads[user] = [entry for entry in self.downloads.get(user, [])
+                                    if entry[0] not in block_indexes]
+            self.archived_downloads[user] += count
+
+    def merge_archived(self, downloader_counts: Dict[str, int]):
+        """Count downloads that were archived before the chain was loaded"""
+        for user, count in downloader_counts.items():
+            self.archived_downloads[user] += count
+
+    def counts(self, user: str) -> Dict[str, int]:
+        """Get a user's upload and download totals"""
+        return {
+            "uploads": len(self.uploads.get(user, [])),
+            "downloads": len(self.downloads.get(user, [])) + self.archived_downloads.get(user, 0),
+            "archived_downloads": self.archived_downloads.get(user, 0)
+        }
+
+    def page(self, user: str, kinds: List[str], before: Optional[Tuple[int, int]] = None,
+             limit: int = 50) -> Tuple[List[Tuple[int, int, str]], Optional[Tuple[int, int]]]:
+        """
+        Get a user's most recent entries before a position, newest first
+        Returns: ([(block_index, tx_index, kind)], position to continue before, or None)
+        """
+        def tagged(entries, kind):
+            # Binds kind now; a generator expression would read the loop variable late
+            return ((block, tx, kind) for block, tx in entries)
+
+        streams = []
+        for kind in kinds:
+            entries = getattr(self, kind).get(user, [])
+            end = bisect.bisect_left(entries, before) if before is not None else len(entries)
+            streams.append(tagged(reversed(entries[:end]), kind))
+
+        merged = heapq.merge(*streams, reverse=True)
+        page = [entry for _, entry in zip(range(limit + 1), merged)]
+        if len(page) > limit:
+            return page[:limit], page[limit - 1][:2]
+        return page, None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert index state to a dictionary"""
+        return {
+            "uploads": self.uploads,
+            "downloads": self.downloads,
+            "archived_downloads": self.archived_downloads
+        }
+
+    def load_dict(self, state: Dict[str, Any]):
+        """Restore index state saved by to_dict"""
+        for name in ("uploads", "downloads"):
+            getattr(self, name).update(
+                (user, [tuple(entry) for entry in entries]) for user, entries in state.get(name, {}).items()
+            )
+        self.archived_downloads.update(state.get("archived_downloads", {}))
+
+
+class TimeBuckets:
+    """Per-minute, per-hour and per-day activity counts for range queries.
+
+    Bucket keys are prefixes of the isoformat() transaction timestamps, so
+    they sort in time order as plain strings. Every transaction is counted
+    at all three granularities; minute buckets are only kept for the last
+    minute_retention seconds, so memory and snapshots grow with hours and
+    days of activity rather than minutes.
+    """
+
+    GRANULARITIES = {"minute": 16, "hour": 13, "day": 10}
+    # Fields cleared to get the start of a bucket
+    FLOORS = {
+        "minute": {"second": 0, "microsecond": 0},
+        "hour": {"minute": 0, "second": 0, "microsecond": 0},
+        "day": {"hour": 0, "minute": 0, "second": 0, "microsecond": 0}
+    }
+
+    def __init__(self, minute_retention: float = 2 * 24 * 3600):
+        self.buckets: Dict[str, Dict[str, Dict[str, Any]]] = {
+            granularity: {} for granularity in self.GRANULARITIES
+        }
+        self.keys: Dict[str, List[str]] = {granularity: [] for granularity in self.GRANULARITIES}
+        self.minute_retention = minute_retention
+        # Minute buckets before this key have been dropped
+        self.minute_cutoff = ""
+
+    def drop_old_minutes(self, now: Optional[datetime] = None):
+        """Drop minute buckets older than minute_retention (their hours and days remain)"""
+        now = now or datetime.now()
+        cutoff = (now - timedelta(seconds=self.minute_retention)).isoformat()[:16]
+        if cutoff <= self.minute_cutoff:
+            return
+        self.minute_cutoff = cutoff
+        keys = self.keys["minute"]
+        dropped = bisect.bisect_left(keys, cutoff)
+        buckets = self.buckets["minute"]
+        for key in keys[:dropped]:
+            del buckets[key]
+        del keys[:dropped]
+
+    def _bucket(self, granularity: str, key: str) -> Dict[str, Any]:
+        buckets = self.buckets[granularity]
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = buckets[key] = {"uploads": 0, "downloads": 0, "upload_bytes": 0,
+                                     "file_downloads": defaultdict(int)}
+            keys = self.keys[granularity]
+            # Timestamps almost always arrive in order
+            if not keys or keys[-1] < key:
+                keys.append(key)
+            else:
+                bisect.insort(keys, key)
+        return bucket
+
+    def _merge_bucket(self, bucket: Dict[str, Any], counts: Dict[str, Any]):
+        bucket["uploads"] += counts.get("uploads", 0)
+        bucket["downloads"] += counts.get("downloads", 0)
+        bucket["upload_bytes"] += counts.get("upload_bytes", 0)
+        for file_hash, count in counts.get("file_downloads", {}).items():
+            bucket["file_downloads"][file_hash] += count
+
+    def add_transaction(self, data: Dict[str, Any]):
+        """Count one transaction in its minute, hour and day buckets"""
+        timestamp = data.get("timestamp")
+        tx_type = data.get("type")
+        if not timestamp or len(timestamp) < 16 or tx_type not in ("file_upload", "file_download"):
+            return
+        # Time has moved on once a new minute starts
+        minute_keys = self.keys["minute"]
+        if not minute_keys or timestamp[:16] > minute_keys[-1]:
+            self.drop_old_minutes()
+        for granularity, width in self.GRANULARITIES.items():
+            if granularity == "minute" and timestamp[:16] < self.minute_cutoff:
+                continue
+            bucket = self._bucket(granularity, timestamp[:width])
+            if tx_type == "file_upload":
+                bucket["uploads"] += 1
+                bucket["upload_bytes"] += data.get("file_size") or 0
+            else:
+                bucket["downloads"] += 1
+                bucket["file_downloads"][data.get("file_hash")] += 1
+
+    def _slice(self, granularity: str, start: datetime, end: datetime) -> List[Tuple[str, Dict[str, Any]]]:
+        """Buckets of one granularity that overlap [start, end), including the one in progress at end"""
+        if start >= end:
+            return []
+        width = self.GRANULARITIES[granularity]
+        keys = self.keys[granularity]
+        lo = bisect.bisect_left(keys, start.isoformat()[:width])
+        end_key = end.isoformat()[:width]
+        if end.replace(**self.FLOORS[granularity]) == end:
+            hi = bisect.bisect_left(keys, end_key)
+        else:
+            hi = bisect.bisect_right(keys, end_key)
+        buckets = self.buckets[granularity]
+        return [(key, buckets[key]) for key in keys[lo:hi]]
+
+    def series(self, granularity: str, start: datetime, end: datetime) -> List[Dict[str, Any]]:
+        """Non-empty buckets of one granularity between start and end"""
+        return [
+            {"period": key, "uploads": bucket["uploads"], "downloads": bucket["downloads"],
+             "upload_bytes": bucket["upload_bytes"]}
+            for key, bucket in self._slice(granularity, start, end)
+        ]
+
+    def totals(self, start: datetime, end: datetime) -> Dict[str, Any]:
+        """
+        Merge the coarsest buckets that cover [start, end), widened to whole
+        minutes (whole hours where minute buckets have been dropped)
+        Returns: bucket dict with uploads, downloads, upload_bytes and file_downloads
+        """
+        start = start.replace(**self.FLOORS["minute"])
+        if end.replace(**self.FLOORS["minute"]) != end:
+            end = end.replace(**self.FLOORS["minute"]) + timedelta(minutes=1)
+        if start.isoformat()[:16] < self.minute_cutoff:
+            start = start.replace(minute=0)
+        if end.replace(minute=0).isoformat()[:16] < self.minute_cutoff and end.minute:
+            end = end.replace(minute=0) + timedelta(hours=1)
+        hour_start = start if start.minute == 0 else (
+            start.replace(minute=0) + timedelta(hours=1))
+        hour_end = end.replace(minute=0)
+        if hour_start >= hour_end:
+            pieces = [("minute", start, end)]
+        else:
+            day_start = hour_start if hour_start.hour == 0 else (
+                hour_start.replace(hour=0) + timedelta(days=1))
+            day_end = hour_end.replace(hour=0)
+            if day_start >= day_end:
+                pieces = [("hour", hour_start, hour_end)]
+            else:
+                pieces = [("hour", hour_start, day_start), ("day", day_start, day_end),
+                          ("hour", day_end, hour_end)]
+            pieces += [("minute", start, hour_start), ("minute", hour_end, end)]
+
+        merged = {"uploads": 0, "downloads": 0, "upload_bytes": 0, "file_downloads": defaultdict(int)}
+        for granularity, piece_start, piece_end in pieces:
+            for _, bucket in self._slice(granularity, piece_start, piece_end):
+                self._merge_bucket(merged, bucket)
+        return merged
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert bucket state to a dictionary"""
+        return self.buckets
+
+    def load_dict(self, state: Dict[str, Any]):
+        """Add the buckets of a to_dict state (snapshot or compaction rollup)"""
+        self.drop_old_minutes()
+        for granularity in self.GRANULARITIES:
+            for key, counts in state.get(granularity, {}).items():
+                if granularity == "minute" and key < self.minute_cutoff:
+                    continue
+                self._merge_bucket(self._bucket(granularity, key), counts)
+
+
+class ChainAggregates:
+    """Running counters behind get_chain_stats and get_analytics_data"""
+
+    def __init__(self, minute_retention: float = 2 * 24 * 3600):
+        self.total_uploads = 0
+        self.total_downloads = 0
+        self.total_size = 0
+        self.encrypted_files = 0
+        self.uploader_counts: Dict[str, int] = defaultdict(int)
+        self.downloader_counts: Dict[str, int] = defaultdict(int)
+        self.file_download_counts: Dict[str, int] = defaultdict(int)
+        self.file_types: Dict[str, int] = defaultdict(int)
+        self.activity_by_date = defaultdict(lambda: {"uploads": 0, "downloads": 0})
+        self.activity_by_hour = defaultdict(lambda: {"uploads": 0, "downloads": 0})
+        self.time_buckets = TimeBuckets(minute_retention)
+
+    def _record_activity(self, timestamp: Optional[str], kind: str):
+        if not timestamp:
+            return
+        # Timestamps are datetime.isoformat() strings: YYYY-MM-DDTHH:MM:SS...
+        date = timestamp.split("T")[0]
+        hour = int(timestamp[11:13]) if len(timestamp) >= 13 else 0
+        self.activity_by_date[date][kind] += 1
+        self.activity_by_hour[hour][kind] += 1
+
+    def add_transaction(self, data: Dict[str, Any]):
+        """Fold one transaction into the running aggregates"""
+        tx_type = data.get("type")
+        self.time_buckets.add_transaction(data)
+        if tx_type == "file_upload":
+            self.total_uploads += 1
+            self.total_size += data.get("file_size", 0)
+            if data.get("is_encrypted"):
+                self.encrypted_files += 1
+            self.uploader_counts[data.get("uploader")] += 1
+
+            file_name = data.get("file_name", "")
+            ext = file_name.split(".")[-1] if "." in file_name else "unknown"
+            self.file_types[ext] += 1
+
+            self._record_activity(data.get("timestamp"), "uploads")
+
+        elif tx_type == "file_download":
+            self.total_downloads += 1
+            self.downloader_counts[data.get("downloader")] += 1
+            self.file_download_counts[data.get("file_hash")] += 1
+            self._record_activity(data.get("timestamp"), "downloads")
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert aggregate state to a dictionary"""
+        return {
+            "total_uploads": self.total_uploads,
+            "total_downloads": self.total_downloads,
+            "total_size": self.total_size,
+            "encrypted_files": self.encrypted_files,
+            "uploader_counts": self.uploader_counts,
+            "downloader_counts": self.downloader_counts,
+            "file_download_counts": self.file_download_counts,
+            "file_types": self.file_types,
+            "activity_by_date": self.activity_by_date,
+            # JSON object keys are strings; hours are restored as ints
+            "activity_by_hour": {str(hour): counts for hour, counts in self.activity_by_hour.items()},
+            "time_buckets": self.time_buckets.to_dict()
+        }
+
+    def load_dict(self, state: Dict[str, Any]):
+        """Restore aggregate state saved by to_dict"""
+        self.total_uploads = state.get("total_uploads", 0)
+        self.total_downloads = state.get("total_downloads", 0)
+        self.total_size = state.get("total_size", 0)
+        self.encrypted_files = state.get("encrypted_files", 0)
+        self.uploader_counts.update(state.get("uploader_counts", {}))
+        self.downloader_counts.update(state.get("downloader_counts", {}))
+        self.file_download_counts.update(state.get("file_download_counts", {}))
+        self.file_types.update(state.get("file_types", {}))
+        self.activity_by_date.update(state.get("activity_by_date", {}))
+        self.activity_by_hour.update(
+            (int(hour), counts) for hour, counts in state.get("activity_by_hour", {}).items()
+        )
+        self.time_buckets.load_dict(state.get("time_buckets", {}))
+
+    def merge_dict(self, state: Dict[str, Any]):
+        """Add the counts of a to_dict state (e.g. a compaction rollup) to these aggregates"""
+        self.total_uploads += state.get("total_uploads", 0)
+        self.total_downloads += state.get("total_downloads", 0)
+        self.total_size += state.get("total_size", 0)
+        self.encrypted_files += state.get("encrypted_files", 0)
+        for name in ("uploader_counts", "downloader_counts", "file_download_counts", "file_types"):
+            counts = getattr(self, name)
+            for key, count in state.get(name, {}).items():
+                counts[key] += count
+        for name in ("activity_by_date", "activity_by_hour"):
+            activity = getattr(self, name)
+            for key, counts in state.get(name, {}).items():
+                bucket = activity[int(key) if name == "activity_by_hour" else key]
+                for kind, count in counts.items():
+                    bucket[kind] += count
+        self.time_buckets.load_dict(state.get("time_buckets", {}))
+
+    @staticmethod
+    def top(counts: Dict[str, int], limit: int = 10) -> List[Dict[str, Any]]:
+        """Get the users with the highest counts"""
+        return [
+            {"user": user, "count": count}
+            for user, count in heapq.nlargest(limit, counts.items(), key=lambda x: x[1])
+        ]
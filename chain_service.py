@@ -0,0 +1,193 @@
+import json
+import os
+import signal
+import socket
+import socketserver
+import sys
+import threading
+import time
+from typing import Any, Optional
+from blockchain import Blockchain
+from peer_verification import PeerVerification
+from smart_contract import ContractManager
+
+
+# Methods a replica may call on the chain writer, by service; a call names
+# them as "service.method" ("contracts.log_access"), or just the method
+# for the blockchain
+WRITER_METHODS = {
+    "blockchain": {"submit_transaction", "seal_pending", "get_receipt", "compact",
+                   "get_file_by_hash", "get_pending_files"},
+    "contracts": {"create_contract", "get_contract", "get_all_contracts", "log_access",
+                  "record_download", "grant_permission", "revoke_permission"},
+    "peers": {"submit_verification", "get_user_reputation", "get_file_verification",
+              "get_file_verifications", "get_top_verifiers", "get_verification_stats"}
+}
+
+
+def create_blockchain(config, writer: Optional['ChainClient'] = None) -> Blockchain:
+    """Build the Blockchain described by a Config class"""
+    return Blockchain(
+        difficulty=config.BLOCKCHAIN_DIFFICULTY,
+        storage_format=config.BLOCKCHAIN_STORAGE,
+        record_format=config.BLOCKCHAIN_RECORD_FORMAT,
+        fsync_every=config.BLOCKCHAIN_FSYNC_EVERY,
+        segment_max_bytes=config.BLOCKCHAIN_SEGMENT_MAX_BYTES,
+        checkpoint_interval=config.BLOCKCHAIN_CHECKPOINT_INTERVAL,
+        checkpoint_key=config.SECRET_KEY,
+        batch_size=config.BLOCKCHAIN_BATCH_SIZE,
+        batch_interval=config.BLOCKCHAIN_BATCH_INTERVAL,
+        batch_uploads=config.BLOCKCHAIN_BATCH_UPLOADS,
+        mining_workers=config.MINING_WORKERS,
+        parallel_min_difficulty=config.PARALLEL_MINING_MIN_DIFFICULTY,
+        async_sealing=config.BLOCKCHAIN_ASYNC_SEALING,
+        lazy_load=config.BLOCKCHAIN_LAZY_LOAD,
+        snapshot_interval=config.BLOCKCHAIN_SNAPSHOT_INTERVAL,
+        auto_compact=config.BLOCKCHAIN_AUTO_COMPACT,
+        adaptive_difficulty=config.BLOCKCHAIN_ADAPTIVE_DIFFICULTY,
+        target_mining_time=config.BLOCKCHAIN_TARGET_MINING_TIME,
+        min_difficulty=config.BLOCKCHAIN_MIN_DIFFICULTY,
+        max_difficulty=config.BLOCKCHAIN_MAX_DIFFICULTY,
+        analytics_minute_retention=config.ANALYTICS_MINUTE_RETENTION,
+        receipt_ttl=config.BLOCKCHAIN_RECEIPT_TTL,
+        writer=writer
+    )
+
+
+class ChainRequestHandler(socketserver.StreamRequestHandler):
+    """Serve newline-delimited JSON calls: {"method": ..., "params": {...}}"""
+
+    def handle(self):
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+                service, _, name = str(request.get("method")).rpartition(".")
+                service = service or "blockchain"
+                if name not in WRITER_METHODS.get(service, ()):
+                    raise ValueError(f"Unknown method {request.get('method')}")
+                result = getattr(self.server.services[service], name)(**request.get("params", {}))
+                # Contracts travel as their dictionaries
+                if hasattr(result, "to_dict"):
+                    result = result.to_dict()
+                response = {"result": result}
+            except Exception as e:
+                response = {"error": str(e)}
+            self.wfile.write((json.dumps(response) + "\n").encode())
+            self.wfile.flush()
+
+
+class ChainWriterServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Unix socket server owning the only writable Blockchain, contracts and peer verifications"""
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, blockchain: Blockchain,
+                 contracts: Optional[ContractManager] = None,
+                 peers: Optional[PeerVerification] = None):
+        # A socket file left behind by a previous writer would block bind()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        self.blockchain = blockchain
+        self.services = {"blockchain": blockchain, "contracts": contracts, "peers": peers}
+        super().__init__(socket_path, ChainRequestHandler)
+
+
+class ChainClient:
+    """Connection from a replica to the chain writer"""
+
+    def __init__(self, socket_path: str, timeout: float = 300.0, reconnect_timeout: float = 30.0):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        # How long a call waits for a restarting writer to accept connections again
+        self.reconnect_timeout = reconnect_timeout
+        self._sock = None
+        self._file = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        # Connections are not shared across fork()
+        if self._sock is None or self._pid != os.getpid():
+            self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._sock.settimeout(self.timeout)
+            try:
+                self._sock.connect(self.socket_path)
+            except OSError:
+                # Nothing was sent yet, so waiting for a restarted writer is safe
+                if not wait_for_socket(self.socket_path, self.reconnect_timeout):
+                    raise
+                self._sock.close()
+                self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                self._sock.settimeout(self.timeout)
+                self._sock.connect(self.socket_path)
+            self._file = self._sock.makefile('rb')
+            self._pid = os.getpid()
+
+    def _disconnect(self):
+        if self._file is not None:
+            self._file.close()
+        if self._sock is not None:
+            self._sock.close()
+        self._sock = None
+        self._file = None
+
+    def call(self, method: str, **params) -> Any:
+        """Call a method on the chain writer ("method" or "service.method")"""
+        request = (json.dumps({"method": method, "params": params}) + "\n").encode()
+        with self._lock:
+            try:
+                self._connect()
+                self._sock.sendall(request)
+                line = self._file.readline()
+            except OSError:
+                self._disconnect()
+                raise
+            if not line:
+                self._disconnect()
+                raise ConnectionError("Chain writer closed the connection")
+
+        response = json.loads(line)
+        if "error" in response:
+            raise RuntimeError(f"Chain writer error: {response['error']}")
+        return response["result"]
+
+
+def wait_for_socket(socket_path: str, timeout: float = 30.0) -> bool:
+    """Wait until the chain writer accepts connections"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.connect(socket_path)
+                return True
+        except OSError:
+            time.sleep(0.1)
+    return False
+
+
+def main():
+    from config import get_config
+
+    config = get_config()
+    socket_path = config.CHAIN_SERVICE_SOCKET
+    if not socket_path:
+        print("CHAIN_SERVICE_SOCKET is not set")
+        sys.exit(1)
+
+    # Exit normally on SIGTERM so the block log is synced and closed
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    blockchain = create_blockchain(config)
+    server = ChainWriterServer(socket_path, blockchain, ContractManager(), PeerVerification())
+    print(f"✓ Chain writer listening on {socket_path} ({len(blockchain.chain)} blocks)")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        blockchain.close()
+
+
+if __name__ == '__main__':
+    main()
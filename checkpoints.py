@@ -0,0 +1,77 @@
+import hashlib
+import hmac
+import json
+import os
+import time
+from typing import List, Dict, Any, Optional
+
+
+class CheckpointStore:
+    """Signed validation checkpoints for the blockchain.
+
+    A checkpoint records that every block below ``height`` was fully
+    validated and that block ``height - 1`` had ``block_hash``. Checkpoints
+    are signed with HMAC-SHA256 so a restarted node can resume incremental
+    validation from the last trusted height instead of re-hashing the chain.
+    """
+
+    def __init__(self, storage_path: str, secret_key: str, keep: int = 10):
+        self.storage_path = storage_path
+        self.secret_key = secret_key.encode()
+        self.keep = keep
+        self.checkpoints: List[Dict[str, Any]] = []
+
+        self.load_from_disk()
+
+    def sign(self, height: int, block_hash: str) -> str:
+        """Sign a (height, block_hash) pair"""
+        message = f"{height}:{block_hash}".encode()
+        return hmac.new(self.secret_key, message, hashlib.sha256).hexdigest()
+
+    def add(self, height: int, block_hash: str):
+        """Record a new checkpoint and persist it"""
+        self.checkpoints.append({
+            "height": height,
+            "block_hash": block_hash,
+            "created_at": time.time(),
+            "signature": self.sign(height, block_hash)
+        })
+        self.checkpoints = self.checkpoints[-self.keep:]
+        self.save_to_disk()
+
+    def latest_trusted(self, chain: List[Any]) -> Optional[Dict[str, Any]]:
+        """Get the newest checkpoint whose signature and block hash still match the chain"""
+        for checkpoint in reversed(self.checkpoints):
+            height = checkpoint.get("height", 0)
+            block_hash = checkpoint.get("block_hash", "")
+            if not 0 < height <= len(chain):
+                continue
+            if not hmac.compare_digest(checkpoint.get("signature", ""),
+                                       self.sign(height, block_hash)):
+                continue
+            if chain[height - 1].hash != block_hash:
+                continue
+            return checkpoint
+        return None
+
+    def save_to_disk(self):
+        """Save checkpoints to disk"""
+        try:
+            tmp_path = self.storage_path + ".tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump({"checkpoints": self.checkpoints}, f, indent=2)
+            os.replace(tmp_path, self.storage_path)
+        except Exception as e:
+            print(f"Error saving checkpoints: {e}")
+
+    def load_from_disk(self):
+        """Load checkpoints from disk"""
+        try:
+            if not os.path.exists(self.storage_path):
+                return
+
+            with open(self.storage_path, 'r') as f:
+                self.checkpoints = json.load(f).get("checkpoints", [])
+
+        except Exception as e:
+            print(f"Error loading checkpoints: {e}")
@@ -21,6 +21,76 @@ class Config:
     
     # Blockchain settings
     BLOCKCHAIN_DIFFICULTY = int(os.getenv('BLOCKCHAIN_DIFFICULTY', 2))
+    # Retarget difficulty from recent mining times toward a per-block budget
+    BLOCKCHAIN_ADAPTIVE_DIFFICULTY = os.getenv('BLOCKCHAIN_ADAPTIVE_DIFFICULTY', 'False').lower() == 'true'
+    BLOCKCHAIN_TARGET_MINING_TIME = float(os.getenv('BLOCKCHAIN_TARGET_MINING_TIME', 1.0))  # seconds
+    # Lowest difficulty blocks may record with adaptive difficulty (otherwise
+    # BLOCKCHAIN_DIFFICULTY). A chain keeps the floor it was mined under, so an
+    # adaptively mined chain stays valid when reopened without adaptive mode.
+    BLOCKCHAIN_MIN_DIFFICULTY = int(os.getenv('BLOCKCHAIN_MIN_DIFFICULTY', 1))
+    BLOCKCHAIN_MAX_DIFFICULTY = int(os.getenv('BLOCKCHAIN_MAX_DIFFICULTY', 6))
+    BLOCKCHAIN_STORAGE = os.getenv('BLOCKCHAIN_STORAGE', 'log')  # 'log' or 'json'
+    # Block log record encoding: 'json' or 'binary' (compact block codec)
+    BLOCKCHAIN_RECORD_FORMAT = os.getenv('BLOCKCHAIN_RECORD_FORMAT', 'json')
+    BLOCKCHAIN_FSYNC_EVERY = int(os.getenv('BLOCKCHAIN_FSYNC_EVERY', 32))
+    BLOCKCHAIN_SEGMENT_MAX_BYTES = int(os.getenv('BLOCKCHAIN_SEGMENT_MAX_BYTES', 64 * 1024 * 1024))
+    BLOCKCHAIN_CHECKPOINT_INTERVAL = int(os.getenv('BLOCKCHAIN_CHECKPOINT_INTERVAL', 1000))
+    # Start from the header index and read block payloads on demand (log storage only)
+    BLOCKCHAIN_LAZY_LOAD = os.getenv('BLOCKCHAIN_LAZY_LOAD', 'False').lower() == 'true'
+    BLOCKCHAIN_SNAPSHOT_INTERVAL = int(os.getenv('BLOCKCHAIN_SNAPSHOT_INTERVAL', 1000))
+    # Archive download blocks of sealed segments, keeping rollups (log storage only)
+    BLOCKCHAIN_AUTO_COMPACT = os.getenv('BLOCKCHAIN_AUTO_COMPACT', 'False').lower() == 'true'
+    # How long per-minute analytics buckets are kept; older ranges are counted by the hour
+    ANALYTICS_MINUTE_RETENTION = int(os.getenv('ANALYTICS_MINUTE_RETENTION', 2 * 24 * 3600))  # seconds
+    
+    # Mempool: 0 mines every transaction in its own block
+    BLOCKCHAIN_BATCH_SIZE = int(os.getenv('BLOCKCHAIN_BATCH_SIZE', 0))
+    BLOCKCHAIN_BATCH_INTERVAL = float(os.getenv('BLOCKCHAIN_BATCH_INTERVAL', 5.0))  # seconds
+    BLOCKCHAIN_BATCH_UPLOADS = os.getenv('BLOCKCHAIN_BATCH_UPLOADS', 'False').lower() == 'true'
+    # Mine in a background worker and answer uploads with a pending receipt.
+    # The mempool is memory-only: queued transactions are sealed on a clean
+    # shutdown, but a crash loses every transaction not yet in a block
+    # (including uploads already answered with 202).
+    BLOCKCHAIN_ASYNC_SEALING = os.getenv('BLOCKCHAIN_ASYNC_SEALING', 'False').lower() == 'true'
+    # How long /api/receipts/<id> answers for a sealed transaction
+    BLOCKCHAIN_RECEIPT_TTL = float(os.getenv('BLOCKCHAIN_RECEIPT_TTL', 24 * 3600))  # seconds
+    
+    # Parallel mining: 0 = one process per CPU, 1 = single-threaded
+    MINING_WORKERS = int(os.getenv('MINING_WORKERS', 0))
+    PARALLEL_MINING_MIN_DIFFICULTY = int(os.getenv('PARALLEL_MINING_MIN_DIFFICULTY', 4))
+    
+    # Content-addressed upload store (default: <UPLOAD_FOLDER>/blobs); unreferenced
+    # content is deleted by POST /api/admin/blobs/gc after the grace period.
+    # Every recorded file version stays referenced, so gc only collects
+    # content of uploads that failed before their transaction was recorded.
+    BLOB_FOLDER = os.getenv('BLOB_FOLDER', '')
+    BLOB_GC_GRACE = float(os.getenv('BLOB_GC_GRACE', 3600))  # seconds
+    
+    # Resumable chunked uploads (/api/uploads); chunks are capped by MAX_CONTENT_LENGTH
+    UPLOAD_SESSION_MAX_BYTES = int(os.getenv('UPLOAD_SESSION_MAX_BYTES', 20 * 1024 * 1024 * 1024))  # 20GB
+    UPLOAD_SESSION_CHUNK_SIZE = int(os.getenv('UPLOAD_SESSION_CHUNK_SIZE', 8 * 1024 * 1024))
+    UPLOAD_SESSION_TTL = float(os.getenv('UPLOAD_SESSION_TTL', 24 * 3600))  # seconds idle
+    # A finalize claim older than this (or whose process is gone) no longer blocks the session
+    UPLOAD_SESSION_CLAIM_TIMEOUT = float(os.getenv('UPLOAD_SESSION_CLAIM_TIMEOUT', 3600))  # seconds
+    
+    # Full-chain audits (audit.py, POST /api/admin/audit): 0 = one process per CPU
+    AUDIT_WORKERS = int(os.getenv('AUDIT_WORKERS', 0))
+    # Admin endpoints require it in the X-Admin-Token header; unset = admin endpoints disabled
+    ADMIN_TOKEN = os.getenv('ADMIN_TOKEN', '')
+    
+    # Requests for the same file from the same downloader and address within
+    # this many seconds continue one download and are counted once
+    DOWNLOAD_RESUME_WINDOW = int(os.getenv('DOWNLOAD_RESUME_WINDOW', 3600))
+    # Who moves the bytes of unencrypted downloads: '' streams them from the
+    # worker, 'sendfile' uses the WSGI file_wrapper (os.sendfile under gunicorn),
+    # 'x-accel' / 'x-sendfile' hand them to nginx / Apache or lighttpd
+    DOWNLOAD_OFFLOAD = os.getenv('DOWNLOAD_OFFLOAD', '').lower()
+    # For 'x-accel': internal nginx location that serves UPLOAD_FOLDER
+    DOWNLOAD_ACCEL_PREFIX = os.getenv('DOWNLOAD_ACCEL_PREFIX', '/protected/')
+    
+    # Unix socket of the single chain writer (set by gunicorn.conf.py); when set,
+    # each worker keeps a read replica of the chain. Empty = standalone.
+    CHAIN_SERVICE_SOCKET = os.getenv('CHAIN_SERVICE_SOCKET', '')
     
     # CORS settings
     CORS_ORIGINS = os.getenv('CORS_ORIGINS', '*')
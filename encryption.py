@@ -1,13 +1,31 @@
-from cryptography.fernet import Fernet
+from cryptography.fernet import Fernet, InvalidToken
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 from cryptography.hazmat.backends import default_backend
 import base64
 import os
+import struct
+from typing import Iterable, Iterator, Tuple, Callable
 
 
 class FileEncryption:
-    """Handle file encryption and decryption"""
+    """Handle file encryption and decryption
+    
+    encrypt_file writes one Fernet token for the whole file. encrypt_chunks
+    streams: after CHUNKED_MAGIC and the 4-byte plaintext chunk size, every
+    plaintext chunk (all full-size but the last) becomes its own Fernet
+    token, prefixed with its 4-byte big-endian length. Each token's
+    plaintext starts with CHUNK_HEADER (chunk index, last-chunk flag), so
+    dropped, reordered or appended tokens fail to decrypt. Equal chunks give
+    equal-length tokens, so any plaintext offset maps to a token without
+    reading the ones before it. decrypt_file, decrypted_reader and
+    verify_password read both formats.
+    """
+    
+    CHUNKED_MAGIC = b"FSENC2\n"
+    TOKEN_LENGTH = struct.Struct(">I")
+    CHUNK_HEADER = struct.Struct(">QB")
+    CHUNK_SIZE = 1024 * 1024
     
     @staticmethod
     def generate_key_from_password(password: str, salt: bytes = None) -> tuple:
@@ -49,6 +67,140 @@ class FileEncryption:
         
         return encrypted_file_path, salt
     
+    @staticmethod
+    def encrypt_chunks(chunks: Iterable[bytes], password: str) -> Tuple[Iterator[bytes], bytes]:
+        """
+        Encrypt a stream of plaintext chunks with password
+        Returns: (iterator of encrypted output chunks, salt)
+        """
+        key, salt = FileEncryption.generate_key_from_password(password)
+        cipher = Fernet(key)
+        chunk_size = FileEncryption.CHUNK_SIZE
+        
+        def encrypt(index, chunk, last):
+            token = cipher.encrypt(FileEncryption.CHUNK_HEADER.pack(index, last) + chunk)
+            return FileEncryption.TOKEN_LENGTH.pack(len(token)) + token
+        
+        def generate():
+            yield FileEncryption.CHUNKED_MAGIC + FileEncryption.TOKEN_LENGTH.pack(chunk_size)
+            # Re-cut the input so every token but the last holds exactly chunk_size
+            # bytes; the last one is held back until the input ends so it can be
+            # flagged (an empty input still gives one empty last token)
+            buffer = bytearray()
+            index = 0
+            for chunk in chunks:
+                buffer += chunk
+                while len(buffer) > chunk_size:
+                    yield encrypt(index, bytes(buffer[:chunk_size]), False)
+                    del buffer[:chunk_size]
+                    index += 1
+            yield encrypt(index, bytes(buffer), True)
+        
+        return generate(), salt
+    
+    @staticmethod
+    def _read_token(file) -> bytes:
+        """Read one length-prefixed token; empty at end of file"""
+        prefix = file.read(FileEncryption.TOKEN_LENGTH.size)
+        if not prefix:
+            return b""
+        if len(prefix) != FileEncryption.TOKEN_LENGTH.size:
+            raise ValueError("Truncated encrypted file")
+        length, = FileEncryption.TOKEN_LENGTH.unpack(prefix)
+        token = file.read(length)
+        if len(token) != length:
+            raise ValueError("Truncated encrypted file")
+        return token
+    
+    @staticmethod
+    def _open_chunk(cipher: Fernet, token: bytes, index: int) -> Tuple[bytes, bool]:
+        """
+        Decrypt the token expected at chunk index
+        Returns: (plaintext chunk, last-chunk flag)
+        Raises ValueError when the token belongs at another index.
+        """
+        data = cipher.decrypt(token)
+        position, last = FileEncryption.CHUNK_HEADER.unpack_from(data)
+        if position != index:
+            raise ValueError("Encrypted chunk out of order")
+        return data[FileEncryption.CHUNK_HEADER.size:], bool(last)
+    
+    @staticmethod
+    def _decrypt_chunks(file, cipher: Fernet) -> Iterator[bytes]:
+        """Decrypt the tokens of a chunked file positioned after CHUNKED_MAGIC"""
+        file.read(FileEncryption.TOKEN_LENGTH.size)  # plaintext chunk size
+        index = 0
+        last = False
+        while True:
+            token = FileEncryption._read_token(file)
+            if not token:
+                if not last:
+                    raise ValueError("Truncated encrypted file")
+                return
+            if last:
+                raise ValueError("Data after the last encrypted chunk")
+            chunk, last = FileEncryption._open_chunk(cipher, token, index)
+            yield chunk
+            index += 1
+    
+    @staticmethod
+    def decrypted_reader(encrypted_file_path: str, password: str,
+                         salt: bytes) -> Tuple[int, Callable[[int, int], Iterator[bytes]]]:
+        """
+        Random access to the plaintext of an encrypted file
+        Chunked files decrypt only the tokens a read touches; single-token
+        files are decrypted in memory once.
+        Returns: (plaintext size, read(start, end) yielding plaintext bytes)
+        Raises ValueError for a wrong password or a damaged file.
+        """
+        key, _ = FileEncryption.generate_key_from_password(password, salt)
+        cipher = Fernet(key)
+        magic = FileEncryption.CHUNKED_MAGIC
+        prefix = FileEncryption.TOKEN_LENGTH.size
+        
+        try:
+            with open(encrypted_file_path, 'rb') as file:
+                if file.read(len(magic)) != magic:
+                    file.seek(0)
+                    data = cipher.decrypt(file.read())
+                    return len(data), lambda start, end: iter([data[start:end]])
+                
+                chunk_size, = FileEncryption.TOKEN_LENGTH.unpack(file.read(prefix))
+                header = file.tell()
+                first_token = FileEncryption._read_token(file)
+                if not first_token:
+                    # Even an empty file has its (empty) last token
+                    raise ValueError("Truncated encrypted file")
+                
+                # Every token but the last has the same length
+                stride = prefix + len(first_token)
+                total = os.fstat(file.fileno()).st_size - header
+                count = -(-total // stride)
+                file.seek(header + (count - 1) * stride)
+                # Decrypting the last token checks the password, that no
+                # trailing token is missing, and gives the size
+                last_chunk, last = FileEncryption._open_chunk(
+                    cipher, FileEncryption._read_token(file), count - 1)
+                if not last:
+                    raise ValueError("Truncated encrypted file")
+                size = (count - 1) * chunk_size + len(last_chunk)
+        except InvalidToken:
+            raise ValueError("Invalid password or corrupted file")
+        
+        def read(start: int, end: int) -> Iterator[bytes]:
+            with open(encrypted_file_path, 'rb') as file:
+                for index in range(start // chunk_size, -(-end // chunk_size)):
+                    file.seek(header + index * stride)
+                    try:
+                        chunk, _ = FileEncryption._open_chunk(
+                            cipher, FileEncryption._read_token(file), index)
+                    except InvalidToken:
+                        raise ValueError("Corrupted encrypted file")
+                    offset = index * chunk_size
+                    yield chunk[max(0, start - offset):end - offset]
+        
+        return size, read
+    
     @staticmethod
     def decrypt_file(encrypted_file_path: str, password: str, salt: bytes, 
                     output_path: str = None) -> str:
@@ -60,8 +212,23 @@ class FileEncryption:
         key, _ = FileEncryption.generate_key_from_password(password, salt)
         cipher = Fernet(key)
         
-        # Read encrypted file
+        if output_path is None:
+            output_path = encrypted_file_path.replace('.encrypted', '.decrypted')
+        
         with open(encrypted_file_path, 'rb') as file:
+            # Chunked files are decrypted one token at a time
+            if file.read(len(FileEncryption.CHUNKED_MAGIC)) == FileEncryption.CHUNKED_MAGIC:
+                try:
+                    with open(output_path, 'wb') as output:
+                        for chunk in FileEncryption._decrypt_chunks(file, cipher):
+                            output.write(chunk)
+                except Exception:
+                    os.remove(output_path)
+                    raise ValueError("Invalid password or corrupted file")
+                return output_path
+            
+            # Read encrypted file
+            file.seek(0)
             encrypted_data = file.read()
         
         # Decrypt data
@@ -71,9 +238,6 @@ class FileEncryption:
             raise ValueError("Invalid password or corrupted file")
         
         # Write decrypted file
-        if output_path is None:
-            output_path = encrypted_file_path.replace('.encrypted', '.decrypted')
-        
         with open(output_path, 'wb') as file:
             file.write(decrypted_data)
         
@@ -87,6 +251,11 @@ class FileEncryption:
             cipher = Fernet(key)
             
             with open(encrypted_file_path, 'rb') as file:
+                if file.read(len(FileEncryption.CHUNKED_MAGIC)) == FileEncryption.CHUNKED_MAGIC:
+                    # The first token is enough to tell a wrong password
+                    next(FileEncryption._decrypt_chunks(file, cipher), None)
+                    return True
+                file.seek(0)
                 encrypted_data = file.read()
             
             cipher.decrypt(encrypted_data)
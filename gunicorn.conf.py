@@ -0,0 +1,65 @@
+# Gunicorn configuration (loaded automatically from the working directory)
+#
+# The blockchain has a single writer: on_starting launches chain_service.py,
+# which owns the block log and serves appends over a Unix socket. Workers
+# read a replica of the chain that follows the log, so any number of workers
+# see the same chain; contracts and peer verifications also live in the writer.
+# A supervisor thread in the master restarts the writer if it exits; workers
+# wait for it to come back instead of failing their writes.
+import os
+import subprocess
+import sys
+import threading
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# Seconds between checks that the chain writer is still running
+CHAIN_WRITER_CHECK_INTERVAL = 1.0
+
+
+def _start_chain_writer(server, socket_path):
+    """Launch chain_service.py and wait until it accepts connections"""
+    from chain_service import wait_for_socket
+
+    server.chain_writer = subprocess.Popen(
+        [sys.executable, os.path.join(BASE_DIR, 'chain_service.py')]
+    )
+    if not wait_for_socket(socket_path):
+        server.chain_writer.terminate()
+        raise RuntimeError(f"Chain writer did not start on {socket_path}")
+    server.log.info("Chain writer started (pid %s)", server.chain_writer.pid)
+
+
+def _supervise_chain_writer(server, socket_path):
+    """Restart the chain writer whenever it exits, until the server stops"""
+    while not server.chain_writer_stopping.wait(CHAIN_WRITER_CHECK_INTERVAL):
+        code = server.chain_writer.poll()
+        if code is None:
+            continue
+        server.log.error("Chain writer exited with status %s, restarting", code)
+        try:
+            _start_chain_writer(server, socket_path)
+        except Exception as e:
+            server.log.error("Error restarting chain writer: %s", e)
+
+
+def on_starting(server):
+    """Start the chain writer (and its supervisor) before any worker loads the app"""
+    socket_path = os.environ.setdefault(
+        'CHAIN_SERVICE_SOCKET', os.path.join(BASE_DIR, 'data', 'chain.sock')
+    )
+    os.makedirs(os.path.dirname(socket_path), exist_ok=True)
+    _start_chain_writer(server, socket_path)
+    server.chain_writer_stopping = threading.Event()
+    threading.Thread(target=_supervise_chain_writer, args=(server, socket_path),
+                     daemon=True).start()
+
+
+def on_exit(server):
+    """Stop the chain writer after the workers are gone"""
+    stopping = getattr(server, 'chain_writer_stopping', None)
+    if stopping is not None:
+        stopping.set()
+    writer = getattr(server, 'chain_writer', None)
+    if writer is not None and writer.poll() is None:
+        writer.terminate()
+        writer.wait(timeout=30)
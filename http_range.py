@@ -0,0 +1,190 @@
+import uuid
+from typing import List, Dict, Optional, Tuple, Callable, Iterator
+
+from flask import Response
+from werkzeug.wsgi import wrap_file
+
+
+# More ranges than this in one request are answered with the whole file
+MAX_RANGES = 16
+
+ByteRange = Tuple[int, int]
+
+
+class RangeNotSatisfiable(ValueError):
+    """None of the requested ranges overlaps the representation"""
+
+
+def etag_matches(header: Optional[str], etag: str, weak: bool = True) -> bool:
+    """Check an If-None-Match / If-Range style list of entity tags against etag"""
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            # Weak tags never match in a strong comparison
+            if not weak:
+                continue
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[List[ByteRange]]:
+    """
+    Parse a Range header into sorted, merged [start, end) byte ranges
+    Returns: None to serve the whole representation (no header, another
+    unit, malformed or too many ranges); raises RangeNotSatisfiable when no
+    range overlaps a representation of this size
+    """
+    if not header or not header.startswith("bytes="):
+        return None
+    specs = header[len("bytes="):].split(",")
+    if len(specs) > MAX_RANGES:
+        return None
+
+    ranges = []
+    for spec in specs:
+        first, dash, last = spec.strip().partition("-")
+        if (not dash or not (first or last) or (first and not first.isdigit()) or
+                (last and not last.isdigit())):
+            return None
+        if not first:
+            # Suffix range: the last N bytes
+            length = int(last)
+            if length:
+                ranges.append((max(0, size - length), size))
+            continue
+        start = int(first)
+        if last and int(last) < start:
+            return None
+        end = min(int(last) + 1, size) if last else size
+        if start < size:
+            ranges.append((start, end))
+
+    if not ranges:
+        raise RangeNotSatisfiable(f"bytes */{size}")
+
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def requested_ranges(headers, etag: str, size: int) -> Optional[List[ByteRange]]:
+    """
+    Ranges to send for a request, honouring If-Range
+    Returns: None for the whole representation, else [start, end) ranges;
+    raises RangeNotSatisfiable
+    """
+    if_range = headers.get("If-Range")
+    # If-Range with a stale (or date) validator means "send it all"
+    if if_range and not etag_matches(if_range, etag, weak=False):
+        return None
+    return parse_range(headers.get("Range"), size)
+
+
+def _headers(etag: str, download_name: str) -> Dict[str, str]:
+    return {
+        "Accept-Ranges": "bytes",
+        "ETag": etag,
+        "Content-Disposition": f'attachment; filename="{download_name}"'
+    }
+
+
+def range_response(read: Callable[[int, int], Iterator[bytes]], size: int,
+                   ranges: Optional[List[ByteRange]], content_type: str,
+                   etag: str, download_name: str) -> Response:
+    """
+    Build a 200, 206 or multipart/byteranges 206 response
+    read(start, end) yields the bytes of [start, end) of the representation.
+    """
+    headers = _headers(etag, download_name)
+
+    if ranges is None:
+        headers["Content-Length"] = str(size)
+        return Response(read(0, size), 200, headers=headers, content_type=content_type,
+                        direct_passthrough=True)
+
+    if len(ranges) == 1:
+        start, end = ranges[0]
+        headers["Content-Range"] = f"bytes {start}-{end - 1}/{size}"
+        headers["Content-Length"] = str(end - start)
+        return Response(read(start, end), 206, headers=headers, content_type=content_type,
+                        direct_passthrough=True)
+
+    boundary = uuid.uuid4().hex
+    parts = [
+        (f"\r\n--{boundary}\r\nContent-Type: {content_type}\r\n"
+         f"Content-Range: bytes {start}-{end - 1}/{size}\r\n\r\n").encode()
+        for start, end in ranges
+    ]
+    closing = f"\r\n--{boundary}--\r\n".encode()
+
+    def generate():
+        for part, (start, end) in zip(parts, ranges):
+            yield part
+            yield from read(start, end)
+        yield closing
+
+    headers["Content-Length"] = str(sum(len(part) for part in parts) + len(closing) +
+                                    sum(end - start for start, end in ranges))
+    return Response(generate(), 206, headers=headers,
+                    content_type=f"multipart/byteranges; boundary={boundary}",
+                    direct_passthrough=True)
+
+
+def file_reader(path: str, block_size: int = 1024 * 1024) -> Callable[[int, int], Iterator[bytes]]:
+    """read(start, end) over a plain file"""
+    def read(start: int, end: int) -> Iterator[bytes]:
+        with open(path, 'rb') as f:
+            f.seek(start)
+            remaining = end - start
+            while remaining > 0:
+                block = f.read(min(block_size, remaining))
+                if not block:
+                    return
+                remaining -= len(block)
+                yield block
+    return read
+
+
+def offload_response(header: str, target: str, content_type: str,
+                     etag: str, download_name: str) -> Response:
+    """
+    Hand the transfer to the front server (X-Accel-Redirect or X-Sendfile)
+    The server reads the file itself and answers Range requests; the body
+    of this response is discarded.
+    """
+    headers = _headers(etag, download_name)
+    headers[header] = target
+    return Response(b"", 200, headers=headers, content_type=content_type)
+
+
+def sendfile_response(environ, path: str, size: int, ranges: Optional[List[ByteRange]],
+                      content_type: str, etag: str, download_name: str) -> Optional[Response]:
+    """
+    Serve a plain file through the WSGI server's file_wrapper, which gunicorn
+    sends with os.sendfile (the bytes never enter the worker)
+    Returns: None unless the whole file or one range running to the end of
+    it was asked for, since file_wrapper sends from the file offset to EOF
+    """
+    if ranges is not None and (len(ranges) != 1 or ranges[0][1] != size):
+        return None
+
+    start = ranges[0][0] if ranges else 0
+    headers = _headers(etag, download_name)
+    headers["Content-Length"] = str(size - start)
+    if ranges:
+        headers["Content-Range"] = f"bytes {start}-{size - 1}/{size}"
+
+    f = open(path, 'rb')
+    f.seek(start)
+    return Response(wrap_file(environ, f), 206 if ranges else 200, headers=headers,
+                    content_type=content_type, direct_passthrough=True)
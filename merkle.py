@@ -0,0 +1,64 @@
+import hashlib
+import json
+from typing import List, Dict, Any
+
+
+def transaction_hash(transaction: Dict[str, Any]) -> str:
+    """Calculate the SHA-256 leaf hash of a transaction"""
+    tx_string = json.dumps(transaction, sort_keys=True)
+    return hashlib.sha256(tx_string.encode()).hexdigest()
+
+
+def _hash_pair(left: str, right: str) -> str:
+    return hashlib.sha256(bytes.fromhex(left) + bytes.fromhex(right)).hexdigest()
+
+
+def merkle_root(leaves: List[str]) -> str:
+    """Calculate the Merkle root of a list of hex leaf hashes"""
+    if not leaves:
+        return hashlib.sha256(b"").hexdigest()
+
+    level = list(leaves)
+    while len(level) > 1:
+        # An odd node is paired with itself
+        if len(level) % 2:
+            level.append(level[-1])
+        level = [_hash_pair(level[i], level[i + 1]) for i in range(0, len(level), 2)]
+    return level[0]
+
+
+def transactions_root(transactions: List[Dict[str, Any]]) -> str:
+    """Calculate the Merkle root over a list of transactions"""
+    return merkle_root([transaction_hash(tx) for tx in transactions])
+
+
+def merkle_proof(leaves: List[str], position: int) -> List[Dict[str, str]]:
+    """
+    Build the inclusion proof for the leaf at position
+    Returns: list of sibling steps from the leaf up, each
+    {"hash": sibling hash, "position": "left" or "right" of the running hash}
+    """
+    proof = []
+    level = list(leaves)
+    while len(level) > 1:
+        if len(level) % 2:
+            level.append(level[-1])
+        sibling = position ^ 1
+        proof.append({
+            "hash": level[sibling],
+            "position": "left" if sibling < position else "right"
+        })
+        level = [_hash_pair(level[i], level[i + 1]) for i in range(0, len(level), 2)]
+        position //= 2
+    return proof
+
+
+def verify_proof(leaf: str, proof: List[Dict[str, str]], root: str) -> bool:
+    """Check that a leaf hash and its inclusion proof lead to the Merkle root"""
+    current = leaf
+    for step in proof:
+        if step["position"] == "left":
+            current = _hash_pair(step["hash"], current)
+        else:
+            current = _hash_pair(current, step["hash"])
+    return current == root
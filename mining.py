@@ -0,0 +1,101 @@
+import atexit
+import hashlib
+import multiprocessing
+import os
+from typing import Optional, Tuple
+
+
+_stop_event = None
+
+
+def _init_worker(stop_event):
+    """Give each pool process the shared stop flag"""
+    global _stop_event
+    _stop_event = stop_event
+
+
+def search_nonce(prefix: bytes, suffix: bytes, difficulty: int,
+                 start: int, end: Optional[int] = None) -> Optional[Tuple[int, str]]:
+    """
+    Search nonces in [start, end) for a block hash that meets the difficulty
+    The SHA-256 state of the constant prefix is built once and copied for
+    every attempt, so only the nonce digits and the short suffix are hashed.
+    Returns: (nonce, block_hash), or None if the range is exhausted or
+    another pool worker found a nonce first
+    """
+    base = hashlib.sha256(prefix)
+    zero_bytes = bytes(difficulty // 2)
+    half_byte = difficulty % 2
+    nonce = start
+    while end is None or nonce < end:
+        # Another worker already found a nonce
+        if _stop_event is not None and nonce % 1024 == 0 and _stop_event.is_set():
+            return None
+        attempt = base.copy()
+        attempt.update(str(nonce).encode() + suffix)
+        digest = attempt.digest()
+        # Each leading zero hex digit is half a byte of the digest
+        if (digest[:len(zero_bytes)] == zero_bytes and
+                (not half_byte or digest[len(zero_bytes)] < 16)):
+            if _stop_event is not None:
+                _stop_event.set()
+            return nonce, attempt.hexdigest()
+        nonce += 1
+    return None
+
+
+class ParallelMiner:
+    """Proof-of-work that splits the nonce space across a process pool.
+
+    Workers hash the same (prefix, nonce, suffix) bytes that
+    Block.calculate_hash serializes, so blocks mined here validate like any
+    other block.
+    """
+
+    def __init__(self, workers: int = 0, chunk_size: int = 50000):
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self._pool = None
+        self._stop_event = None
+        self._pid = None
+
+    def _get_pool(self):
+        # Pools don't survive a fork (e.g. gunicorn workers), so build one per process
+        if self._pool is None or self._pid != os.getpid():
+            self._stop_event = multiprocessing.Event()
+            self._pool = multiprocessing.Pool(
+                self.workers, initializer=_init_worker, initargs=(self._stop_event,)
+            )
+            self._pid = os.getpid()
+            atexit.register(self.close)
+        return self._pool
+
+    def mine(self, prefix: bytes, suffix: bytes, difficulty: int,
+             start_nonce: int = 0) -> Tuple[int, str]:
+        """
+        Find a nonce for a block split by Block.hash_parts
+        Returns: (nonce, block_hash)
+        """
+        pool = self._get_pool()
+        self._stop_event.clear()
+        start = start_nonce
+
+        while True:
+            # One round hands every worker a chunk; the first hit stops the rest
+            jobs = []
+            for _ in range(self.workers):
+                end = start + self.chunk_size
+                jobs.append(pool.apply_async(search_nonce, (prefix, suffix, difficulty, start, end)))
+                start = end
+
+            results = [job.get() for job in jobs]
+            found = [result for result in results if result]
+            if found:
+                self._stop_event.clear()
+                return min(found)
+
+    def close(self):
+        """Shut down the worker pool"""
+        if self._pool is not None and self._pid == os.getpid():
+            self._pool.terminate()
+            self._pool = None
@@ -3,25 +3,40 @@ from typing import Dict, List
 import statistics
 import json
 import os
+import threading
 
 
 class PeerVerification:
-    """System for peer verification and voting on files with persistence"""
+    """System for peer verification and voting on files with persistence
     
-    def __init__(self, storage_path: str = "data/verifications.json"):
+    With a writer (a chain_service.ChainClient) votes and reputations live
+    in the chain writer process and every call is passed to it.
+    """
+    
+    def __init__(self, storage_path: str = "data/verifications.json", writer=None):
         self.verifications: Dict[str, Dict] = {}  # file_hash -> verification data
         self.reputation: Dict[str, float] = {}  # user -> reputation score
         self.storage_path = storage_path
+        self.writer = writer
+        self._lock = threading.RLock()
         
         # Ensure data directory exists
         os.makedirs(os.path.dirname(storage_path), exist_ok=True)
         
         # Load existing data
-        self.load_from_disk()
+        if writer is None:
+            self.load_from_disk()
     
     def submit_verification(self, file_hash: str, user: str, 
                           is_authentic: bool, comment: str = ""):
         """Submit a verification vote for a file"""
+        if self.writer is not None:
+            return self.writer.call("peers.submit_verification", file_hash=file_hash, user=user,
+                                    is_authentic=is_authentic, comment=comment)
+        with self._lock:
+            self._submit_verification(file_hash, user, is_authentic, comment)
+    
+    def _submit_verification(self, file_hash: str, user: str, is_authentic: bool, comment: str):
         if file_hash not in self.verifications:
             self.verifications[file_hash] = {
                 "votes": [],
@@ -108,10 +123,20 @@ class PeerVerification:
     
     def get_user_reputation(self, user: str) -> float:
         """Get user reputation score (1.0 is default)"""
+        if self.writer is not None:
+            return self.writer.call("peers.get_user_reputation", user=user)
         return self.reputation.get(user, 1.0)
     
+    def get_file_verifications(self, file_hashes: List[str]) -> Dict[str, Dict]:
+        """Get verification data for several files in one call"""
+        if self.writer is not None:
+            return self.writer.call("peers.get_file_verifications", file_hashes=file_hashes)
+        return {file_hash: self.get_file_verification(file_hash) for file_hash in file_hashes}
+    
     def get_file_verification(self, file_hash: str) -> Dict:
         """Get verification data for a file"""
+        if self.writer is not None:
+            return self.writer.call("peers.get_file_verification", file_hash=file_hash)
         if file_hash not in self.verifications:
             return {
                 "authenticity_score": 0,
@@ -138,6 +163,8 @@ class PeerVerification:
     
     def get_top_verifiers(self, limit: int = 10) -> List[Dict]:
         """Get top verifiers by reputation"""
+        if self.writer is not None:
+            return self.writer.call("peers.get_top_verifiers", limit=limit)
         sorted_users = sorted(self.reputation.items(), 
                             key=lambda x: x[1], reverse=True)
         
@@ -152,6 +179,8 @@ class PeerVerification:
     
     def get_verification_stats(self) -> Dict:
         """Get overall verification statistics"""
+        if self.writer is not None:
+            return self.writer.call("peers.get_verification_stats")
         if not self.verifications:
             return {
                 "total_files_verified": 0,
@@ -185,6 +214,8 @@ class PeerVerification:
     
     def save_to_disk(self):
         """Save verification data to disk"""
+        if self.writer is not None:
+            return
         try:
             data = {
                 "verifications": self.verifications,
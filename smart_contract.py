@@ -1,7 +1,8 @@
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 import json
 import os
+import threading
 
 
 class SmartContract:
@@ -55,9 +56,11 @@ class SmartContract:
             return True
         return False
     
-    def check_access(self, user: str) -> tuple[bool, str]:
+    def check_access(self, user: str, count_download: bool = True) -> tuple[bool, str]:
         """
         Check if user has access to the file
+        count_download=False skips the download limits, for a transfer that
+        continues a download that was already counted
         Returns: (has_access, reason)
         """
         # Check if contract is expired
@@ -71,7 +74,7 @@ class SmartContract:
         # Check public access
         if self.is_public:
             # Check max downloads limit
-            if self.max_downloads:
+            if self.max_downloads and count_download:
                 # Count only successful downloads (excluding owner's downloads)
                 total_downloads = len([log for log in self.access_log 
                                       if log["action"] == "download" 
@@ -94,13 +97,14 @@ class SmartContract:
                 return False, "Permission expired"
         
         # Check user download limit
-        if permission["max_downloads"]:
+        if permission["max_downloads"] and count_download:
             if permission["downloads_used"] >= permission["max_downloads"]:
                 return False, "User download limit reached"
         
         return True, "User permission"
     
-    def log_access(self, user: str, action: str, success: bool, reason: str = ""):
+    def log_access(self, user: str, action: str, success: bool, reason: str = "",
+                   client: Optional[str] = None):
         """Log access attempt"""
         log_entry = {
             "timestamp": datetime.now().isoformat(),
@@ -109,12 +113,25 @@ class SmartContract:
             "success": success,
             "reason": reason
         }
+        if client is not None:
+            log_entry["client"] = client
         self.access_log.append(log_entry)
         
         # Update download count for user
         if success and action == "download" and user in self.permissions:
             self.permissions[user]["downloads_used"] += 1
     
+    def recent_download(self, user: str, client: str, within_seconds: float) -> bool:
+        """Whether user's download from client was counted in the last within_seconds"""
+        since = (datetime.now() - timedelta(seconds=within_seconds)).isoformat()
+        for log in reversed(self.access_log):
+            if log["timestamp"] < since:
+                return False
+            if (log["action"] == "download" and log["success"] and
+                    log["user"] == user and log.get("client") == client):
+                return True
+        return False
+    
     def get_stats(self) -> Dict:
         """Get contract statistics"""
         total_accesses = len(self.access_log)
@@ -148,45 +165,151 @@ class SmartContract:
             "access_log": self.access_log,
             "creation_time": self.creation_time.isoformat()
         }
+    
+    @classmethod
+    def from_dict(cls, contract_dict: Dict) -> 'SmartContract':
+        """Create contract from dictionary"""
+        contract = cls(file_hash=contract_dict["file_hash"], owner=contract_dict["owner"])
+        contract.permissions = contract_dict.get("permissions", {})
+        contract.access_log = contract_dict.get("access_log", [])
+        contract.is_public = contract_dict.get("is_public", False)
+        contract.max_downloads = contract_dict.get("max_downloads")
+        if contract_dict.get("expiration_time"):
+            contract.expiration_time = datetime.fromisoformat(contract_dict["expiration_time"])
+        if contract_dict.get("creation_time"):
+            contract.creation_time = datetime.fromisoformat(contract_dict["creation_time"])
+        contract.contract_id = contract_dict.get("contract_id") or contract.contract_id
+        return contract
 
 
 class ContractManager:
-    """Manage smart contracts for files with persistence"""
+    """Manage smart contracts for files with persistence
     
-    def __init__(self, storage_path: str = "data/contracts.json"):
+    With a writer (a chain_service.ChainClient) the contracts live in the
+    chain writer process and every call is passed to it, so all workers
+    check and count downloads against the same contracts.
+    """
+    
+    def __init__(self, storage_path: str = "data/contracts.json", writer=None):
         self.contracts: Dict[str, SmartContract] = {}
         self.storage_path = storage_path
+        self.writer = writer
+        self._lock = threading.RLock()
         
         # Ensure data directory exists
         os.makedirs(os.path.dirname(storage_path), exist_ok=True)
         
         # Load existing contracts
-        self.load_from_disk()
+        if writer is None:
+            self.load_from_disk()
     
-    def create_contract(self, file_hash: str, owner: str) -> SmartContract:
+    def create_contract(self, file_hash: str, owner: str, is_public: bool = False,
+                        max_downloads: Optional[int] = None,
+                        expiration_hours: Optional[int] = None) -> SmartContract:
         """Create a new smart contract"""
+        if self.writer is not None:
+            return SmartContract.from_dict(self.writer.call(
+                "contracts.create_contract", file_hash=file_hash, owner=owner, is_public=is_public,
+                max_downloads=max_downloads, expiration_hours=expiration_hours
+            ))
+        
         contract = SmartContract(file_hash, owner)
-        self.contracts[file_hash] = contract
-        self.save_to_disk()  # Persist to disk
+        contract.set_public_access(is_public)
+        if max_downloads:
+            contract.set_max_downloads(int(max_downloads))
+        if expiration_hours:
+            contract.set_expiration(int(expiration_hours))
+        with self._lock:
+            self.contracts[file_hash] = contract
+            self.save_to_disk()  # Persist to disk
         return contract
     
     def get_contract(self, file_hash: str) -> Optional[SmartContract]:
-        """Get contract by file hash"""
+        """Get contract by file hash (a copy when the contracts live in the chain writer)"""
+        if self.writer is not None:
+            contract_dict = self.writer.call("contracts.get_contract", file_hash=file_hash)
+            return SmartContract.from_dict(contract_dict) if contract_dict else None
         return self.contracts.get(file_hash)
     
     def get_all_contracts(self) -> List[Dict]:
         """Get all contracts"""
-        return [contract.to_dict() for contract in self.contracts.values()]
+        if self.writer is not None:
+            return self.writer.call("contracts.get_all_contracts")
+        return [contract.to_dict() for contract in list(self.contracts.values())]
+    
+    def log_access(self, file_hash: str, user: str, action: str, success: bool,
+                   reason: str = "", client: Optional[str] = None):
+        """Log an access attempt on a file's contract and persist it"""
+        if self.writer is not None:
+            return self.writer.call("contracts.log_access", file_hash=file_hash, user=user, action=action,
+                                    success=success, reason=reason, client=client)
+        with self._lock:
+            contract = self.contracts.get(file_hash)
+            if contract:
+                contract.log_access(user, action, success, reason, client=client)
+                self.save_to_disk()  # Persist access log
+    
+    def record_download(self, file_hash: str, user: str, client: str,
+                        resume_window: float) -> Tuple[bool, str, bool]:
+        """
+        Check access and count a download in one step, so concurrent requests
+        can't both take the last allowed download. A request continuing the
+        client's counted download is let through without counting it again.
+        Returns: (has_access, reason, counted)
+        """
+        if self.writer is not None:
+            return tuple(self.writer.call("contracts.record_download", file_hash=file_hash, user=user,
+                                          client=client, resume_window=resume_window))
+        with self._lock:
+            contract = self.contracts.get(file_hash)
+            if not contract:
+                return True, "No contract", True
+            
+            resumed = contract.recent_download(user, client, resume_window)
+            has_access, reason = contract.check_access(user, count_download=not resumed)
+            if has_access and resumed:
+                return True, reason, False
+            contract.log_access(user, "download", has_access, reason, client=client if has_access else None)
+            self.save_to_disk()  # Persist access log
+            return has_access, reason, has_access
+    
+    def grant_permission(self, file_hash: str, user: str, duration_hours: int = None,
+                         max_downloads: int = None) -> Optional[SmartContract]:
+        """Grant a user permission on a file's contract; None if there is no contract"""
+        if self.writer is not None:
+            contract_dict = self.writer.call("contracts.grant_permission", file_hash=file_hash, user=user,
+                                             duration_hours=duration_hours, max_downloads=max_downloads)
+            return SmartContract.from_dict(contract_dict) if contract_dict else None
+        with self._lock:
+            contract = self.contracts.get(file_hash)
+            if contract:
+                contract.grant_permission(user, duration_hours, max_downloads)
+                self.save_to_disk()  # Persist changes
+            return contract
+    
+    def revoke_permission(self, file_hash: str, user: str) -> bool:
+        """Revoke a user's permission on a file's contract"""
+        if self.writer is not None:
+            return self.writer.call("contracts.revoke_permission", file_hash=file_hash, user=user)
+        with self._lock:
+            contract = self.contracts.get(file_hash)
+            if not contract or not contract.revoke_permission(user):
+                return False
+            self.save_to_disk()  # Persist changes
+            return True
     
     def save_to_disk(self):
         """Save contracts to disk"""
+        if self.writer is not None:
+            return
         try:
-            contracts_data = {
-                file_hash: contract.to_dict() 
-                for file_hash, contract in self.contracts.items()
-            }
-            with open(self.storage_path, 'w') as f:
-                json.dump(contracts_data, f, indent=2)
+            with self._lock:
+                contracts_data = {
+                    file_hash: contract.to_dict() 
+                    for file_hash, contract in self.contracts.items()
+                }
+                with open(self.storage_path, 'w') as f:
+                    json.dump(contracts_data, f, indent=2)
         except Exception as e:
             print(f"Error saving contracts: {e}")
     
@@ -200,19 +323,7 @@ class ContractManager:
                 contracts_data = json.load(f)
             
             for file_hash, contract_dict in contracts_data.items():
-                contract = SmartContract(
-                    file_hash=contract_dict["file_hash"],
-                    owner=contract_dict["owner"]
-                )
-                # Restore contract state
-                contract.permissions = contract_dict.get("permissions", {})
-                contract.access_log = contract_dict.get("access_log", [])
-                contract.is_public = contract_dict.get("is_public", False)
-                contract.max_downloads = contract_dict.get("max_downloads")
-                contract.expiration_time = contract_dict.get("expiration_time")
-                contract.contract_id = contract_dict.get("contract_id")
-                
-                self.contracts[file_hash] = contract
+                self.contracts[file_hash] = SmartContract.from_dict(contract_dict)
             
             print(f"✓ Loaded {len(self.contracts)} contracts from disk")
             
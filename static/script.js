@@ -72,7 +72,9 @@ async function handleFileUpload(event) {
         const data = await response.json();
         
         if (response.ok) {
-            showStatus(`✓ File uploaded successfully! Block #${data.block.index} mined.`, 'success');
+            showStatus(data.block
+                ? `✓ File uploaded successfully! Block #${data.block.index} mined.`
+                : '✓ File uploaded successfully! Block is being mined.', 'success');
             
             // Reset form
             event.target.reset();
@@ -163,7 +165,7 @@ function createFileItem(file) {
                 </div>
                 <div class="file-detail">
                     <div class="file-detail-label">Block #</div>
-                    <div class="file-detail-value">${file.block_index}</div>
+                    <div class="file-detail-value">${file.block_index ?? 'pending'}</div>
                 </div>
             </div>
             <div class="file-detail">
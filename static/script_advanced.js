@@ -137,6 +137,18 @@ async function loadStats() {
     }
 }
 
+// Block an upload was mined into: the block itself, or the receipt of a
+// queued upload once its batch is sealed (null while it is pending)
+function uploadBlockIndex(data) {
+    if (data.block) {
+        return data.block.index;
+    }
+    if (data.receipt && data.receipt.block_index !== null && data.receipt.block_index !== undefined) {
+        return data.receipt.block_index;
+    }
+    return null;
+}
+
 // Handle file upload
 async function handleFileUpload(event) {
     event.preventDefault();
@@ -203,7 +215,12 @@ async function handleFileUpload(event) {
             // Show detailed alert with hash
             try {
                 let alertMessage = `✓ File uploaded successfully!\n\n`;
-                alertMessage += `📦 Block: #${data.block.index}\n`;
+                const blockIndex = uploadBlockIndex(data);
+                if (blockIndex !== null) {
+                    alertMessage += `📦 Block: #${blockIndex}\n`;
+                } else {
+                    alertMessage += `⏳ Block: pending (receipt ${data.receipt ? data.receipt.receipt_id : 'n/a'})\n`;
+                }
                 alertMessage += `📎 Hash: ${data.file_hash}\n`;
                 if (data.is_encrypted) {
                     alertMessage += `🔒 Encryption: Enabled\n`;
@@ -215,7 +232,9 @@ async function handleFileUpload(event) {
             }
             
             // Show status message
-            let message = `✓ File uploaded successfully! Block #${data.block.index} mined.`;
+            let message = uploadBlockIndex(data) !== null
+                ? `✓ File uploaded successfully! Block #${uploadBlockIndex(data)} mined.`
+                : '✓ File uploaded successfully! Block is being mined.';
             if (data.is_encrypted) {
                 message += ' 🔒 File is encrypted.';
             }
@@ -348,7 +367,7 @@ function createFileItem(file) {
                 </div>
                 <div class="file-detail">
                     <div class="file-detail-label">Block #</div>
-                    <div class="file-detail-value">${file.block_index}</div>
+                    <div class="file-detail-value">${file.block_index ?? 'pending'}</div>
                 </div>
             </div>
             <div class="file-detail">
@@ -944,17 +963,36 @@ async function loadVerificationStats() {
 }
 
 // Load blockchain
-async function loadBlockchain() {
+let blockchainCursor = null;
+
+async function loadBlockchain(append = false) {
     const blockchainList = document.getElementById('blockchainList');
     
     try {
-        const response = await fetch(`${API_BASE_URL}/blockchain`);
+        // Newest blocks first, one page at a time
+        let url = `${API_BASE_URL}/blockchain?limit=50&order=desc`;
+        if (append && blockchainCursor !== null) {
+            url += `&cursor=${blockchainCursor}`;
+        }
+        const response = await fetch(url);
         const data = await response.json();
+        blockchainCursor = data.next_cursor;
+        
+        const blocksHtml = data.blocks.map(block => createBlockItem(block)).join('');
+        const loadMoreHtml = blockchainCursor !== null
+            ? '<button class="btn btn-secondary" id="loadMoreBlocks" onclick="loadBlockchain(true)">Load older blocks</button>'
+            : '';
         
-        // Reverse to show newest blocks first
-        const chain = [...data.chain].reverse();
+        const existingButton = document.getElementById('loadMoreBlocks');
+        if (existingButton) {
+            existingButton.remove();
+        }
         
-        blockchainList.innerHTML = chain.map(block => createBlockItem(block)).join('');
+        if (append) {
+            blockchainList.insertAdjacentHTML('beforeend', blocksHtml + loadMoreHtml);
+        } else {
+            blockchainList.innerHTML = blocksHtml + loadMoreHtml;
+        }
     } catch (error) {
         console.error('Error loading blockchain:', error);
         blockchainList.innerHTML = `
@@ -988,6 +1026,15 @@ function createBlockItem(block) {
         `;
     } else if (blockType === 'genesis') {
         dataPreview = `<strong>Message:</strong> ${block.data.message}`;
+    } else if (blockType === 'archived') {
+        dataPreview = `<strong>Archived:</strong> download details moved to the archive segment`;
+    } else if (blockType === 'batch') {
+        const transactions = block.data.transactions || [];
+        const downloads = transactions.filter(tx => tx.type === 'file_download').length;
+        dataPreview = `
+            <strong>Transactions:</strong> ${transactions.length} (${downloads} downloads)<br>
+            <strong>Merkle Root:</strong> ${block.merkle_root.substring(0, 32)}...
+        `;
     }
     
     return `
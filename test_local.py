@@ -78,6 +78,881 @@ def test_blockchain():
         print(f"❌ Blockchain error: {e}")
         return False
 
+def test_block_log():
+    """Test append-only block log persistence and crash recovery"""
+    print("\n🔍 Testing block log...")
+    try:
+        from blockchain import Blockchain
+        import tempfile
+        
+        storage_path = os.path.join(tempfile.mkdtemp(), "blockchain.json")
+        bc = Blockchain(difficulty=1, storage_path=storage_path)
+        bc.add_file_transaction("log_file.txt", "log_hash_1", 10, "test_user", "/test/log_file.txt")
+        bc.close()
+        
+        # Simulate a torn write at the end of the active segment
+        segment = os.path.join(bc.block_log.directory, "segment-000000.log")
+        with open(segment, 'ab') as f:
+            f.write(b"\x00\x00\x10\x00torn")
+        
+        reloaded = Blockchain(difficulty=1, storage_path=storage_path)
+        reloaded.close()
+        if len(reloaded.chain) == 2 and reloaded.is_chain_valid():
+            print(f"✅ Block log working: {len(reloaded.chain)} blocks recovered")
+            return True
+        else:
+            print("❌ Block log did not recover the chain")
+            return False
+    except Exception as e:
+        print(f"❌ Block log error: {e}")
+        return False
+
+def test_file_index():
+    """Test that file lookups answered from the hash index match the chain"""
+    print("\n🔍 Testing file index...")
+    try:
+        from blockchain import Blockchain
+        import tempfile
+        
+        storage_path = os.path.join(tempfile.mkdtemp(), "blockchain.json")
+        bc = Blockchain(difficulty=1, storage_path=storage_path)
+        bc.add_file_transaction("first.txt", "indexed_hash_1", 10, "test_user", "/test/first.txt")
+        bc.add_file_transaction("second.txt", "indexed_hash_2", 20, "test_user", "/test/second.txt")
+        bc.add_file_transaction("copy.txt", "indexed_hash_1", 10, "other_user", "/test/copy.txt")
+        bc.close()
+        
+        # What scanning the chain gives: the first upload of a hash for a
+        # lookup, the latest upload of each hash for the listing
+        uploads = [block.data for block in bc.chain if block.data.get("type") == "file_upload"]
+        first = next(data for data in uploads if data["file_hash"] == "indexed_hash_1")
+        latest = {data["file_hash"]: data["file_name"] for data in uploads}
+        
+        reloaded = Blockchain(difficulty=1, storage_path=storage_path)
+        reloaded.close()
+        results = []
+        for chain in (bc, reloaded):
+            record = chain.get_file_by_hash("indexed_hash_1")
+            listed = {record["file_hash"]: record["file_name"] for record in chain.get_all_files()}
+            results.append(record["file_name"] == first["file_name"] and
+                           record["uploader"] == first["uploader"] and listed == latest and
+                           chain.get_file_by_hash("missing_hash") is None)
+        
+        if all(results) and reloaded.get_all_files() == bc.get_all_files():
+            print(f"✅ File index matches the chain for {len(latest)} hashes")
+            return True
+        else:
+            print(f"❌ File index lookups differ from the chain: {results}")
+            return False
+    except Exception as e:
+        print(f"❌ File index error: {e}")
+        return False
+
+def test_checkpoints():
+    """Test that validation resumes from a signed checkpoint and only checks newer blocks"""
+    print("\n🔍 Testing validation checkpoints...")
+    try:
+        from blockchain import Blockchain
+        import tempfile
+        
+        storage_path = os.path.join(tempfile.mkdtemp(), "blockchain.json")
+        options = dict(difficulty=1, storage_path=storage_path, checkpoint_interval=3)
+        bc = Blockchain(**options)
+        for number in range(6):
+            bc.add_file_transaction(f"checked_{number}.txt", f"checked_hash_{number}", 10,
+                                    "test_user", f"/test/checked_{number}.txt")
+        valid = bc.is_chain_valid()
+        bc.close()
+        height = len(bc.chain)
+        
+        # A restart resumes from the checkpoint, so a block below it isn't re-hashed
+        resumed = Blockchain(**options)
+        resumed_height = resumed.validated_height
+        resumed.chain[2].data = {**resumed.chain[2].data, "file_size": 999}
+        incremental = resumed.is_chain_valid()
+        audited = resumed.is_chain_valid(full_audit=True)
+        resumed.close()
+        
+        # Blocks above the checkpoint are still checked
+        fresh = Blockchain(**options)
+        fresh.add_file_transaction("after.txt", "checked_hash_after", 10, "test_user", "/test/after.txt")
+        fresh.chain[-1].data = {**fresh.chain[-1].data, "file_size": 999}
+        tampered_tail = fresh.is_chain_valid()
+        fresh.close()
+        
+        # A checkpoint signed with another key is not trusted
+        untrusted = Blockchain(**options, checkpoint_key="another-key")
+        untrusted.close()
+        
+        if (valid and resumed_height == height and incremental and not audited and
+                resumed.validated_height == 2 and not tampered_tail and
+                untrusted.validated_height == 1):
+            print(f"✅ Validation resumed from checkpoint at height {resumed_height}")
+            return True
+        else:
+            print(f"❌ Checkpoints: resumed at {resumed_height} of {height}, incremental {incremental}, "
+                  f"audit {audited}, tampered tail {tampered_tail}, untrusted at {untrusted.validated_height}")
+            return False
+    except Exception as e:
+        print(f"❌ Checkpoint error: {e}")
+        return False
+
+def test_aggregates():
+    """Test that running aggregates match the chain and survive a reload"""
+    print("\n🔍 Testing running aggregates...")
+    try:
+        from blockchain import Blockchain
+        import tempfile
+        
+        storage_path = os.path.join(tempfile.mkdtemp(), "blockchain.json")
+        bc = Blockchain(difficulty=1, storage_path=storage_path)
+        bc.add_file_transaction("report.pdf", "aggregate_hash_1", 100, "alice", "/test/report.pdf",
+                                is_encrypted=True, salt="c2FsdA==")
+        bc.add_file_transaction("notes.txt", "aggregate_hash_2", 50, "bob", "/test/notes.txt")
+        bc.add_file_transaction("slides.pdf", "aggregate_hash_3", 25, "alice", "/test/slides.pdf")
+        bc.add_download_transaction("report.pdf", "aggregate_hash_1", "bob")
+        bc.add_download_transaction("report.pdf", "aggregate_hash_1", "carol")
+        bc.add_download_transaction("notes.txt", "aggregate_hash_2", "bob")
+        bc.close()
+        stats = bc.get_chain_stats()
+        analytics = bc.get_analytics_data()
+        
+        reloaded = Blockchain(difficulty=1, storage_path=storage_path)
+        reloaded.close()
+        file_types = {entry["type"]: entry["count"] for entry in analytics["file_type_distribution"]}
+        expected = {
+            "total_blocks": 7, "total_uploads": 3, "total_downloads": 3, "unique_uploaders": 2,
+            "unique_downloaders": 2, "total_storage_bytes": 175, "encrypted_files": 1
+        }
+        
+        if (all(stats[key] == value for key, value in expected.items()) and
+                file_types == {"pdf": 2, "txt": 1} and
+                reloaded.get_chain_stats() == stats and reloaded.get_analytics_data() == analytics):
+            print(f"✅ Aggregates match the chain: {stats['total_uploads']} uploads, "
+                  f"{stats['total_downloads']} downloads")
+            return True
+        else:
+            print(f"❌ Aggregates differ: {stats}, file types {file_types}")
+            return False
+    except Exception as e:
+        print(f"❌ Aggregates error: {e}")
+        return False
+
+def test_parallel_mining():
+    """Test that blocks mined by the process pool validate like any other block"""
+    print("\n🔍 Testing parallel mining...")
+    try:
+        from blockchain import Blockchain
+        import tempfile
+        
+        storage_path = os.path.join(tempfile.mkdtemp(), "blockchain.json")
+        bc = Blockchain(difficulty=3, storage_path=storage_path, mining_workers=2,
+                        parallel_min_difficulty=3)
+        bc.add_file_transaction("mined.txt", "mined_hash_1", 10, "test_user", "/test/mined.txt")
+        bc.add_download_transaction("mined.txt", "mined_hash_1", "test_user")
+        used_pool = bc.miner is not None and bc.miner._pool is not None
+        bc.miner.close()
+        bc.close()
+        block = bc.chain[-1]
+        
+        reloaded = Blockchain(difficulty=3, storage_path=storage_path, mining_workers=1)
+        reloaded.close()
+        if (used_pool and block.hash.startswith("000") and block.hash == block.calculate_hash() and
+                reloaded.is_chain_valid(full_audit=True)):
+            print(f"✅ Parallel mining found nonce {block.nonce} for block {block.index}")
+            return True
+        else:
+            print(f"❌ Parallel mining: pool used {used_pool}, hash {block.hash[:16]}...")
+            return False
+    except Exception as e:
+        print(f"❌ Parallel mining error: {e}")
+        return False
+
+def test_nonce_search():
+    """Test that the precomputed hash prefix hashes exactly what calculate_hash does"""
+    print("\n🔍 Testing nonce search...")
+    try:
+        from blockchain import Block
+        from merkle import transactions_root
+        from mining import search_nonce
+        import hashlib
+        
+        data = {"type": "file_upload", "file_name": "nonce.txt", "file_hash": "nonce_hash_1",
+                "uploader": "ünïcode_user"}
+        blocks = [
+            Block(1, 1700000000.5, data, "0" * 64),
+            Block(1, 1700000000.5, data, "0" * 64, merkle_root=transactions_root([data]), difficulty=3)
+        ]
+        matches = []
+        for block in blocks:
+            prefix, suffix = block.hash_parts()
+            for nonce in (0, 7, 123456789):
+                block.nonce = nonce
+                matches.append(hashlib.sha256(prefix + str(nonce).encode() + suffix).hexdigest() ==
+                               block.calculate_hash())
+        
+        # Odd difficulties compare half a byte of the digest
+        mined = blocks[1]
+        mined.nonce, mined.hash = search_nonce(*mined.hash_parts(), 3, 0)
+        
+        if all(matches) and mined.hash == mined.calculate_hash() and mined.hash.startswith("000"):
+            print(f"✅ Nonce search matches calculate_hash ({len(matches)} nonces checked)")
+            return True
+        else:
+            print(f"❌ Nonce search hashes differ: {matches}, mined {mined.hash[:16]}...")
+            return False
+    except Exception as e:
+        print(f"❌ Nonce search error: {e}")
+        return False
+
+def test_binary_codec():
+    """Test that binary block records round-trip and keep block hashes"""
+    print("\n🔍 Testing binary block codec...")
+    try:
+        from blockchain import Blockchain
+        from block_codec import iter_encode_blocks, decode_blocks
+        import tempfile
+        
+        storage_path = os.path.join(tempfile.mkdtemp(), "blockchain.json")
+        bc = Blockchain(difficulty=1, storage_path=storage_path, record_format="binary", batch_size=2)
+        bc.add_file_transaction("codec_file.txt", "codec_hash_1", 10, "test_user", "/test/codec_file.txt")
+        bc.add_download_transaction("codec_file.txt", "codec_hash_1", "ünïcode_user")
+        bc.add_download_transaction("codec_file.txt", "codec_hash_1", "test_user")
+        bc.close()
+        blocks = [block.to_dict() for block in bc.chain]
+        
+        reloaded = Blockchain(difficulty=1, storage_path=storage_path, record_format="binary")
+        reloaded.close()
+        streamed = decode_blocks(b"".join(iter_encode_blocks(blocks)))
+        
+        if ([block.to_dict() for block in reloaded.chain] == blocks and streamed == blocks and
+                reloaded.is_chain_valid(full_audit=True)):
+            print(f"✅ Binary codec round-trips {len(blocks)} blocks")
+            return True
+        else:
+            print("❌ Binary codec changed the blocks")
+            return False
+    except Exception as e:
+        print(f"❌ Binary codec error: {e}")
+        return False
+
+def test_lazy_load():
+    """Test that a lazy start from the index snapshot matches a full reload"""
+    print("\n🔍 Testing lazy loading...")
+    try:
+        from blockchain import Blockchain
+        import tempfile
+        
+        storage_path = os.path.join(tempfile.mkdtemp(), "blockchain.json")
+        options = dict(difficulty=1, storage_path=storage_path, segment_max_bytes=1500)
+        bc = Blockchain(**options, lazy_load=True)
+        for number in range(4):
+            bc.add_file_transaction(f"lazy_{number}.txt", f"lazy_hash_{number}", 10, "alice",
+                                    f"/test/lazy_{number}.txt")
+            bc.add_download_transaction(f"lazy_{number}.txt", f"lazy_hash_{number}", "bob")
+        bc.close()
+        
+        # Blocks appended after the snapshot are replayed on the next lazy start
+        full = Blockchain(**options)
+        full.add_file_transaction("lazy_tail.txt", "lazy_hash_tail", 10, "carol", "/test/lazy_tail.txt")
+        full.add_download_transaction("lazy_tail.txt", "lazy_hash_tail", "alice")
+        full.close()
+        
+        # Simulate a crash mid-append: torn record and torn header index line
+        active = full.block_log.manifest["segments"][-1]["name"]
+        with open(full.block_log.segment_path(active), 'ab') as f:
+            f.write(b"\x00\x00\x10\x00torn")
+        with open(full.block_log.index_path(active), 'a') as f:
+            f.write('{"index": 99, "seg')
+        
+        lazy = Blockchain(**options, lazy_load=True)
+        restored_height = lazy._snapshot_height
+        lazy_blocks = [block.to_dict() for block in lazy.chain]
+        valid = lazy.is_chain_valid(full_audit=True)
+        lazy.close()
+        reloaded = Blockchain(**options)
+        reloaded.close()
+        
+        if (len(full.block_log.manifest["segments"]) > 1 and
+                0 < restored_height < len(lazy_blocks) and valid and
+                lazy_blocks == [block.to_dict() for block in reloaded.chain] and
+                lazy.file_index.to_dict() == reloaded.file_index.to_dict() and
+                lazy.user_index.to_dict() == reloaded.user_index.to_dict() and
+                lazy.aggregates.to_dict() == reloaded.aggregates.to_dict()):
+            print(f"✅ Lazy start restored {restored_height} of {len(lazy_blocks)} blocks from the snapshot")
+            return True
+        else:
+            print(f"❌ Lazy start differs from a full reload (restored {restored_height}, valid {valid})")
+            return False
+    except Exception as e:
+        print(f"❌ Lazy loading error: {e}")
+        return False
+
+def test_merkle_proof():
+    """Test Merkle inclusion proofs for uploads in a batch block"""
+    print("\n🔍 Testing Merkle proofs...")
+    try:
+        from blockchain import Blockchain
+        from merkle import transaction_hash, verify_proof
+        import tempfile
+        import hashlib
+        import json
+        
+        storage_path = os.path.join(tempfile.mkdtemp(), "blockchain.json")
+        bc = Blockchain(difficulty=1, storage_path=storage_path, batch_size=3, batch_uploads=True)
+        for i in range(3):
+            bc.add_file_transaction(f"proof_{i}.txt", f"proof_hash_{i}", 10, "test_user", f"/test/proof_{i}.txt")
+        
+        proof = bc.get_file_proof("proof_hash_1")
+        header = dict(proof["header"])
+        block_hash = header.pop("hash")
+        rehashed = hashlib.sha256(json.dumps(header, sort_keys=True).encode()).hexdigest()
+        bc.close()
+        
+        if (verify_proof(transaction_hash(proof["transaction"]), proof["proof"], header["merkle_root"])
+                and rehashed == block_hash):
+            print(f"✅ Merkle proof verified with {len(proof['proof'])} steps")
+            return True
+        else:
+            print("❌ Merkle proof did not verify")
+            return False
+    except Exception as e:
+        print(f"❌ Merkle proof error: {e}")
+        return False
+
+def test_batched_uploads():
+    """Test that batched uploads are visible and versioned before their batch is sealed"""
+    print("\n🔍 Testing batched uploads...")
+    try:
+        from blockchain import Blockchain
+        import tempfile
+        
+        storage_path = os.path.join(tempfile.mkdtemp(), "blockchain.json")
+        bc = Blockchain(difficulty=1, storage_path=storage_path, batch_size=3, batch_uploads=True)
+        first = bc.add_file_transaction("batched.txt", "batched_hash_1", 10, "test_user", "/test/batched.txt")
+        second = bc.add_file_transaction("batched.txt", "batched_hash_2", 10, "test_user", "/test/batched.txt")
+        record = bc.get_file_by_hash("batched_hash_2")
+        receipt = bc.get_receipt(second["receipt_id"])
+        bc.close()
+        
+        if (record and record.get("pending") and record["version"] == 2 and
+                first["transaction"]["version"] == 1 and receipt["status"] == "pending"):
+            print(f"✅ Batched uploads pending as {record['file_name']} (version {record['version']})")
+            return True
+        else:
+            print(f"❌ Batched upload not visible: {record}")
+            return False
+    except Exception as e:
+        print(f"❌ Batched upload error: {e}")
+        return False
+
+def test_receipt_expiry():
+    """Test that sealed receipts expire after the receipt TTL"""
+    print("\n🔍 Testing receipt expiry...")
+    try:
+        from blockchain import Blockchain
+        import tempfile
+        import time
+        
+        storage_path = os.path.join(tempfile.mkdtemp(), "blockchain.json")
+        bc = Blockchain(difficulty=1, storage_path=storage_path, batch_size=1,
+                        batch_uploads=True, receipt_ttl=0.2)
+        first = bc.add_file_transaction("old.txt", "receipt_hash_1", 10, "test_user", "/test/old.txt")
+        sealed = bc.get_receipt(first["receipt_id"])
+        time.sleep(0.3)
+        second = bc.add_file_transaction("new.txt", "receipt_hash_2", 10, "test_user", "/test/new.txt")
+        expired = bc.get_receipt(first["receipt_id"])
+        current = bc.get_receipt(second["receipt_id"])
+        bc.close()
+        
+        if sealed["status"] == "sealed" and expired is None and current and len(bc.receipts) == 1:
+            print("✅ Sealed receipt expired after its TTL")
+            return True
+        else:
+            print(f"❌ Receipts not expired: {bc.receipts}")
+            return False
+    except Exception as e:
+        print(f"❌ Receipt expiry error: {e}")
+        return False
+
+def test_file_versions():
+    """Test that re-uploads of a file name form a versioned lineage"""
+    print("\n🔍 Testing file versions...")
+    try:
+        from blockchain import Blockchain
+        import tempfile
+        
+        storage_path = os.path.join(tempfile.mkdtemp(), "blockchain.json")
+        bc = Blockchain(difficulty=1, storage_path=storage_path)
+        for number in range(1, 4):
+            bc.add_file_transaction("report.txt", f"version_hash_{number}", 10, "test_user", "/test/report.txt")
+        bc.close()
+        
+        reloaded = Blockchain(difficulty=1, storage_path=storage_path)
+        reloaded.close()
+        versions = reloaded.get_file_versions("report_v2.txt")
+        latest = reloaded.get_file_by_hash("version_hash_3")
+        
+        if ([v["file_name"] for v in versions] == ["report_v3.txt", "report_v2.txt", "report.txt"] and
+                [v["version"] for v in versions] == [3, 2, 1] and
+                latest["previous_version_hash"] == "version_hash_2" and
+                reloaded.next_file_version("report.txt")[1] == 4):
+            print(f"✅ File versions working: {len(versions)} versions of report.txt")
+            return True
+        else:
+            print(f"❌ File versions wrong: {versions}")
+            return False
+    except Exception as e:
+        print(f"❌ File version error: {e}")
+        return False
+
+def test_user_index():
+    """Test paging a user's activity through the user index"""
+    print("\n🔍 Testing user index...")
+    try:
+        from blockchain import Blockchain
+        import tempfile
+        
+        storage_path = os.path.join(tempfile.mkdtemp(), "blockchain.json")
+        bc = Blockchain(difficulty=1, storage_path=storage_path, batch_size=4)
+        bc.add_file_transaction("indexed.txt", "index_hash_1", 10, "alice", "/test/indexed.txt")
+        for _ in range(4):
+            bc.add_download_transaction("indexed.txt", "index_hash_1", "alice")
+            bc.add_download_transaction("indexed.txt", "index_hash_1", "bob")
+        bc.close()
+        
+        first = bc.get_user_activity("alice", limit=3)
+        second = bc.get_user_activity("alice", before=tuple(first["next_cursor"]), limit=3)
+        positions = [(entry["block_index"], entry["tx_index"]) for entry in first["activity"] + second["activity"]]
+        searched = [record["file_hash"] for record in bc.search_files_by_uploader("LIC")]
+        
+        if (first["totals"] == {"uploads": 1, "downloads": 4, "archived_downloads": 0} and
+                len(positions) == 5 and positions == sorted(positions, reverse=True) and
+                second["next_cursor"] is None and second["activity"][-1]["kind"] == "upload" and
+                searched == ["index_hash_1"] and bc.search_files_by_uploader("bob") == [] and
+                bc.get_user_activity("bob", kind="uploads")["activity"] == []):
+            print(f"✅ User index pages {len(positions)} entries newest first")
+            return True
+        else:
+            print(f"❌ User index wrong: {positions}, totals {first['totals']}")
+            return False
+    except Exception as e:
+        print(f"❌ User index error: {e}")
+        return False
+
+def test_concurrent_reads():
+    """Test that index readers run safely while the background worker seals blocks"""
+    print("\n🔍 Testing reads during async sealing...")
+    try:
+        from blockchain import Blockchain
+        import tempfile
+        import threading
+        
+        storage_path = os.path.join(tempfile.mkdtemp(), "blockchain.json")
+        bc = Blockchain(difficulty=1, storage_path=storage_path, async_sealing=True,
+                        batch_size=1, batch_interval=0.01)
+        errors = []
+        done = threading.Event()
+        
+        def read():
+            while not done.is_set():
+                try:
+                    bc.get_all_files()
+                    bc.get_analytics_data()
+                    bc.get_chain_stats()
+                    bc.get_user_activity("reader_user")
+                except Exception as e:
+                    errors.append(e)
+                    return
+        
+        reader = threading.Thread(target=read)
+        reader.start()
+        for number in range(200):
+            bc.add_file_transaction(f"concurrent_{number}.txt", f"concurrent_hash_{number}", 10,
+                                    f"user_{number}", f"/test/concurrent_{number}.txt")
+            bc.add_download_transaction(f"concurrent_{number}.txt", f"concurrent_hash_{number}",
+                                        "reader_user")
+        bc.close()
+        done.set()
+        reader.join()
+        
+        if not errors and len(bc.get_all_files()) == 200 and bc.get_chain_stats()["total_downloads"] == 200:
+            print(f"✅ {len(bc.chain)} blocks sealed while reading indexes")
+            return True
+        else:
+            print(f"❌ Concurrent reads failed: {errors[:1]}")
+            return False
+    except Exception as e:
+        print(f"❌ Concurrent read error: {e}")
+        return False
+
+def test_difficulty():
+    """Test that blocks mined below the chain's difficulty are rejected"""
+    print("\n🔍 Testing block difficulty...")
+    try:
+        from blockchain import Blockchain
+        import tempfile
+        
+        storage_path = os.path.join(tempfile.mkdtemp(), "blockchain.json")
+        bc = Blockchain(difficulty=3, storage_path=storage_path)
+        bc.add_file_transaction("pow_file.txt", "pow_hash_1", 10, "test_user", "/test/pow_file.txt")
+        valid_before = bc.is_chain_valid(full_audit=True)
+        
+        # Re-mine the block at difficulty 1 and record that difficulty
+        block = bc.chain[1]
+        block.difficulty = 1
+        block.hash = block.calculate_hash()
+        block.mine_block(1)
+        valid_after = bc.is_chain_valid(full_audit=True)
+        bc.close()
+        
+        # Blocks retargeted below the configured difficulty stay valid when the
+        # chain is reopened without adaptive mode
+        adaptive_path = os.path.join(tempfile.mkdtemp(), "blockchain.json")
+        adaptive = Blockchain(difficulty=2, storage_path=adaptive_path, adaptive_difficulty=True,
+                              target_mining_time=1e-9, min_difficulty=1, retarget_window=2)
+        for number in range(4):
+            adaptive.add_file_transaction(f"adaptive_{number}.txt", f"adaptive_hash_{number}", 10,
+                                          "test_user", f"/test/adaptive_{number}.txt")
+        adaptive.close()
+        retargeted = min(block.difficulty for block in adaptive.chain)
+        reopened = Blockchain(difficulty=2, storage_path=adaptive_path)
+        reopened_valid = reopened.is_chain_valid(full_audit=True)
+        reopened.close()
+        
+        if valid_before and not valid_after and retargeted == 1 and reopened_valid:
+            print("✅ Under-mined block rejected")
+            return True
+        else:
+            print("❌ Under-mined block was accepted")
+            return False
+    except Exception as e:
+        print(f"❌ Difficulty error: {e}")
+        return False
+
+def test_chain_writer():
+    """Test that replicas share queued uploads, versions and contracts through the chain writer"""
+    print("\n🔍 Testing chain writer replicas...")
+    try:
+        from blockchain import Blockchain
+        from chain_service import ChainClient, ChainWriterServer
+        from smart_contract import ContractManager
+        from peer_verification import PeerVerification
+        import tempfile
+        import threading
+        
+        directory = tempfile.mkdtemp()
+        storage_path = os.path.join(directory, "blockchain.json")
+        socket_path = os.path.join(directory, "chain.sock")
+        writer = Blockchain(difficulty=1, storage_path=storage_path, async_sealing=True,
+                            batch_size=100, batch_interval=0)
+        server = ChainWriterServer(socket_path, writer,
+                                   ContractManager(os.path.join(directory, "contracts.json")),
+                                   PeerVerification(os.path.join(directory, "verifications.json")))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        
+        replicas = [Blockchain(difficulty=1, storage_path=storage_path, async_sealing=True,
+                               batch_size=100, writer=ChainClient(socket_path)) for _ in range(2)]
+        contracts = [ContractManager(os.path.join(directory, "contracts.json"), writer=ChainClient(socket_path))
+                     for _ in range(2)]
+        
+        replicas[0].add_file_transaction("shared.txt", "shared_hash_1", 10, "test_user", "/test/shared.txt")
+        contracts[0].create_contract("shared_hash_1", "test_user", is_public=True, max_downloads=1)
+        seen = replicas[1].get_file_by_hash("shared_hash_1")
+        second = replicas[1].add_file_transaction("shared.txt", "shared_hash_2", 10, "test_user", "/test/shared.txt")
+        first_download = contracts[1].record_download("shared_hash_1", "bob", "client_1", 60)
+        other_download = contracts[0].record_download("shared_hash_1", "eve", "client_2", 60)
+        
+        server.shutdown()
+        server.server_close()
+        writer.close()
+        
+        if (seen and seen.get("pending") and second["transaction"]["version"] == 2 and
+                first_download[0] and not other_download[0]):
+            print("✅ Replicas share pending uploads, versions and contracts")
+            return True
+        else:
+            print(f"❌ Replicas diverged: {seen}, {second['transaction']}, {first_download}, {other_download}")
+            return False
+    except Exception as e:
+        print(f"❌ Chain writer error: {e}")
+        return False
+
+def test_compaction():
+    """Test that compaction archives download blocks without changing stats or validity"""
+    print("\n🔍 Testing chain compaction...")
+    try:
+        from blockchain import Blockchain
+        import tempfile
+        
+        storage_path = os.path.join(tempfile.mkdtemp(), "blockchain.json")
+        options = dict(difficulty=1, storage_path=storage_path, segment_max_bytes=1500)
+        bc = Blockchain(**options)
+        bc.add_file_transaction("archived.txt", "archived_hash_1", 10, "test_user", "/test/archived.txt")
+        for number in range(12):
+            bc.add_download_transaction("archived.txt", "archived_hash_1", f"reader_{number % 3}")
+        bc.add_file_transaction("kept.txt", "archived_hash_2", 10, "test_user", "/test/kept.txt")
+        stats = bc.get_chain_stats()
+        activity = bc.get_user_activity("reader_0")["totals"]
+        
+        archived = bc.compact()
+        stubs = sum(1 for block in bc.chain if block.tx_type == "archived")
+        audited = bc.is_chain_valid(full_audit=True)
+        bc.close()
+        
+        reopened = []
+        for lazy_load in (False, True):
+            reloaded = Blockchain(**options, lazy_load=lazy_load)
+            reloaded.close()
+            reopened.append(reloaded.get_chain_stats() == stats and
+                            reloaded.get_user_activity("reader_0")["totals"]["downloads"] == activity["downloads"] and
+                            reloaded.get_file_by_hash("archived_hash_1") is not None and
+                            reloaded.is_chain_valid(full_audit=True))
+        
+        if archived > 0 and stubs == archived and audited and bc.get_chain_stats() == stats and all(reopened):
+            print(f"✅ Compaction archived {archived} download blocks, stats unchanged")
+            return True
+        else:
+            print(f"❌ Compaction: {archived} archived, {stubs} stubs, audit {audited}, reopened {reopened}")
+            return False
+    except Exception as e:
+        print(f"❌ Compaction error: {e}")
+        return False
+
+def test_replica_compaction():
+    """Test that replicas apply the writer's compactions and reconnect to a restarted writer"""
+    print("\n🔍 Testing replica compaction...")
+    try:
+        from blockchain import Blockchain
+        from chain_service import ChainClient, ChainWriterServer
+        import tempfile
+        import threading
+        import time
+        
+        directory = tempfile.mkdtemp()
+        storage_path = os.path.join(directory, "blockchain.json")
+        socket_path = os.path.join(directory, "chain.sock")
+        writer = Blockchain(difficulty=1, storage_path=storage_path, segment_max_bytes=2000)
+        server = ChainWriterServer(socket_path, writer)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        
+        replica = Blockchain(difficulty=1, storage_path=storage_path, writer=ChainClient(socket_path))
+        replica.add_file_transaction("compact.txt", "compact_hash_1", 10, "test_user", "/test/compact.txt")
+        for _ in range(10):
+            replica.add_download_transaction("compact.txt", "compact_hash_1", "compact_user")
+        archived = replica.compact()
+        replica.refresh()
+        replica_totals = replica.get_user_activity("compact_user")["totals"]
+        writer_totals = writer.get_user_activity("compact_user")["totals"]
+        stubs = sum(1 for block in replica.chain if block.tx_type == "archived")
+        
+        # The writer goes away; a call made while it restarts waits for it
+        server.shutdown()
+        server.server_close()
+        
+        def restart():
+            time.sleep(0.5)
+            restarted = ChainWriterServer(socket_path, writer)
+            threading.Thread(target=restarted.serve_forever, daemon=True).start()
+        
+        threading.Thread(target=restart).start()
+        replica.writer._disconnect()
+        os.remove(socket_path)
+        receipt_lookup = replica.writer.call("get_receipt", receipt_id="missing")
+        writer.close()
+        
+        if (archived > 0 and stubs == archived and replica_totals == writer_totals and
+                replica_totals["archived_downloads"] == archived and receipt_lookup is None):
+            print(f"✅ Replica applied compaction of {archived} blocks and reconnected")
+            return True
+        else:
+            print(f"❌ Replica compaction: {archived} archived, {stubs} stubs, {replica_totals} vs {writer_totals}")
+            return False
+    except Exception as e:
+        print(f"❌ Replica compaction error: {e}")
+        return False
+
+def test_time_buckets():
+    """Test analytics time buckets: the current minute counts and old minutes roll up into hours"""
+    print("\n🔍 Testing analytics time buckets...")
+    try:
+        from chain_index import TimeBuckets
+        from datetime import datetime, timedelta
+        
+        buckets = TimeBuckets(minute_retention=3600)
+        now = datetime.now()
+        old = now - timedelta(days=3)
+        buckets.add_transaction({"type": "file_upload", "timestamp": old.isoformat(), "file_size": 5})
+        buckets.add_transaction({"type": "file_download", "timestamp": now.isoformat(), "file_hash": "h"})
+        
+        last_day = buckets.totals(now - timedelta(days=1), datetime.now())
+        around_old = buckets.totals(old - timedelta(minutes=1), old + timedelta(minutes=1))
+        minute_keys = buckets.keys["minute"]
+        
+        if (last_day["downloads"] == 1 and around_old["uploads"] == 1 and
+                minute_keys == [now.isoformat()[:16]]):
+            print(f"✅ Time buckets working: {len(minute_keys)} minute bucket kept")
+            return True
+        else:
+            print(f"❌ Time buckets wrong: {last_day}, {around_old}, {minute_keys}")
+            return False
+    except Exception as e:
+        print(f"❌ Time bucket error: {e}")
+        return False
+
+def test_benchmark():
+    """Test a tiny run of the blockchain benchmark suite"""
+    print("\n🔍 Testing benchmark suite...")
+    try:
+        from benchmark import run_one, synthetic_transactions
+        
+        same_seed = list(synthetic_transactions(10, 0.5, 3, 7)) == list(synthetic_transactions(10, 0.5, 3, 7))
+        result = run_one(size=20, difficulty=1, storage="log", download_ratio=0.5, users=3,
+                         appends=2, lookups=5, seed=1)
+        operations = result["operations"]
+        
+        # Genesis, 19 synthetic blocks and 2 timed appends
+        if (same_seed and operations["load_from_disk"]["blocks"] == 22 and
+                operations["load_from_disk_lazy"]["blocks"] == 22 and
+                operations["get_file_by_hash"]["iterations"] == 5 and result["disk_bytes"] > 0):
+            print(f"✅ Benchmark ran {len(operations)} operations on a {result['size']}-block chain")
+            return True
+        else:
+            print(f"❌ Benchmark results look wrong: {result}")
+            return False
+    except Exception as e:
+        print(f"❌ Benchmark error: {e}")
+        return False
+
+def test_parallel_audit():
+    """Test that the parallel audit checks every block and finds a tampered one"""
+    print("\n🔍 Testing parallel audit...")
+    try:
+        from blockchain import Blockchain
+        from audit import run_audit
+        import tempfile
+        
+        directory = tempfile.mkdtemp()
+        bc = Blockchain(difficulty=1, storage_path=os.path.join(directory, "blockchain.json"),
+                        segment_max_bytes=1500)
+        bc.add_file_transaction("audited.txt", "audited_hash_1", 10, "test_user", "/test/audited.txt")
+        for _ in range(10):
+            bc.add_download_transaction("audited.txt", "audited_hash_1", "audit_user")
+        bc.compact()
+        result = run_audit(bc, workers=2, chunk_size=3)
+        bc.close()
+        
+        tampered = Blockchain(difficulty=1, storage_path=os.path.join(directory, "tampered.json"),
+                              storage_format="json")
+        for number in range(6):
+            tampered.add_file_transaction(f"audited_{number}.txt", f"audited_hash_{number}", 10,
+                                          "test_user", f"/test/audited_{number}.txt")
+        tampered.chain[3].data = {**tampered.chain[3].data, "file_size": 999}
+        tampered_result = run_audit(tampered, workers=2, chunk_size=2)
+        
+        if (result["valid"] and result["blocks_checked"] == len(bc.chain) - 1 and
+                result["archived_blocks_checked"] > 0 and result["workers"] == 2 and
+                not tampered_result["valid"] and tampered_result["first_invalid_index"] == 3):
+            print(f"✅ Parallel audit checked {result['blocks_checked']} blocks "
+                  f"and found tampered block {tampered_result['first_invalid_index']}")
+            return True
+        else:
+            print(f"❌ Parallel audit: {result}, tampered {tampered_result}")
+            return False
+    except Exception as e:
+        print(f"❌ Parallel audit error: {e}")
+        return False
+
+def test_blob_store():
+    """Test content-addressed storage: deduplication, reference counts and gc"""
+    print("\n🔍 Testing blob store...")
+    try:
+        from blob_store import BlobStore
+        import app
+        import tempfile
+        
+        store = BlobStore(tempfile.mkdtemp(), gc_grace=60)
+        digest, size, created = store.put_stream([b"same ", b"content"])
+        _, _, created_again = store.put_stream([b"same content"])
+        refs = store.refs(digest)
+        store.release(digest)
+        store.release(digest)
+        kept = store.gc()["blobs_removed"] == 0 and os.path.exists(store.path(digest))
+        removed = store.gc(now=os.path.getmtime(store.refs_path(digest)) + 61)["blobs_removed"]
+        
+        # gc is an admin endpoint, refused while no admin token is configured
+        token = app.config.ADMIN_TOKEN
+        app.config.ADMIN_TOKEN = ''
+        gc_status = app.app.test_client().post('/api/admin/blobs/gc').status_code
+        app.config.ADMIN_TOKEN = token
+        
+        if (created and not created_again and size == 12 and refs == 2 and kept and removed == 1
+                and not os.path.exists(store.path(digest)) and gc_status == 403):
+            print("✅ Blob store deduplicates and collects unreferenced content")
+            return True
+        else:
+            print(f"❌ Blob store wrong: refs {refs}, kept {kept}, removed {removed}, gc endpoint {gc_status}")
+            return False
+    except Exception as e:
+        print(f"❌ Blob store error: {e}")
+        return False
+
+def test_upload_sessions():
+    """Test resumable uploads: out-of-order chunks, hash mismatches and stale claims"""
+    print("\n🔍 Testing upload sessions...")
+    try:
+        from upload_sessions import UploadSessions, UploadSessionError
+        import hashlib
+        import io
+        import json
+        import subprocess
+        import sys
+        import tempfile
+        
+        sessions = UploadSessions(tempfile.mkdtemp(), max_file_size=1024, default_chunk_size=4)
+        data = b"out of order chunks"
+        session = sessions.create("chunks.txt", len(data), file_sha256=hashlib.sha256(data).hexdigest())
+        session_id = session["session_id"]
+        for index in reversed(range(session["total_chunks"])):
+            sessions.put_chunk(session_id, index, io.BytesIO(data[index * 4:index * 4 + 4]))
+        assembled = b"".join(sessions.iter_content(session_id))
+        
+        try:
+            sessions.put_chunk(session_id, 0, io.BytesIO(data[:4]), expected_sha256="0" * 64)
+            chunk_mismatch = False
+        except UploadSessionError:
+            chunk_mismatch = True
+        
+        other = sessions.create("other.txt", 4, file_sha256="0" * 64)
+        sessions.put_chunk(other["session_id"], 0, io.BytesIO(b"data"))
+        try:
+            b"".join(sessions.iter_content(other["session_id"]))
+            file_mismatch = False
+        except UploadSessionError:
+            file_mismatch = True
+        
+        # A live claim blocks; one left by a dead process does not
+        claimed = sessions.claim(session_id)
+        blocked = not sessions.claim(session_id)
+        process = subprocess.Popen([sys.executable, "-c", "pass"])
+        process.wait()
+        with open(os.path.join(sessions.root, session_id, "finalizing"), 'r') as f:
+            marker = json.load(f)
+        marker["pid"] = process.pid
+        with open(os.path.join(sessions.root, session_id, "finalizing"), 'w') as f:
+            json.dump(marker, f)
+        reclaimed = sessions.claim(session_id)
+        
+        if (assembled == data and chunk_mismatch and file_mismatch and
+                claimed and blocked and reclaimed):
+            print(f"✅ Upload session assembled {len(data)} bytes from {session['total_chunks']} reversed chunks")
+            return True
+        else:
+            print(f"❌ Upload sessions failed (claims: {claimed}, {blocked}, {reclaimed})")
+            return False
+    except Exception as e:
+        print(f"❌ Upload session error: {e}")
+        return False
+
 def test_encryption():
     """Test encryption functionality"""
     print("\n🔍 Testing encryption...")
@@ -122,6 +997,64 @@ def test_encryption():
         traceback.print_exc()
         return False
 
+def test_chunked_encryption():
+    """Test the chunked encryption format, ranged reads and truncation detection"""
+    print("\n🔍 Testing chunked encryption...")
+    try:
+        from encryption import FileEncryption
+        import tempfile
+        
+        password = "test_password_123"
+        test_data = os.urandom(FileEncryption.CHUNK_SIZE * 2 + 1000)
+        encrypted_path = os.path.join(tempfile.mkdtemp(), "chunked.encrypted")
+        
+        chunks, salt = FileEncryption.encrypt_chunks([test_data[:5000], test_data[5000:]], password)
+        with open(encrypted_path, 'wb') as f:
+            for chunk in chunks:
+                f.write(chunk)
+        
+        decrypted_path = FileEncryption.decrypt_file(encrypted_path, password, salt, encrypted_path + ".dec")
+        with open(decrypted_path, 'rb') as f:
+            decrypted = f.read()
+        
+        start, end = FileEncryption.CHUNK_SIZE - 10, FileEncryption.CHUNK_SIZE * 2 + 10
+        size, read = FileEncryption.decrypted_reader(encrypted_path, password, salt)
+        ranged = b"".join(read(start, end))
+        
+        # Drop the last token: every remaining token still authenticates
+        with open(encrypted_path, 'rb') as f:
+            encrypted = f.read()
+        token_length = FileEncryption.TOKEN_LENGTH.size + FileEncryption.TOKEN_LENGTH.unpack(
+            encrypted[len(FileEncryption.CHUNKED_MAGIC) + 4:len(FileEncryption.CHUNKED_MAGIC) + 8])[0]
+        with open(encrypted_path, 'wb') as f:
+            f.write(encrypted[:len(FileEncryption.CHUNKED_MAGIC) + 4 + 2 * token_length])
+        try:
+            FileEncryption.decrypt_file(encrypted_path, password, salt, encrypted_path + ".dec")
+            truncation_detected = False
+        except ValueError:
+            truncation_detected = True
+        
+        # An unbound chunk layout can't be selected by rewriting the magic
+        with open(encrypted_path, 'wb') as f:
+            f.write(b"FSENC1\n" + encrypted[len(FileEncryption.CHUNKED_MAGIC):])
+        try:
+            FileEncryption.decrypt_file(encrypted_path, password, salt, encrypted_path + ".dec")
+            other_magic_rejected = False
+        except ValueError:
+            other_magic_rejected = True
+        
+        if (decrypted == test_data and size == len(test_data) and
+                ranged == test_data[start:end] and truncation_detected and other_magic_rejected and
+                not FileEncryption.verify_password(encrypted_path, "wrong", salt)):
+            print("✅ Chunked encryption round-trips, reads ranges and rejects truncation")
+            return True
+        else:
+            print(f"❌ Chunked encryption failed (truncation detected: {truncation_detected})")
+            return False
+    except Exception as e:
+        print(f"❌ Chunked encryption error: {e}")
+        return False
+
 def test_smart_contract():
     """Test smart contract functionality"""
     print("\n🔍 Testing smart contracts...")
@@ -155,6 +1088,168 @@ def test_smart_contract():
         print(f"❌ Smart contract error: {e}")
         return False
 
+def test_range_parsing():
+    """Test Range header parsing: suffix and multiple ranges, 416 and If-Range"""
+    print("\n🔍 Testing range parsing...")
+    try:
+        from http_range import parse_range, requested_ranges, RangeNotSatisfiable
+        
+        etag = '"range_etag"'
+        checks = [
+            parse_range("bytes=-10", 100) == [(90, 100)],
+            parse_range("bytes=-500", 100) == [(0, 100)],
+            parse_range("bytes=0-9,50-,5-19", 100) == [(0, 20), (50, 100)],
+            parse_range("bytes=10-5", 100) is None,
+            parse_range("items=0-9", 100) is None,
+            requested_ranges({"Range": "bytes=0-9", "If-Range": etag}, etag, 100) == [(0, 10)],
+            requested_ranges({"Range": "bytes=0-9", "If-Range": '"stale"'}, etag, 100) is None,
+            requested_ranges({"Range": "bytes=0-9", "If-Range": "W/" + etag}, etag, 100) is None,
+        ]
+        try:
+            parse_range("bytes=100-", 100)
+            checks.append(False)
+        except RangeNotSatisfiable:
+            checks.append(True)
+        
+        if all(checks):
+            print(f"✅ Range parsing passed {len(checks)} checks")
+            return True
+        else:
+            print(f"❌ Range parsing failed checks {[i for i, ok in enumerate(checks) if not ok]}")
+            return False
+    except Exception as e:
+        print(f"❌ Range parsing error: {e}")
+        return False
+
+def test_chain_pages():
+    """Test that paginated and streamed /api/blockchain responses match the whole chain"""
+    print("\n🔍 Testing blockchain pages...")
+    try:
+        import json
+        import app
+        from block_codec import decode_blocks
+        
+        for _ in range(3):
+            app.blockchain.add_download_transaction("paged.txt", "paged_hash_1", "page_user")
+        client = app.app.test_client()
+        chain = client.get('/api/blockchain').get_json()['chain']
+        
+        pages = {}
+        for order in ('asc', 'desc'):
+            blocks, cursor = [], None
+            while True:
+                url = f'/api/blockchain?limit=2&order={order}'
+                page = client.get(url + (f'&cursor={cursor}' if cursor is not None else '')).get_json()
+                blocks.extend(page['blocks'])
+                cursor = page['next_cursor']
+                if cursor is None:
+                    break
+            pages[order] = blocks
+        
+        ndjson = [json.loads(line) for line in
+                  client.get('/api/blockchain?format=ndjson').get_data(as_text=True).splitlines()]
+        binary = decode_blocks(client.get('/api/blockchain?format=binary').get_data())
+        headers = client.get('/api/blockchain?from=1&to=3&fields=headers').get_json()['chain']
+        
+        if (len(chain) >= 4 and pages['asc'] == chain and pages['desc'] == chain[::-1] and
+                ndjson == chain and binary == chain and
+                [block['index'] for block in headers] == [1, 2] and
+                all('data' not in block for block in headers)):
+            print(f"✅ Blockchain pages match the {len(chain)}-block chain")
+            return True
+        else:
+            print(f"❌ Blockchain pages differ: {len(pages['asc'])} asc, {len(pages['desc'])} desc, "
+                  f"{len(ndjson)} ndjson, {len(binary)} binary of {len(chain)} blocks")
+            return False
+    except Exception as e:
+        print(f"❌ Blockchain pages error: {e}")
+        return False
+
+def test_ranged_downloads():
+    """Test that ranged downloads are checked against the contract and counted once"""
+    print("\n🔍 Testing ranged downloads...")
+    try:
+        import io
+        import app
+        
+        client = app.app.test_client()
+        response = client.post('/api/upload', content_type='multipart/form-data', data={
+            'file': (io.BytesIO(os.urandom(4096)), 'ranged.zip'),
+            'uploader': 'owner_user', 'is_public': 'true', 'max_downloads': '1'
+        })
+        file_hash = response.get_json()['file_hash']
+        contract = app.contract_manager.get_contract(file_hash)
+        
+        statuses = [
+            client.get(f'/api/download/{file_hash}?downloader=bob', headers={'Range': 'bytes=1-'}).status_code
+            for _ in range(5)
+        ]
+        counted = contract.get_stats()['successful_downloads']
+        other = client.get(f'/api/download/{file_hash}?downloader=eve', headers={'Range': 'bytes=1-'})
+        
+        if statuses == [206] * 5 and counted == 1 and other.status_code == 403:
+            print("✅ Ranged downloads counted once and limited by the contract")
+            return True
+        else:
+            print(f"❌ Ranged downloads: {statuses}, counted {counted}, other client {other.status_code}")
+            return False
+    except Exception as e:
+        print(f"❌ Ranged download error: {e}")
+        return False
+
+def test_download_offload():
+    """Test each DOWNLOAD_OFFLOAD mode of plain file downloads"""
+    print("\n🔍 Testing download offload...")
+    import app
+    mode = app.config.DOWNLOAD_OFFLOAD
+    try:
+        import io
+        from urllib.parse import quote
+        
+        content = os.urandom(4096)
+        client = app.app.test_client()
+        response = client.post('/api/upload', content_type='multipart/form-data', data={
+            'file': (io.BytesIO(content), 'offloaded.zip'), 'uploader': 'owner_user'
+        })
+        file_hash = response.get_json()['file_hash']
+        file_path = app.blockchain.get_file_by_hash(file_hash)['file_path']
+        url = f'/api/download/{file_hash}?downloader=offload_user'
+        
+        app.config.DOWNLOAD_OFFLOAD = 'x-accel'
+        relative_path = os.path.relpath(os.path.abspath(file_path), os.path.abspath(app.UPLOAD_FOLDER))
+        accel = client.get(url)
+        accel_ok = (accel.headers.get('X-Accel-Redirect') ==
+                    app.config.DOWNLOAD_ACCEL_PREFIX.rstrip('/') + '/' + quote(relative_path) and
+                    accel.get_data() == b"")
+        
+        app.config.DOWNLOAD_OFFLOAD = 'x-sendfile'
+        sendfile_header = client.get(url)
+        sendfile_header_ok = (sendfile_header.headers.get('X-Sendfile') == os.path.abspath(file_path) and
+                              sendfile_header.get_data() == b"")
+        
+        # Whole files and ranges running to the end go through file_wrapper;
+        # other ranges are streamed by the worker
+        app.config.DOWNLOAD_OFFLOAD = 'sendfile'
+        whole = client.get(url)
+        tail = client.get(url, headers={'Range': 'bytes=100-'})
+        head = client.get(url, headers={'Range': 'bytes=0-9'})
+        sendfile_ok = (whole.status_code == 200 and whole.get_data() == content and
+                       tail.status_code == 206 and tail.get_data() == content[100:] and
+                       tail.headers['Content-Range'] == 'bytes 100-4095/4096' and
+                       head.status_code == 206 and head.get_data() == content[:10])
+        
+        if accel_ok and sendfile_header_ok and sendfile_ok:
+            print("✅ Downloads offloaded with X-Accel-Redirect, X-Sendfile and sendfile")
+            return True
+        else:
+            print(f"❌ Download offload: x-accel {accel_ok}, x-sendfile {sendfile_header_ok}, sendfile {sendfile_ok}")
+            return False
+    except Exception as e:
+        print(f"❌ Download offload error: {e}")
+        return False
+    finally:
+        app.config.DOWNLOAD_OFFLOAD = mode
+
 def test_peer_verification():
     """Test peer verification functionality"""
     print("\n🔍 Testing peer verification...")
@@ -238,8 +1333,36 @@ def main():
         ("Imports", test_imports),
         ("Configuration", test_config),
         ("Blockchain", test_blockchain),
+        ("Block Log", test_block_log),
+        ("File Index", test_file_index),
+        ("Checkpoints", test_checkpoints),
+        ("Aggregates", test_aggregates),
+        ("Parallel Mining", test_parallel_mining),
+        ("Nonce Search", test_nonce_search),
+        ("Binary Codec", test_binary_codec),
+        ("Lazy Load", test_lazy_load),
+        ("Merkle Proof", test_merkle_proof),
+        ("Batched Uploads", test_batched_uploads),
+        ("Receipt Expiry", test_receipt_expiry),
+        ("Concurrent Reads", test_concurrent_reads),
+        ("File Versions", test_file_versions),
+        ("User Index", test_user_index),
+        ("Difficulty", test_difficulty),
+        ("Chain Writer", test_chain_writer),
+        ("Compaction", test_compaction),
+        ("Replica Compaction", test_replica_compaction),
+        ("Time Buckets", test_time_buckets),
+        ("Benchmark", test_benchmark),
+        ("Parallel Audit", test_parallel_audit),
+        ("Blob Store", test_blob_store),
+        ("Upload Sessions", test_upload_sessions),
         ("Encryption", test_encryption),
+        ("Chunked Encryption", test_chunked_encryption),
         ("Smart Contracts", test_smart_contract),
+        ("Range Parsing", test_range_parsing),
+        ("Blockchain Pages", test_chain_pages),
+        ("Ranged Downloads", test_ranged_downloads),
+        ("Download Offload", test_download_offload),
         ("Peer Verification", test_peer_verification),
     ]
     
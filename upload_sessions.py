@@ -0,0 +1,265 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import socket
+import time
+import uuid
+from typing import List, Dict, Any, Optional, Iterator, BinaryIO
+
+
+class UploadSessionError(ValueError):
+    """A request that doesn't fit the upload session (bad chunk, hash mismatch, ...)"""
+
+
+class UploadSessions:
+    """Resumable chunked uploads kept on disk.
+
+    A session is a directory holding ``session.json`` and one file per
+    received chunk. Chunks are written to a temporary name and renamed, so a
+    chunk file exists only once it arrived complete; they may arrive in any
+    order, in parallel and through any worker process. Each chunk's SHA-256
+    is kept next to it and checked again when the session is finalized.
+    The request finalizing a session holds a ``finalizing`` marker naming its
+    host, pid and claim time; a marker whose process is gone, or older than
+    claim_timeout seconds, no longer blocks the session.
+    """
+
+    SESSION_ID = re.compile(r"[0-9a-f]{32}")
+
+    def __init__(self, root: str, max_file_size: int, default_chunk_size: int = 8 * 1024 * 1024,
+                 max_chunk_size: int = 64 * 1024 * 1024, claim_timeout: float = 3600):
+        self.root = root
+        self.max_file_size = max_file_size
+        self.default_chunk_size = default_chunk_size
+        self.max_chunk_size = max_chunk_size
+        self.claim_timeout = claim_timeout
+        os.makedirs(root, exist_ok=True)
+
+    def _dir(self, session_id: str) -> str:
+        if not self.SESSION_ID.fullmatch(session_id or ""):
+            raise KeyError(session_id)
+        return os.path.join(self.root, session_id)
+
+    def _chunk_path(self, session_id: str, index: int) -> str:
+        return os.path.join(self._dir(session_id), f"chunk-{index:06d}")
+
+    def create(self, file_name: str, file_size: int, chunk_size: Optional[int] = None,
+               file_sha256: Optional[str] = None, metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Start a session for a file of file_size bytes"""
+        chunk_size = chunk_size or self.default_chunk_size
+        if not 0 <= file_size <= self.max_file_size:
+            raise UploadSessionError(f"file_size must be between 0 and {self.max_file_size} bytes")
+        if not 0 < chunk_size <= self.max_chunk_size:
+            raise UploadSessionError(f"chunk_size must be between 1 and {self.max_chunk_size} bytes")
+        if file_sha256 is not None and not re.fullmatch(r"[0-9a-f]{64}", file_sha256):
+            raise UploadSessionError("file_sha256 must be a lowercase hex SHA-256 digest")
+
+        session = {
+            "session_id": uuid.uuid4().hex,
+            "file_name": file_name,
+            "file_size": file_size,
+            "chunk_size": chunk_size,
+            "total_chunks": max(1, -(-file_size // chunk_size)),
+            "file_sha256": file_sha256,
+            "metadata": metadata or {},
+            "created_at": time.time()
+        }
+        os.makedirs(self._dir(session["session_id"]))
+        with open(os.path.join(self._dir(session["session_id"]), "session.json"), 'w') as f:
+            json.dump(session, f)
+        return session
+
+    def get(self, session_id: str) -> Dict[str, Any]:
+        """Load a session; raises KeyError if it doesn't exist"""
+        try:
+            with open(os.path.join(self._dir(session_id), "session.json"), 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise KeyError(session_id)
+
+    def chunk_length(self, session: Dict[str, Any], index: int) -> int:
+        """Expected size of one chunk (the last one holds the remainder)"""
+        if not 0 <= index < session["total_chunks"]:
+            raise UploadSessionError(f"Chunk index must be between 0 and {session['total_chunks'] - 1}")
+        return min(session["chunk_size"], session["file_size"] - index * session["chunk_size"])
+
+    def put_chunk(self, session_id: str, index: int, stream: BinaryIO,
+                  expected_sha256: Optional[str] = None, read_size: int = 1024 * 1024) -> Dict[str, Any]:
+        """
+        Store one chunk from a stream, hashing it as it is written
+        Sending a chunk again replaces it.
+        Returns: dict with index, size and sha256
+        """
+        session = self.get(session_id)
+        length = self.chunk_length(session, index)
+        chunk_path = self._chunk_path(session_id, index)
+        tmp_path = f"{chunk_path}.{uuid.uuid4().hex}.tmp"
+
+        sha256_hash = hashlib.sha256()
+        size = 0
+        try:
+            with open(tmp_path, 'wb') as f:
+                for block in iter(lambda: stream.read(read_size), b""):
+                    size += len(block)
+                    if size > length:
+                        raise UploadSessionError(f"Chunk {index} must be {length} bytes")
+                    sha256_hash.update(block)
+                    f.write(block)
+            if size != length:
+                raise UploadSessionError(f"Chunk {index} must be {length} bytes, got {size}")
+            digest = sha256_hash.hexdigest()
+            if expected_sha256 and expected_sha256.lower() != digest:
+                raise UploadSessionError(f"Chunk {index} SHA-256 mismatch")
+
+            with open(chunk_path + ".sha256", 'w') as f:
+                f.write(digest)
+            os.replace(tmp_path, chunk_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        return {"index": index, "size": size, "sha256": digest}
+
+    def received(self, session_id: str) -> List[int]:
+        """Indexes of the chunks that have fully arrived"""
+        return sorted(int(name[6:]) for name in os.listdir(self._dir(session_id))
+                      if re.fullmatch(r"chunk-\d{6}", name))
+
+    def status(self, session_id: str) -> Dict[str, Any]:
+        """
+        Session state for a resuming client
+        Returns: session dict plus received chunk indexes, missing chunk
+        indexes and the received byte ranges as [start, end) pairs
+        """
+        session = self.get(session_id)
+        received = self.received(session_id)
+        arrived = set(received)
+
+        ranges = []
+        for index in received:
+            start = index * session["chunk_size"]
+            end = start + self.chunk_length(session, index)
+            if ranges and ranges[-1][1] == start:
+                ranges[-1][1] = end
+            else:
+                ranges.append([start, end])
+
+        return {
+            **session,
+            "received": received,
+            "missing": [index for index in range(session["total_chunks"]) if index not in arrived],
+            "received_bytes": sum(end - start for start, end in ranges),
+            "received_ranges": ranges
+        }
+
+    def iter_content(self, session_id: str, read_size: int = 1024 * 1024) -> Iterator[bytes]:
+        """
+        Yield the assembled file, checking every chunk and the whole-file hash
+        Raises UploadSessionError (after the last block) if anything doesn't match.
+        """
+        session = self.get(session_id)
+        missing = self.status(session_id)["missing"]
+        if missing:
+            raise UploadSessionError(f"{len(missing)} chunks missing, first is {missing[0]}")
+
+        file_hash = hashlib.sha256()
+        for index in range(session["total_chunks"]):
+            chunk_path = self._chunk_path(session_id, index)
+            with open(chunk_path + ".sha256", 'r') as f:
+                expected = f.read().strip()
+            chunk_hash = hashlib.sha256()
+            with open(chunk_path, 'rb') as f:
+                for block in iter(lambda: f.read(read_size), b""):
+                    chunk_hash.update(block)
+                    file_hash.update(block)
+                    yield block
+            if chunk_hash.hexdigest() != expected:
+                raise UploadSessionError(f"Chunk {index} is corrupted; send it again")
+
+        if session["file_sha256"] and file_hash.hexdigest() != session["file_sha256"]:
+            raise UploadSessionError("File SHA-256 mismatch")
+
+    def _claim_is_stale(self, marker: str, now: Optional[float] = None) -> bool:
+        """True if the claimant of a finalizing marker died or ran out of time"""
+        now = time.time() if now is None else now
+        try:
+            with open(marker, 'r') as f:
+                claim = json.load(f)
+        except FileNotFoundError:
+            return True
+        except ValueError:
+            # Created but not written yet (or its writer died in between)
+            claim = {}
+        try:
+            claimed_at = claim.get("claimed_at") or os.path.getmtime(marker)
+        except FileNotFoundError:
+            return True
+        if now - claimed_at >= self.claim_timeout:
+            return True
+        if claim.get("host") != socket.gethostname() or not claim.get("pid"):
+            return False
+        try:
+            os.kill(claim["pid"], 0)
+        except ProcessLookupError:
+            return True
+        except PermissionError:
+            pass
+        return False
+
+    def claim(self, session_id: str) -> bool:
+        """Mark a session as being finalized; False if another live request already is"""
+        marker = os.path.join(self._dir(session_id), "finalizing")
+        for _ in range(3):
+            try:
+                fd = os.open(marker, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                if not self._claim_is_stale(marker):
+                    return False
+                # Move the stale marker aside; only one request wins the rename
+                stale = f"{marker}.{uuid.uuid4().hex}.stale"
+                try:
+                    os.rename(marker, stale)
+                except FileNotFoundError:
+                    continue
+                if not self._claim_is_stale(stale):
+                    # A live claim replaced it meanwhile: put it back
+                    try:
+                        os.link(stale, marker)
+                    except FileExistsError:
+                        pass
+                    os.remove(stale)
+                    return False
+                os.remove(stale)
+                continue
+            with os.fdopen(fd, 'w') as f:
+                json.dump({"host": socket.gethostname(), "pid": os.getpid(),
+                           "claimed_at": time.time()}, f)
+            return True
+        return False
+
+    def unclaim(self, session_id: str):
+        """Let a failed finalize be retried"""
+        try:
+            os.remove(os.path.join(self._dir(session_id), "finalizing"))
+        except FileNotFoundError:
+            pass
+
+    def delete(self, session_id: str):
+        """Drop a session and its chunks"""
+        shutil.rmtree(self._dir(session_id), ignore_errors=True)
+
+    def expire(self, max_age: float, now: Optional[float] = None) -> int:
+        """Delete sessions with no activity for max_age seconds; returns how many"""
+        now = time.time() if now is None else now
+        removed = 0
+        for session_id in os.listdir(self.root):
+            path = os.path.join(self.root, session_id)
+            if not self.SESSION_ID.fullmatch(session_id) or not os.path.isdir(path):
+                continue
+            # The directory's mtime moves whenever a chunk lands
+            if now - os.path.getmtime(path) >= max_age:
+                self.delete(session_id)
+                removed += 1
+        return removed